@@ -1,8 +1,11 @@
+import click
 from flask import Flask
 from .config import DevConfig, ProdConfig
 from .routes.auth import auth_bp
 from .routes.views import views_bp
 from .routes.api import api_bp
+from .services.prewarm import get_prewarmer
+from .extensions import init_db
 
 def create_app(env: str | None = None) -> Flask:
     app = Flask(__name__, static_folder="static", template_folder="templates")
@@ -13,11 +16,52 @@ def create_app(env: str | None = None) -> Flask:
     else:
         app.config.from_object(DevConfig)
 
+    # one pooled engine per process, shared by every route and service
+    init_db(app)
+
     # blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(views_bp)
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    # Live map pre-warming: started by the first request, so the reloader's
+    # watcher process never spawns a scheduler of its own
+    if app.config.get("PREWARM_ENABLED"):
+        @app.before_request
+        def _start_prewarm():
+            get_prewarmer().ensure_started()
+
+    @app.cli.command("prewarm-hotspots")
+    def prewarm_hotspots():
+        """Warm the Live hotspot models for the current hour once (cron / companion worker)."""
+        import json
+        print(json.dumps(get_prewarmer().warm_current(), indent=2))
+
+    @app.cli.command("compact-tables")
+    @click.argument("tables", nargs=-1)
+    @click.option("--dry-run", is_flag=True, help="Report the planned type changes without altering anything.")
+    def compact_tables(tables, dry_run):
+        """Convert processed tables to the compact column types; prints before/after sizes."""
+        import json
+        from .services.schema import migrate_tables
+        print(json.dumps(migrate_tables(list(tables), dry_run=dry_run), indent=2, default=str))
+
+    @app.cli.command("build-hotspot-cubes")
+    @click.argument("tables", nargs=-1, required=True)
+    def build_hotspot_cubes(tables):
+        """Rebuild the map's hotspot cube of each table from its rows (tables ingested before the cube)."""
+        import json
+        from .services.hotspot_cube import build_cube
+        print(json.dumps({t: build_cube(t) for t in tables}, indent=2))
+
+    @app.cli.command("rebuild-hotspot-index")
+    @click.argument("tables", nargs=-1, required=True)
+    def rebuild_hotspot_index(tables):
+        """Re-cluster the tables' hotspots from scratch and rebuild their persisted hotspot index."""
+        import json
+        from .services.hotspot_index import rebuild_hotspot_index
+        print(json.dumps([rebuild_hotspot_index(t) for t in tables], indent=2))
+
     # session key
     if not app.config.get("SECRET_KEY"):
         app.config["SECRET_KEY"] = "change-me"
@@ -7,6 +7,52 @@ class BaseConfig:
     DB_USER = os.getenv("DB_USER", "root")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "")
     DB_NAME = os.getenv("DB_NAME", "rta_db")
+    # One connection pool per process, shared by pandas and raw cursors
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))       # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "280"))      # below MySQL wait_timeout
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"    # health check on checkout
+    DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") == "1"  # chart queries
+    DB_PREPARED_PER_CONNECTION = int(os.getenv("DB_PREPARED_PER_CONNECTION", "64"))
+    DB_LOCAL_INFILE = os.getenv("DB_LOCAL_INFILE", "0") == "1"         # bulk loads; opt-in (server needs local_infile=ON)
+    DB_INSERT_BATCH_ROWS = int(os.getenv("DB_INSERT_BATCH_ROWS", "1000"))  # rows per INSERT when it is off
+    # Table/column metadata cache; writers invalidate it, the TTL covers other workers
+    CATALOG_TTL_SECONDS = int(os.getenv("CATALOG_TTL_SECONDS", "60"))
+    # Chart queries run concurrently per /api/dashboard_bundle request (keep <= DB_POOL_SIZE)
+    DASHBOARD_BUNDLE_WORKERS = int(os.getenv("DASHBOARD_BUNDLE_WORKERS", "4"))
+    # Rendered chart/KPI/barangay responses keyed on (table, data version, args), LRU
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 << 20)))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))  # covers writes made outside the app
+    # Trained hotspot models (XGBoost native format), LRU in memory + on disk
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_cache"))
+    MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "16"))        # boosters kept in memory
+    MODEL_CACHE_MAX_FILES = int(os.getenv("MODEL_CACHE_MAX_FILES", "128"))  # boosters kept on disk
+    # Hotspot map model: "window" (one model per hour window) or "hourly" (one hour-aware model)
+    HOTSPOT_ENGINE = os.getenv("HOTSPOT_ENGINE", "window")
+    # Hotspot training: "full" (all 1000 trees) or "early_stop" (hist trees, time-ordered
+    # holdout of the last months, early stopping, wall-clock budget)
+    HOTSPOT_TRAINING = os.getenv("HOTSPOT_TRAINING", "full")
+    HOTSPOT_HOLDOUT_MONTHS = int(os.getenv("HOTSPOT_HOLDOUT_MONTHS", "3"))
+    HOTSPOT_TRAIN_BUDGET_SECONDS = float(os.getenv("HOTSPOT_TRAIN_BUDGET_SECONDS", "10"))
+    HOTSPOT_EARLY_STOPPING_ROUNDS = int(os.getenv("HOTSPOT_EARLY_STOPPING_ROUNDS", "50"))
+    # Background pre-warming of the Live hotspot map ahead of each hour boundary
+    PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+    PREWARM_LEAD_SECONDS = int(os.getenv("PREWARM_LEAD_SECONDS", "120"))
+    PREWARM_TABLES = os.getenv("PREWARM_TABLES", "accidents")   # comma-separated, plus recently viewed tables
+    PREWARM_ACTIVE_HOURS = int(os.getenv("PREWARM_ACTIVE_HOURS", "24"))
+    # Uploads this large (main + vehicle file) are ingested in chunks instead of in memory
+    INGEST_STREAM_MIN_BYTES = int(os.getenv("INGEST_STREAM_MIN_BYTES", str(64 << 20)))
+    INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+    # Uploads run as background jobs (polled at /api/jobs/<id>) on a pool of worker threads
+    INGEST_ASYNC = os.getenv("INGEST_ASYNC", "1") == "1"
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+    INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "")            # default: the system temp dir
+    INGEST_JOB_SAVE_SECONDS = float(os.getenv("INGEST_JOB_SAVE_SECONDS", "1"))  # status write-through interval
+    INGEST_JOB_KEEP_SECONDS = int(os.getenv("INGEST_JOB_KEEP_SECONDS", "3600"))  # finished jobs kept in memory
+    INGEST_JOB_STALE_SECONDS = int(os.getenv("INGEST_JOB_STALE_SECONDS", "120"))  # unsaved this long = worker lost
+    HOTSPOT_LOCK_SECONDS = int(os.getenv("HOTSPOT_LOCK_SECONDS", "600"))  # wait for another ingest into the table
     # Flask
     TEMPLATES_AUTO_RELOAD = False
 
@@ -1,26 +1,135 @@
 # app/extensions.py
+import os
+from collections import OrderedDict
 from flask import current_app
-import mysql.connector
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
 
 def _cfg(key: str, default):
     return current_app.config.get(key, default)
 
-def get_db_connection():
-    """Plain mysql-connector connection for cursor/execute use."""
-    return mysql.connector.connect(
-        host=_cfg("DB_HOST", "localhost"),
-        user=_cfg("DB_USER", "root"),
-        password=_cfg("DB_PASSWORD", ""),
-        database=_cfg("DB_NAME", "rta_db"),
+def _make_engine(cfg, counters: dict):
+    """One pooled engine per process; raw mysql-connector connections come from the same pool."""
+    url = URL.create(
+        "mysql+mysqlconnector",
+        username=cfg.get("DB_USER", "root"),
+        password=cfg.get("DB_PASSWORD", "") or None,
+        host=cfg.get("DB_HOST", "localhost"),
+        database=cfg.get("DB_NAME", "rta_db"),
+    )
+    engine = create_engine(
+        url,
+        pool_size=cfg.get("DB_POOL_SIZE", 5),
+        max_overflow=cfg.get("DB_MAX_OVERFLOW", 10),
+        pool_timeout=cfg.get("DB_POOL_TIMEOUT", 30),
+        # pool_pre_ping avoids stale conns; pool_recycle helps on PythonAnywhere
+        pool_recycle=cfg.get("DB_POOL_RECYCLE", 280),
+        pool_pre_ping=cfg.get("DB_POOL_PRE_PING", True),
+        connect_args={"allow_local_infile": bool(cfg.get("DB_LOCAL_INFILE", False))},
     )
 
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        counters["checkouts"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exc):
+        counters["invalidated"] += 1
+
+    # a forked worker must not share the parent's sockets
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+    return engine
+
+def init_db(app):
+    """Create the process-wide engine/pool (called once from create_app)."""
+    counters = {"connects": 0, "checkouts": 0, "invalidated": 0}
+    app.extensions["db_pool_counters"] = counters
+    app.extensions["db_engine"] = _make_engine(app.config, counters)
+
 def get_engine():
-    """SQLAlchemy engine for pandas.read_sql_query(...)."""
-    user = _cfg("DB_USER", "root")
-    pwd  = _cfg("DB_PASSWORD", "")
-    host = _cfg("DB_HOST", "localhost")
-    db   = _cfg("DB_NAME", "rta_db")
-    uri = f"mysql+mysqlconnector://{user}:{pwd}@{host}/{db}"
-    # pool_pre_ping avoids stale conns; pool_recycle helps on PythonAnywhere
-    return create_engine(uri, pool_pre_ping=True, pool_recycle=280)
+    """Shared SQLAlchemy engine for pandas.read_sql_query(...)."""
+    engine = current_app.extensions.get("db_engine")
+    if engine is None:
+        init_db(current_app)
+        engine = current_app.extensions["db_engine"]
+    return engine
+
+def get_db_connection():
+    """
+    Pooled mysql-connector connection for cursor/execute use. close() hands
+    it back to the pool (rolled back if left mid-transaction).
+    """
+    return get_engine().raw_connection()
+
+def run_query(conn, sql: str, params=()) -> list[tuple]:
+    """
+    Execute `sql` and fetch all rows. With DB_PREPARED_STATEMENTS on, each
+    pooled connection keeps an LRU of server-side prepared cursors keyed by
+    SQL text, so identical statements are prepared once per connection and
+    re-executed with new parameters. Falls back to a plain cursor when the
+    driver has no prepared cursors.
+    """
+    params = tuple(params)
+    info = getattr(conn, "info", None)
+    if (info is not None and _cfg("DB_PREPARED_STATEMENTS", True)
+            and current_app.extensions.get("prepared_cursors_ok", True)):
+        stmts = info.setdefault("prepared_statements", OrderedDict())
+        cached = stmts.pop(sql, None)
+        if cached is None:
+            try:
+                cached = (conn.cursor(prepared=True), sql)
+            except TypeError:  # no prepared cursors on this driver; don't ask again
+                current_app.extensions["prepared_cursors_ok"] = False
+        if cached is not None:
+            cur, key = cached
+            kept = False
+            try:
+                # the driver re-prepares unless it sees the very same string object
+                cur.execute(key, params)
+                rows = cur.fetchall()
+                stmts[key] = cached; kept = True
+            finally:
+                if not kept:  # failed: free its server-side statement
+                    try: cur.close()
+                    except Exception: pass
+            while len(stmts) > _cfg("DB_PREPARED_PER_CONNECTION", 64):
+                old, _ = stmts.popitem(last=False)[1]
+                try: old.close()
+                except Exception: pass
+            return rows
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+def ensure_app_table(cur, name: str, ddl: str):
+    """
+    Run `ddl` (a CREATE TABLE IF NOT EXISTS) on `cur` the first time this
+    process needs table `name`. The app's own bookkeeping tables are named
+    `app_*`, a prefix the Database page and schema tools skip.
+    """
+    ready = current_app.extensions.setdefault("app_tables_ready", set())
+    if name not in ready:
+        cur.execute(ddl)
+        ready.add(name)
+
+def pool_stats() -> dict:
+    engine = get_engine()
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": _cfg("DB_MAX_OVERFLOW", 10),
+        "recycle_seconds": _cfg("DB_POOL_RECYCLE", 280),
+        "pre_ping": bool(_cfg("DB_POOL_PRE_PING", True)),
+        **current_app.extensions["db_pool_counters"],
+    }
@@ -1,139 +1,41 @@
-from flask import Blueprint, jsonify, request, session, Response, redirect, url_for
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, jsonify, request, session, Response, redirect, url_for, current_app
 from .auth import is_logged_in
-from ..services.database import list_tables
+from ..services.database import table_exists, table_fingerprint, data_version, bump_data_version
+from ..services.table_versions import read_all as read_all_versions
+from ..services.catalog import get_catalog, table_roles
+from ..services.filters import (parse_filters, compile_where, filter_key, hour_bounds, hour_axis, GENDER_MALE,
+                                GENDER_FEMALE, GENDER_KNOWN, ALCOHOL_YES, ALCOHOL_NO, ALCOHOL_KNOWN)
+from ..services.kpis import kpi_sql, compute_kpis
 from ..services.preprocessing import process_merge_and_save_to_db
-from ..services.forecasting import rf_monthly_payload, build_forecast_map_html
-from ..extensions import get_db_connection
+from ..services.ingest_jobs import get_ingest_jobs
+from ..services.forecasting import (rf_monthly_cached, forget_rf_results, RF_MODES, build_forecast_map_html,
+                                    render_forecast_map_html, hotspot_forecast_data, manila_hour)
+from ..services.prewarm import get_prewarmer, is_default_live_request
+from ..services.model_cache import get_model_cache
+from ..services.response_cache import get_response_cache, json_body, conditional_json, etag_for
+from ..services.hotspot_cube import drop_cube, build_cube
+from ..services.hotspot_index import drop_hotspot_index
+from ..services.bulk_writer import bulk_insert
+from ..extensions import get_db_connection, pool_stats, run_query
 
 api_bp = Blueprint("api", __name__)
 
-@api_bp.route("/gender_proportion", methods=["GET"])
-def gender_proportion():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
+def _chart_filters(table: str, args, extra=(), skip=()):
+    """Cached column roles plus the compiled WHERE for the query-string filters (minus `skip`)."""
+    roles = table_roles(table)
+    spec = parse_filters(args)
+    for key in skip:
+        spec[key] = () if key in ("weekdays", "alcohol") else None
+    where_sql, params = compile_where(roles, spec, extra)
+    return roles, where_sql, params
 
-    table = session.get("forecast_table", "accidents")
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # --- Discover columns (avoid 1054 errors) ---
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {row[0] for row in cur.fetchall()}
-
-        # Preferred categorical gender columns
-        gender_cat_candidates = ["GENDER", "SEX", "VICTIM_GENDER", "SEX_OF_VICTIM"]
-        gender_cat_col = next((c for c in gender_cat_candidates if c in cols), None)
-
-        # Fallback: detect one-hot gender columns (GENDER_Male / SEX_Female / etc.)
-        prefixes = ("GENDER_", "SEX_")
-        present_onehots = {c for c in cols if c.startswith(prefixes)}
-        onehot_male   = next((c for c in present_onehots if c.lower().endswith("male")),   None)
-        onehot_female = next((c for c in present_onehots if c.lower().endswith("female")), None)
-        onehot_other  = next((c for c in present_onehots if c.lower().endswith("other")),  None)
-        onehot_unknown = next((c for c in present_onehots if c.lower().endswith("unknown")), None)
-
-        # -------- Build WHERE filters (mirror other endpoints) --------
-        q = request.args
-        where = []
-        params = []
-
-        # Location (Barangay)
-        location = (q.get("location") or "").strip()
-        if location and "BARANGAY" in cols:
-            where.append("BARANGAY = %s")
-            params.append(location)
 
-        # Gender filter (filters the base set, then we count proportions within the filtered set)
-        gender_req = (q.get("gender") or "").strip().lower()
-        if gender_req:
-            if gender_cat_col:
-                where.append(f"UPPER(TRIM(`{gender_cat_col}`)) = %s")
-                params.append(gender_req.upper())
-            else:
-                # Try one-hot if available
-                gh = {
-                    "male": onehot_male,
-                    "female": onehot_female,
-                    "other": onehot_other
-                }.get(gender_req)
-                if gh:
-                    where.append(f"COALESCE(`{gh}`,0) = 1")
-                else:
-                    # If we can't map the request to any column, do nothing (avoid 1054)
-                    pass
-
-        # Day of Week (accepts "1. Monday", "Monday", or "1")
-        day_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
-        if day_raw:
-            if "DATE_COMMITTED" in cols:
-                weekday_expr = "WEEKDAY(`DATE_COMMITTED`)"  # 0..6 (Mon..Sun)
-            elif "WEEKDAY" in cols:
-                weekday_expr = "CAST(`WEEKDAY` AS SIGNED)"
-            else:
-                weekday_expr = None
-
-            if weekday_expr:
-                name_to_int = {"MONDAY":0,"TUESDAY":1,"WEDNESDAY":2,"THURSDAY":3,"FRIDAY":4,"SATURDAY":5,"SUNDAY":6}
-                wd_ints = []
-                for item in day_raw:
-                    tok = item.split(".", 1)[0].strip()  # "1. Monday" -> "1"
-                    if tok.isdigit():
-                        n = int(tok)
-                        if 1 <= n <= 7:
-                            wd_ints.append(n-1)
-                    else:
-                        wd = name_to_int.get(tok.upper(), None)
-                        if wd is not None:
-                            wd_ints.append(wd)
-                if wd_ints:
-                    placeholders = ",".join(["%s"] * len(wd_ints))
-                    where.append(f"{weekday_expr} IN ({placeholders})")
-                    params.extend(wd_ints)
-
-        # Alcohol filters (support one-hot or categorical)
-        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]
-        if alcohol_raw:
-            # One-hot map (ALCOHOL_USED_Yes/No/Unknown) if present
-            onehot_yes = "ALCOHOL_USED_Yes" in cols
-            onehot_no  = "ALCOHOL_USED_No" in cols
-            onehot_unk = "ALCOHOL_USED_Unknown" in cols
-            cat_alcohol_col = next((c for c in ["ALCOHOL_USED","ALCOHOL_INVOLVEMENT","ALCOHOL","ALCOHOL_FLAG"] if c in cols), None)
-
-            if onehot_yes or onehot_no or onehot_unk:
-                pieces = []
-                for v in alcohol_raw:
-                    col = f"ALCOHOL_USED_{v}"
-                    if col in cols:
-                        pieces.append(f"COALESCE(`{col}`,0)=1")
-                if pieces:
-                    where.append("(" + " OR ".join(pieces) + ")")
-            elif cat_alcohol_col:
-                placeholders = ",".join(["%s"] * len(alcohol_raw))
-                where.append(f"UPPER(TRIM(`{cat_alcohol_col}`)) IN ({placeholders})")
-                params.extend([v.upper() for v in alcohol_raw])
-
-        # Hour range (from HOUR_COMMITTED / TIME_COMMITTED / DATE_COMMITTED)
-        hour_from = q.get("hour_from"); hour_to = q.get("hour_to")
-        if hour_from is not None and hour_to is not None:
-            if "HOUR_COMMITTED" in cols:
-                where.append("CAST(`HOUR_COMMITTED` AS SIGNED) BETWEEN %s AND %s")
-                params.extend([hour_from, hour_to])
-            elif "TIME_COMMITTED" in cols:
-                where.append("HOUR(`TIME_COMMITTED`) BETWEEN %s AND %s")
-                params.extend([hour_from, hour_to])
-            elif "DATE_COMMITTED" in cols:
-                where.append("HOUR(`DATE_COMMITTED`) BETWEEN %s AND %s")
-                params.extend([hour_from, hour_to])
-
-        # Age range (detect likely age column)
-        age_from = q.get("age_from"); age_to = q.get("age_to")
-        age_col = next((c for c in ["AGE","VICTIM_AGE","AGE_OF_VICTIM"] if c in cols), None)
-        if age_col and age_from is not None and age_to is not None:
-            where.append(f"CAST(`{age_col}` AS SIGNED) BETWEEN %s AND %s")
-            params.extend([age_from, age_to])
-
-        where_sql = " WHERE " + " AND ".join(where) if where else ""
+def _gender_proportion(table: str, args) -> tuple[dict, int]:
+    try:
+        roles, where_sql, params = _chart_filters(table, args)
+        gender_cat_col = roles["gender_cat"]
+        onehot = roles["gender_onehot"]
 
         # -------- Compute gender counts within the filtered set --------
         labels = ["Male", "Female", "Unknown"]
@@ -143,333 +45,99 @@ def gender_proportion():
             # Use text values; everything else -> Unknown
             sql = f"""
                 SELECT
-                  SUM(CASE WHEN UPPER(TRIM(`{gender_cat_col}`)) IN ('MALE','M') THEN 1 ELSE 0 END) AS male_cnt,
-                  SUM(CASE WHEN UPPER(TRIM(`{gender_cat_col}`)) IN ('FEMALE','F') THEN 1 ELSE 0 END) AS female_cnt,
+                  SUM(CASE WHEN UPPER(TRIM(`{gender_cat_col}`)) IN {GENDER_MALE} THEN 1 ELSE 0 END) AS male_cnt,
+                  SUM(CASE WHEN UPPER(TRIM(`{gender_cat_col}`)) IN {GENDER_FEMALE} THEN 1 ELSE 0 END) AS female_cnt,
                   SUM(CASE WHEN (`{gender_cat_col}` IS NULL OR TRIM(`{gender_cat_col}`) = '' OR
-                                UPPER(TRIM(`{gender_cat_col}`)) NOT IN ('MALE','M','FEMALE','F')) THEN 1 ELSE 0 END) AS unk_cnt
-                FROM `{table}`
-                {where_sql}
+                                UPPER(TRIM(`{gender_cat_col}`)) NOT IN {GENDER_KNOWN}) THEN 1 ELSE 0 END) AS unk_cnt
+                FROM `{table}`{where_sql}
             """
-            cur.execute(sql, params)
-            m, f, u = cur.fetchone()
-            counts["Male"] = int(m or 0)
-            counts["Female"] = int(f or 0)
-            counts["Unknown"] = int(u or 0)
         else:
             # One-hot route; only SUM columns that exist
-            pieces = []
-            if onehot_male:   pieces.append(f"SUM(COALESCE(`{onehot_male}`,0)) AS male_cnt")
-            if onehot_female: pieces.append(f"SUM(COALESCE(`{onehot_female}`,0)) AS female_cnt")
-            if onehot_unknown:pieces.append(f"SUM(COALESCE(`{onehot_unknown}`,0)) AS unk_cnt")
-            pieces.append("COUNT(*) AS total_rows")
-
-            if len(pieces) == 1:  # nothing to sum and no total_rows
-                cur.close(); conn.close()
-                return jsonify(success=False, message=(
+            if not (onehot["male"] or onehot["female"] or onehot["unknown"]):
+                return dict(success=False, message=(
                     "No gender columns found. Expected one of: "
                     "categorical (GENDER/SEX/VICTIM_GENDER/SEX_OF_VICTIM) or one-hot (GENDER_*/SEX_*)."
                 )), 200
+            male, female, unk = (f"SUM(COALESCE(`{onehot[k]}`,0))" if onehot[k] else "0"
+                                 for k in ("male", "female", "unknown"))
+            sql = f"SELECT {male}, {female}, {unk}, COUNT(*) FROM `{table}`{where_sql}"
 
-            sql = f"SELECT {', '.join(pieces)} FROM `{table}`{where_sql}"
-            cur.execute(sql, params)
-            row = cur.fetchone()
-            desc = [d[0] for d in cur.description]
-            row_map = {desc[i]: row[i] for i in range(len(desc))}
-
-            total_rows = int(row_map.get("total_rows", 0) or 0)
-            male_cnt = int(row_map.get("male_cnt", 0) or 0)
-            female_cnt = int(row_map.get("female_cnt", 0) or 0)
-            unk_cnt = int(row_map.get("unk_cnt", 0) or 0)
+        conn = get_db_connection()
+        try:
+            row = run_query(conn, sql, params)[0]
+        finally:
+            conn.close()
 
+        male_cnt, female_cnt, unk_cnt = (int(v or 0) for v in row[:3])
+        if not gender_cat_col and not onehot["female"]:
             # If female column missing, infer from remainder
-            if not onehot_female:
-                female_cnt = max(total_rows - male_cnt - unk_cnt, 0)
-
-            counts["Male"], counts["Female"], counts["Unknown"] = male_cnt, female_cnt, unk_cnt
-
-        cur.close(); conn.close()
+            female_cnt = max(int(row[3] or 0) - male_cnt - unk_cnt, 0)
+        counts["Male"], counts["Female"], counts["Unknown"] = male_cnt, female_cnt, unk_cnt
 
         total = sum(counts.values())
         if total == 0:
-            return jsonify(success=True, data={"labels": [], "values": []}), 200
+            return dict(success=True, data={"labels": [], "values": []}), 200
 
-        return jsonify(
+        return dict(
             success=True,
             data={"labels": labels, "values": [counts[l] for l in labels]}
         ), 200
 
     except Exception as e:
-        return jsonify(success=False, message=f"{type(e).__name__}: {e}"), 500
+        return dict(success=False, message=f"{type(e).__name__}: {e}"), 500
 
 
-@api_bp.route("/kpis", methods=["GET"])
-def kpis():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
-
-    table = session.get("forecast_table", "accidents")
+def _kpis(table: str, args) -> tuple[dict, int]:
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Columns present?
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {r[0] for r in cur.fetchall()}
-
-        # Victim count column (if any)
-        victim_candidates = ["VICTIM_COUNT", "VICTIM COUNT", "TOTAL_VICTIMS", "NUM_VICTIMS"]
-        victim_col = next((c for c in victim_candidates if c in cols), None)
-
-        # Hour source for BETWEEN filters
-        hour_where_col = None
-        hour_expr = None
-        if "HOUR_COMMITTED" in cols:
-            hour_expr = "CAST(`HOUR_COMMITTED` AS SIGNED)"
-            hour_where_col = "`HOUR_COMMITTED` IS NOT NULL"
-        elif "TIME_COMMITTED" in cols:
-            hour_expr = "HOUR(`TIME_COMMITTED`)"
-            hour_where_col = "`TIME_COMMITTED` IS NOT NULL"
-        elif "DATE_COMMITTED" in cols:
-            hour_expr = "HOUR(`DATE_COMMITTED`)"
-            hour_where_col = "`DATE_COMMITTED` IS NOT NULL"
-
-        # ---- Build WHERE (same pattern as other endpoints) ----
-        q = request.args
-        where = []
-        params = []
-
-        if hour_where_col:
-            where.append(hour_where_col)
-
-        # Location
-        location = (q.get("location") or "").strip()
-        if location and "BARANGAY" in cols:
-            where.append("BARANGAY = %s")
-            params.append(location)
+        hour = table_roles(table)["hour"]
+        roles, where_sql, params = _chart_filters(table, args, extra=[hour and hour["not_null"]])
+        sql, aliases = kpi_sql(table, roles, where_sql)
 
-        # Gender filter (works even if your chart also filters by gender)
-        gender_req = (q.get("gender") or "").strip().lower()
-        gender_cat = next((c for c in ["GENDER","SEX","VICTIM_GENDER","SEX_OF_VICTIM"] if c in cols), None)
-        # One-hot fallbacks
-        present_onehots = {c for c in cols if c.startswith(("GENDER_","SEX_"))}
-        onehot_male   = next((c for c in present_onehots if c.lower().endswith("male")),   None)
-        onehot_female = next((c for c in present_onehots if c.lower().endswith("female")), None)
-        onehot_other  = next((c for c in present_onehots if c.lower().endswith("other")),  None)
-
-        if gender_req:
-            if gender_cat:
-                where.append(f"UPPER(TRIM(`{gender_cat}`)) = %s")
-                params.append(gender_req.upper())
-            else:
-                gh = {
-                    "male": onehot_male,
-                    "female": onehot_female,
-                    "other": onehot_other
-                }.get(gender_req)
-                if gh:
-                    where.append(f"COALESCE(`{gh}`,0) = 1")
-
-        # Day of Week
-        day_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
-        if day_raw:
-            if "DATE_COMMITTED" in cols:
-                weekday_expr = "WEEKDAY(`DATE_COMMITTED`)"  # 0..6
-            elif "WEEKDAY" in cols:
-                weekday_expr = "CAST(`WEEKDAY` AS SIGNED)"
-            else:
-                weekday_expr = None
-
-            if weekday_expr:
-                name_to_int = {"MONDAY":0,"TUESDAY":1,"WEDNESDAY":2,"THURSDAY":3,"FRIDAY":4,"SATURDAY":5,"SUNDAY":6}
-                wd_ints = []
-                for item in day_raw:
-                    tok = item.split(".", 1)[0].strip()
-                    if tok.isdigit():
-                        n = int(tok)
-                        if 1 <= n <= 7: wd_ints.append(n-1)
-                    else:
-                        v = name_to_int.get(tok.upper(), None)
-                        if v is not None: wd_ints.append(v)
-                if wd_ints:
-                    placeholders = ",".join(["%s"] * len(wd_ints))
-                    where.append(f"{weekday_expr} IN ({placeholders})")
-                    params.extend(wd_ints)
-
-        # Alcohol (one-hot or categorical)
-        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]
-        if alcohol_raw:
-            onehot_yes = "ALCOHOL_USED_Yes" in cols
-            onehot_no  = "ALCOHOL_USED_No" in cols
-            onehot_unk = "ALCOHOL_USED_Unknown" in cols
-            cat_alcohol_col = next((c for c in ["ALCOHOL_USED","ALCOHOL_INVOLVEMENT","ALCOHOL","ALCOHOL_FLAG"] if c in cols), None)
-
-            if onehot_yes or onehot_no or onehot_unk:
-                pieces = []
-                for v in alcohol_raw:
-                    col = f"ALCOHOL_USED_{v}"
-                    if col in cols:
-                        pieces.append(f"COALESCE(`{col}`,0)=1")
-                if pieces:
-                    where.append("(" + " OR ".join(pieces) + ")")
-            elif cat_alcohol_col:
-                placeholders = ",".join(["%s"] * len(alcohol_raw))
-                where.append(f"UPPER(TRIM(`{cat_alcohol_col}`)) IN ({placeholders})")
-                params.extend([v.upper() for v in alcohol_raw])
-
-        # Hour range
-        hour_from = q.get("hour_from"); hour_to = q.get("hour_to")
-        if hour_expr and hour_from is not None and hour_to is not None:
-            where.append(f"{hour_expr} BETWEEN %s AND %s")
-            params.extend([hour_from, hour_to])
-
-        # Age range
-        age_from = q.get("age_from"); age_to = q.get("age_to")
-        age_col = next((c for c in ["AGE","VICTIM_AGE","AGE_OF_VICTIM"] if c in cols), None)
-        if age_col and age_from is not None and age_to is not None:
-            where.append(f"CAST(`{age_col}` AS SIGNED) BETWEEN %s AND %s")
-            params.extend([age_from, age_to])
-
-        where_sql = " WHERE " + " AND ".join(where) if where else ""
-
-        # ---- Query the KPIs ----
-        # 1) Total accidents = row count
-        cur.execute(f"SELECT COUNT(*) FROM `{table}`{where_sql}", params)
-        total_accidents = int(cur.fetchone()[0] or 0)
-
-        # 2) Total victims = SUM(victim_col) if present, else NULL/0
-        total_victims = None
-        avg_victims_per_accident = None
-        if victim_col:
-            cur.execute(
-                f"SELECT SUM(NULLIF(CAST(`{victim_col}` AS DECIMAL(18,4)),0)) FROM `{table}`{where_sql}",
-                params
-            )
-            tv = cur.fetchone()[0]
-            total_victims = float(tv) if tv is not None else 0.0
-            if total_accidents > 0 and total_victims is not None:
-                avg_victims_per_accident = float(total_victims) / float(total_accidents)
-
-        # 3) Alcohol involvement = Yes / Total (include Unknown in denominator, to match your BI card)
-        alcohol_involvement_rate = None
-        # Handle both one-hot and categorical
-        if {"ALCOHOL_USED_Yes","ALCOHOL_USED_No","ALCOHOL_USED_Unknown"} & cols or \
-           any(c in cols for c in ["ALCOHOL_USED","ALCOHOL_INVOLVEMENT","ALCOHOL","ALCOHOL_FLAG"]):
-            # Count "Yes"
-            if "ALCOHOL_USED_Yes" in cols:
-                cur.execute(f"SELECT SUM(COALESCE(`ALCOHOL_USED_Yes`,0)) FROM `{table}`{where_sql}", params)
-                yes_cnt = int(cur.fetchone()[0] or 0)
-            else:
-                cat_alcohol_col = next((c for c in ["ALCOHOL_USED","ALCOHOL_INVOLVEMENT","ALCOHOL","ALCOHOL_FLAG"] if c in cols), None)
-                if cat_alcohol_col:
-                    cur.execute(
-                        f"SELECT SUM(CASE WHEN UPPER(TRIM(`{cat_alcohol_col}`))='YES' THEN 1 ELSE 0 END) FROM `{table}`{where_sql}",
-                        params
-                    )
-                    yes_cnt = int(cur.fetchone()[0] or 0)
-                else:
-                    yes_cnt = None
-
-            if yes_cnt is not None and total_accidents > 0:
-                alcohol_involvement_rate = yes_cnt / float(total_accidents)
-
-        cur.close(); conn.close()
+        conn = get_db_connection()
+        try:
+            row = run_query(conn, sql, params)[0]
+        finally:
+            conn.close()
 
-        return jsonify(success=True, data={
-            "total_accidents": total_accidents,
-            "total_victims": total_victims if total_victims is not None else 0,
-            "avg_victims_per_accident": avg_victims_per_accident if avg_victims_per_accident is not None else None,
-            "alcohol_involvement_rate": alcohol_involvement_rate if alcohol_involvement_rate is not None else None
-        }), 200
+        return dict(success=True, data=compute_kpis(aliases, row)), 200
 
     except Exception as e:
-        return jsonify(success=False, message=str(e)), 500
+        return dict(success=False, message=str(e)), 500
 
 
 
-@api_bp.route("/accidents_by_day", methods=["GET"])
-def accidents_by_day():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
-
-    table = session.get("forecast_table", "accidents")
-    if table not in list_tables():
-        return jsonify(success=False, message="Table not found"), 404
-
-    victim_cols = ["VICTIM_COUNT", "VICTIM COUNT"]
+def _accidents_by_day(table: str, args) -> tuple[dict, int]:
+    if not table_exists(table):
+        return dict(success=False, message="Table not found"), 404
 
     try:
+        weekday_expr = table_roles(table)["weekday"]
+        if not weekday_expr:
+            return dict(success=False, message="No day column found (DATE_COMMITTED/WEEKDAY)"), 200
+        # the chart is the weekday breakdown, so it always shows every day
+        roles, where_sql, params = _chart_filters(table, args, extra=[f"{weekday_expr} IS NOT NULL"], skip=("weekdays",))
+        victim_col = roles["victim"]
+
         conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {r[0] for r in cur.fetchall()}
-
-        victim_col = next((c for c in victim_cols if c in cols), None)
-
-        # --- Build WHERE filters ---
-        where_clauses = []
-        params = []
-
-        location = request.args.get("location")
-        if location and "BARANGAY" in cols:
-            where_clauses.append("BARANGAY = %s")
-            params.append(location)
-
-        gender = request.args.get("gender")
-        if gender and "GENDER" in cols:
-            where_clauses.append("UPPER(TRIM(GENDER)) = %s")
-            params.append(gender.upper())
-
-        alcohol = request.args.get("alcohol")
-        if alcohol and "ALCOHOL_USED" in cols:
-            values = alcohol.split(",")
-            placeholders = ",".join(["%s"] * len(values))
-            where_clauses.append(f"ALCOHOL_USED IN ({placeholders})")
-            params.extend(values)
-
-        # hours & ages (optional)
-        hour_from = request.args.get("hour_from")
-        hour_to = request.args.get("hour_to")
-        if hour_from and hour_to and "HOUR_COMMITTED" in cols:
-            where_clauses.append("HOUR_COMMITTED BETWEEN %s AND %s")
-            params.extend([hour_from, hour_to])
-
-        age_from = request.args.get("age_from")
-        age_to = request.args.get("age_to")
-        if age_from and age_to and "AGE" in cols:
-            where_clauses.append("AGE BETWEEN %s AND %s")
-            params.extend([age_from, age_to])
-
-        # Combine into WHERE
-        where_sql = " AND ".join(where_clauses)
-        if where_sql:
-            where_sql = "AND " + where_sql
-
-        # --- Run weekday query ---
-        weekday_expr = "WEEKDAY(DATE_COMMITTED)" if "DATE_COMMITTED" in cols else "CAST(`WEEKDAY` AS SIGNED)"
-        cur.execute(f"""
-            SELECT {weekday_expr} AS wd, COUNT(*) AS cnt
-            FROM `{table}`
-            WHERE {weekday_expr} IS NOT NULL {where_sql}
-            GROUP BY wd
-            ORDER BY wd
-        """, params)
-        rows_cnt = cur.fetchall()
-
-        avg_map = {}
-        if victim_col:
-            cur.execute(f"""
-                SELECT {weekday_expr} AS wd, AVG(NULLIF(`{victim_col}`, 0)) AS avg_v
-                FROM `{table}`
-                WHERE {weekday_expr} IS NOT NULL {where_sql}
+        try:
+            rows_cnt = run_query(conn, f"""
+                SELECT {weekday_expr} AS wd, COUNT(*) AS cnt
+                FROM `{table}`{where_sql}
                 GROUP BY wd
                 ORDER BY wd
             """, params)
-            for wd, avg_v in cur.fetchall():
-                avg_map[int(wd)] = float(avg_v) if avg_v is not None else None
 
-        cur.close()
-        conn.close()
+            avg_map = {}
+            if victim_col:
+                for wd, avg_v in run_query(conn, f"""
+                    SELECT {weekday_expr} AS wd, AVG(NULLIF(`{victim_col}`, 0)) AS avg_v
+                    FROM `{table}`{where_sql}
+                    GROUP BY wd
+                    ORDER BY wd
+                """, params):
+                    avg_map[int(wd)] = float(avg_v) if avg_v is not None else None
+        finally:
+            conn.close()
 
         # Format output same as before
         day_labels = ["1. Monday", "2. Tuesday", "3. Wednesday",
@@ -479,312 +147,90 @@ def accidents_by_day():
         counts = [counts_by_wd.get(i, 0) for i in range(7)]
         avg_victims = [round(avg_map.get(i, 0), 2) if avg_map else None for i in range(7)]
 
-        return jsonify(success=True, data={"days": days, "counts": counts, "avg_victims": avg_victims})
+        return dict(success=True, data={"days": days, "counts": counts, "avg_victims": avg_victims}), 200
     except Exception as e:
-        return jsonify(success=False, message=str(e)), 500
+        return dict(success=False, message=str(e)), 500
 
 
-@api_bp.route("/top_barangays", methods=["GET"])
-def top_barangays():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
-
-    table = session.get("forecast_table", "accidents")
+def _top_barangays(table: str, args) -> tuple[dict, int]:
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Inspect columns
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {r[0] for r in cur.fetchall()}
-
-        # Barangay column
-        brgy_candidates = ["BARANGAY", "Barangay", "BRGY", "BRGY_NAME", "LOCATION", "STATION"]
-        brgy_col = next((c for c in brgy_candidates if c in cols), None)
+        brgy_col = table_roles(table)["barangay"]
         if not brgy_col:
-            return jsonify(success=False, message="No BARANGAY-like column found"), 200
-
-        # --- Build WHERE filters, mirroring other endpoints ---
-        where_clauses = [f"`{brgy_col}` IS NOT NULL AND TRIM(`{brgy_col}`) <> ''"]
-        params = []
-
-        q = request.args
-
-        # Location exact match (useful if you later scope "top within a station")
-        location = (q.get("location") or "").strip()
-        if location and "BARANGAY" in cols:
-            where_clauses.append("BARANGAY = %s")
-            params.append(location)
-
-        # Gender: categorical or one-hot
-        gender_req = (q.get("gender") or "").strip().lower()
-        gender_cat = next((c for c in ["GENDER", "SEX", "VICTIM_GENDER", "SEX_OF_VICTIM"] if c in cols), None)
-        gender_onehot = {
-            "male":   next((c for c in cols if c.upper().endswith("MALE")   and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "female": next((c for c in cols if c.upper().endswith("FEMALE") and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "other":  next((c for c in cols if c.upper().endswith("OTHER")  and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-        }
-        if gender_req:
-            if gender_cat:
-                where_clauses.append(f"UPPER(TRIM(`{gender_cat}`)) = %s")
-                params.append(gender_req.upper())
-            elif gender_onehot.get(gender_req):
-                where_clauses.append(f"COALESCE(`{gender_onehot[gender_req]}`,0) = 1")
-
-        # Day of week (accepts "1. Monday", "Monday", or "1")
-        day_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
-        if day_raw:
-            if "DATE_COMMITTED" in cols:
-                weekday_expr = "WEEKDAY(`DATE_COMMITTED`)"  # 0=Mon..6=Sun
-            elif "WEEKDAY" in cols:
-                weekday_expr = "CAST(`WEEKDAY` AS SIGNED)"
-            else:
-                weekday_expr = None
-
-            if weekday_expr:
-                # Normalize to ints 0..6
-                name_to_int = {"MONDAY":0,"TUESDAY":1,"WEDNESDAY":2,"THURSDAY":3,"FRIDAY":4,"SATURDAY":5,"SUNDAY":6}
-                wd_ints = []
-                for item in day_raw:
-                    tok = item.split(".", 1)[0].strip()  # "1. Monday" -> "1"
-                    if tok.isdigit():
-                        # Your UI labels are 1..7; convert to 0..6
-                        n = int(tok)
-                        if 1 <= n <= 7: wd_ints.append((n-1))
-                    else:
-                        wd_ints.append(name_to_int.get(tok.upper(), None))
-                wd_ints = [w for w in wd_ints if w is not None]
-                if wd_ints:
-                    placeholders = ",".join(["%s"] * len(wd_ints))
-                    where_clauses.append(f"{weekday_expr} IN ({placeholders})")
-                    params.extend(wd_ints)
-
-        # Alcohol (supports one-hot or categorical)
-        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]
-        if alcohol_raw:
-            onehot_map = {k: (k and f"ALCOHOL_USED_{k}" in cols) for k in ["Yes","No","Unknown"]}
-            cat_col = next((c for c in ["ALCOHOL_USED","ALCOHOL_INVOLVEMENT","ALCOHOL","ALCOHOL_FLAG"] if c in cols), None)
-
-            if any(onehot_map.values()):
-                pieces = []
-                for v in alcohol_raw:
-                    col = f"ALCOHOL_USED_{v}"
-                    if col in cols:
-                        pieces.append(f"COALESCE(`{col}`,0)=1")
-                if pieces:
-                    where_clauses.append("(" + " OR ".join(pieces) + ")")
-            elif cat_col:
-                placeholders = ",".join(["%s"] * len(alcohol_raw))
-                where_clauses.append(f"UPPER(TRIM(`{cat_col}`)) IN ({placeholders})")
-                params.extend([v.upper() for v in alcohol_raw])
-
-        # Hour range
-        hour_from = q.get("hour_from"); hour_to = q.get("hour_to")
-        if hour_from is not None and hour_to is not None:
-            if "HOUR_COMMITTED" in cols:
-                where_clauses.append("CAST(`HOUR_COMMITTED` AS SIGNED) BETWEEN %s AND %s")
-            elif "TIME_COMMITTED" in cols:
-                where_clauses.append("HOUR(`TIME_COMMITTED`) BETWEEN %s AND %s")
-            elif "DATE_COMMITTED" in cols:
-                where_clauses.append("HOUR(`DATE_COMMITTED`) BETWEEN %s AND %s")
-            else:
-                pass
-            params.extend([hour_from, hour_to])
-
-        # Age range
-        age_from = q.get("age_from"); age_to = q.get("age_to")
-        age_col = next((c for c in ["AGE","VICTIM_AGE","AGE_OF_VICTIM"] if c in cols), None)
-        if age_col and age_from is not None and age_to is not None:
-            where_clauses.append(f"CAST(`{age_col}` AS SIGNED) BETWEEN %s AND %s")
-            params.extend([age_from, age_to])
-
-        where_sql = " AND ".join(where_clauses)
-        if where_sql:
-            where_sql = "WHERE " + where_sql
+            return dict(success=False, message="No BARANGAY-like column found"), 200
+        _, where_sql, params = _chart_filters(
+            table, args, extra=[f"`{brgy_col}` IS NOT NULL AND TRIM(`{brgy_col}`) <> ''"])
 
         # Query top 10 with filters applied
-        cur.execute(f"""
-            SELECT `{brgy_col}` AS brgy, COUNT(*) AS cnt
-            FROM `{table}`
-            {where_sql}
-            GROUP BY brgy
-            ORDER BY cnt DESC
-            LIMIT 10
-        """, params)
-        rows = cur.fetchall()
-        cur.close(); conn.close()
+        conn = get_db_connection()
+        try:
+            rows = run_query(conn, f"""
+                SELECT `{brgy_col}` AS brgy, COUNT(*) AS cnt
+                FROM `{table}`{where_sql}
+                GROUP BY brgy
+                ORDER BY cnt DESC
+                LIMIT 10
+            """, params)
+        finally:
+            conn.close()
 
         names = [r[0] for r in rows]
         counts = [int(r[1]) for r in rows]
 
         # Optional: echo a small suffix if scoped by Location or Gender etc.
+        q = args
+        location = (q.get("location") or "").strip()
+        gender_req = (q.get("gender") or "").strip().lower()
         title_bits = []
         if location: title_bits.append(f" — {location}")
         if gender_req: title_bits.append(f" — {gender_req.capitalize()}")
         title_suffix = "".join(title_bits) if title_bits else ""
 
-        return jsonify(success=True, data={"names": names, "counts": counts, "title_suffix": title_suffix})
+        return dict(success=True, data={"names": names, "counts": counts, "title_suffix": title_suffix}), 200
     except Exception as e:
-        return jsonify(success=False, message=str(e)), 500
+        return dict(success=False, message=str(e)), 500
 
 
-@api_bp.route("/alcohol_by_hour", methods=["GET"])
-def alcohol_by_hour():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
-
-    table = session.get("forecast_table", "accidents")
+def _alcohol_by_hour(table: str, args) -> tuple[dict, int]:
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Inspect columns
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {r[0] for r in cur.fetchall()}
-
-        # Hour source
-        hour_expr = None; hour_where_col = None
-        if "HOUR_COMMITTED" in cols:
-            hour_expr = "CAST(`HOUR_COMMITTED` AS SIGNED)"
-            hour_where_col = "`HOUR_COMMITTED` IS NOT NULL"
-        elif "TIME_COMMITTED" in cols:
-            hour_expr = "HOUR(`TIME_COMMITTED`)"
-            hour_where_col = "`TIME_COMMITTED` IS NOT NULL"
-        elif "DATE_COMMITTED" in cols:
-            hour_expr = "HOUR(`DATE_COMMITTED`)"
-            hour_where_col = "`DATE_COMMITTED` IS NOT NULL"
-        else:
-            return jsonify(success=False, message="No hour column found (HOUR_COMMITTED/TIME_COMMITTED/DATE_COMMITTED)"), 200
-
-        # Alcohol schema detection (one-hot or categorical)
-        has_yes = "ALCOHOL_USED_Yes" in cols
-        has_no  = "ALCOHOL_USED_No" in cols
-        has_unk = "ALCOHOL_USED_Unknown" in cols
-        one_hot_any = has_yes or has_no or has_unk
-
-        cat_candidates = ["ALCOHOL_USED", "ALCOHOL_INVOLVEMENT", "ALCOHOL", "ALCOHOL_FLAG"]
-        cat_col = next((c for c in cat_candidates if c in cols), None)
+        roles = table_roles(table)
+        if not roles["hour"]:
+            return dict(success=False, message="No hour column found (HOUR_COMMITTED/TIME_COMMITTED/DATE_COMMITTED)"), 200
 
-        if not (one_hot_any or cat_col):
-            return jsonify(success=False, message="No alcohol involvement columns found."), 200
+        onehot = roles["alcohol_onehot"]
+        cat_col = roles["alcohol_cat"]
+        if not (any(onehot.values()) or cat_col):
+            return dict(success=False, message="No alcohol involvement columns found."), 200
 
-        # -------- Build WHERE filters (same as other endpoints) --------
-        where = [hour_where_col]
-        params = []
-        q = request.args
-
-        # Location
-        location = (q.get("location") or "").strip()
-        if location and "BARANGAY" in cols:
-            where.append("BARANGAY = %s")
-            params.append(location)
-
-        # Gender (categorical or one-hot)
-        gender_req = (q.get("gender") or "").strip().lower()
-        gender_cat = next((c for c in ["GENDER", "SEX", "VICTIM_GENDER", "SEX_OF_VICTIM"] if c in cols), None)
-        gender_onehot = {
-            "male":   next((c for c in cols if c.upper().endswith("MALE")   and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "female": next((c for c in cols if c.upper().endswith("FEMALE") and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "other":  next((c for c in cols if c.upper().endswith("OTHER")  and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-        }
-        if gender_req:
-            if gender_cat:
-                where.append(f"UPPER(TRIM(`{gender_cat}`)) = %s")
-                params.append(gender_req.upper())
-            elif gender_onehot.get(gender_req):
-                where.append(f"COALESCE(`{gender_onehot[gender_req]}`,0) = 1")
-
-        # Day of week (accepts "1. Monday", "Monday", or "1")
-        day_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
-        if day_raw:
-            if "DATE_COMMITTED" in cols:
-                weekday_expr = "WEEKDAY(`DATE_COMMITTED`)"  # 0=Mon..6=Sun
-            elif "WEEKDAY" in cols:
-                weekday_expr = "CAST(`WEEKDAY` AS SIGNED)"
-            else:
-                weekday_expr = None
-
-            if weekday_expr:
-                name_to_int = {"MONDAY":0,"TUESDAY":1,"WEDNESDAY":2,"THURSDAY":3,"FRIDAY":4,"SATURDAY":5,"SUNDAY":6}
-                wd_ints = []
-                for item in day_raw:
-                    tok = item.split(".", 1)[0].strip()
-                    if tok.isdigit():
-                        n = int(tok)
-                        if 1 <= n <= 7: wd_ints.append(n-1)
-                    else:
-                        wd_ints.append(name_to_int.get(tok.upper(), None))
-                wd_ints = [w for w in wd_ints if w is not None]
-                if wd_ints:
-                    placeholders = ",".join(["%s"] * len(wd_ints))
-                    where.append(f"{weekday_expr} IN ({placeholders})")
-                    params.extend(wd_ints)
-
-        # Alcohol subset (optional): if user ticks specific statuses, restrict to them
-        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]
-        if alcohol_raw:
-            if one_hot_any:
-                pieces = []
-                for v in alcohol_raw:
-                    col = f"ALCOHOL_USED_{v}"
-                    if col in cols:
-                        pieces.append(f"COALESCE(`{col}`,0) = 1")
-                if pieces:
-                    where.append("(" + " OR ".join(pieces) + ")")
-            elif cat_col:
-                placeholders = ",".join(["%s"] * len(alcohol_raw))
-                where.append(f"UPPER(TRIM(`{cat_col}`)) IN ({placeholders})")
-                params.extend([v.upper() for v in alcohol_raw])
-
-        # Hour range
-        hour_from = q.get("hour_from"); hour_to = q.get("hour_to")
-        if hour_from is not None and hour_to is not None:
-            if "HOUR_COMMITTED" in cols:
-                where.append("CAST(`HOUR_COMMITTED` AS SIGNED) BETWEEN %s AND %s")
-            elif "TIME_COMMITTED" in cols:
-                where.append("HOUR(`TIME_COMMITTED`) BETWEEN %s AND %s")
-            elif "DATE_COMMITTED" in cols:
-                where.append("HOUR(`DATE_COMMITTED`) BETWEEN %s AND %s")
-            params.extend([hour_from, hour_to])
-
-        # Age range
-        age_from = q.get("age_from"); age_to = q.get("age_to")
-        age_col = next((c for c in ["AGE","VICTIM_AGE","AGE_OF_VICTIM"] if c in cols), None)
-        if age_col and age_from is not None and age_to is not None:
-            where.append(f"CAST(`{age_col}` AS SIGNED) BETWEEN %s AND %s")
-            params.extend([age_from, age_to])
-
-        where_sql = " AND ".join(where)
-        if where_sql:
-            where_sql = "WHERE " + where_sql
+        hour_expr = roles["hour"]["expr"]
+        _, where_sql, params = _chart_filters(table, args, extra=[roles["hour"]["not_null"]])
 
         # ----- Build SELECT for counts per hour (handles one-hot or categorical) -----
-        if one_hot_any:
-            yes_expr = "SUM(COALESCE(`ALCOHOL_USED_Yes`,0))" if has_yes else "0"
-            no_expr  = "SUM(COALESCE(`ALCOHOL_USED_No`,0))"  if has_no  else "0"
-            unk_expr = "SUM(COALESCE(`ALCOHOL_USED_Unknown`,0))" if has_unk else "0"
+        if any(onehot.values()):
+            yes_expr, no_expr, unk_expr = (f"SUM(COALESCE(`{onehot[v]}`,0))" if onehot[v] else "0"
+                                           for v in ("Yes", "No", "Unknown"))
         else:
             # categorical normalization
-            yes_expr = f"SUM(CASE WHEN UPPER(TRIM(`{cat_col}`)) IN ('YES','Y','1','TRUE') THEN 1 ELSE 0 END)"
-            no_expr  = f"SUM(CASE WHEN UPPER(TRIM(`{cat_col}`)) IN ('NO','N','0','FALSE') THEN 1 ELSE 0 END)"
-            unk_expr = f"SUM(CASE WHEN `{cat_col}` IS NULL OR UPPER(TRIM(`{cat_col}`)) NOT IN ('YES','Y','1','TRUE','NO','N','0','FALSE') THEN 1 ELSE 0 END)"
+            yes_expr = f"SUM(CASE WHEN UPPER(TRIM(`{cat_col}`)) IN {ALCOHOL_YES} THEN 1 ELSE 0 END)"
+            no_expr  = f"SUM(CASE WHEN UPPER(TRIM(`{cat_col}`)) IN {ALCOHOL_NO} THEN 1 ELSE 0 END)"
+            unk_expr = f"SUM(CASE WHEN `{cat_col}` IS NULL OR UPPER(TRIM(`{cat_col}`)) NOT IN {ALCOHOL_KNOWN} THEN 1 ELSE 0 END)"
 
         sql = f"""
             SELECT {hour_expr} AS hr,
                    {yes_expr} AS yes_cnt,
                    {no_expr}  AS no_cnt,
                    {unk_expr} AS unk_cnt
-            FROM `{table}`
-            {where_sql}
+            FROM `{table}`{where_sql}
             GROUP BY hr
             ORDER BY hr
         """
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-        cur.close(); conn.close()
+        conn = get_db_connection()
+        try:
+            rows = run_query(conn, sql, params)
+        finally:
+            conn.close()
 
         if not rows:
-            return jsonify(success=True, data={"hours": [], "yes": [], "no": [], "unknown": [], "yes_pct": [], "no_pct": [], "unknown_pct": []}), 200
+            return dict(success=True, data={"hours": [], "yes": [], "no": [], "unknown": [], "yes_pct": [], "no_pct": [], "unknown_pct": []}), 200
 
         by_hour = {int(hr): (int(yes), int(no), int(unk)) for hr, yes, no, unk in rows if hr is not None}
         hours = list(range(24))
@@ -799,146 +245,41 @@ def alcohol_by_hour():
             else:
                 yes_pct.append(0.0); no_pct.append(0.0); unk_pct.append(0.0)
 
-        return jsonify(success=True, data={
+        return dict(success=True, data={
             "hours": hours,
             "yes_pct": yes_pct, "no_pct": no_pct, "unknown_pct": unk_pct
-        })
+        }), 200
     except Exception as e:
-        return jsonify(success=False, message=str(e)), 500
+        return dict(success=False, message=str(e)), 500
 
 
-@api_bp.route("/victims_by_age", methods=["GET"])
-def victims_by_age():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
-
-    table = session.get("forecast_table", "accidents")
+def _victims_by_age(table: str, args) -> tuple[dict, int]:
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # --- detect columns
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {r[0] for r in cur.fetchall()}
-
-        # age columns (numeric first)
-        age_num_candidates = ["AGE", "AGE_YEARS", "AGE_OF_VICTIM"]
-        age_num_col = next((c for c in age_num_candidates if c in cols), None)
-
-        # age group (categorical) columns
-        age_grp_candidates = ["AGE_GROUP", "AGE_BUCKET", "AGE_RANGE"]
-        age_grp_col = next((c for c in age_grp_candidates if c in cols), None)
+        roles, where_sql, params = _chart_filters(table, args)
+        age_num_col = roles["age"]
+        age_grp_col = roles["age_group"]
 
         # victim count logic
-        victim_count_col = "VICTIM_COUNT" if "VICTIM_COUNT" in cols else None
-        injuries_col      = "INJURIES"     if "INJURIES" in cols else None
-        fatalities_col    = "FATALITIES"   if "FATALITIES" in cols else None
-
-        if victim_count_col:
-            vic_expr = f"COALESCE(`{victim_count_col}`,0)"
-        elif injuries_col or fatalities_col:
-            i = f"COALESCE(`{injuries_col}`,0)" if injuries_col else "0"
-            f = f"COALESCE(`{fatalities_col}`,0)" if fatalities_col else "0"
+        if roles["victim"] == "VICTIM_COUNT":
+            vic_expr = "COALESCE(`VICTIM_COUNT`,0)"
+        elif roles["injuries"] or roles["fatalities"]:
+            i = f"COALESCE(`{roles['injuries']}`,0)" if roles["injuries"] else "0"
+            f = f"COALESCE(`{roles['fatalities']}`,0)" if roles["fatalities"] else "0"
             vic_expr = f"({i} + {f})"
         else:
             # Fallback: each row counts as 1 victim
             vic_expr = "1"
 
-        # ---------- WHERE filters (mirror other endpoints) ----------
-        where = []
-        params = []
-        q = request.args
-
-        # Location
-        location = (q.get("location") or "").strip()
-        if location and "BARANGAY" in cols:
-            where.append("BARANGAY = %s")
-            params.append(location)
-
-        # Gender (categorical or one-hot)
-        gender_req = (q.get("gender") or "").strip().lower()
-        gender_cat = next((c for c in ["GENDER", "SEX", "VICTIM_GENDER", "SEX_OF_VICTIM"] if c in cols), None)
-        gender_onehot = {
-            "male":   next((c for c in cols if c.upper().endswith("MALE")   and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "female": next((c for c in cols if c.upper().endswith("FEMALE") and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "other":  next((c for c in cols if c.upper().endswith("OTHER")  and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-        }
-        if gender_req:
-            if gender_cat:
-                where.append(f"UPPER(TRIM(`{gender_cat}`)) = %s")
-                params.append(gender_req.upper())
-            elif gender_onehot.get(gender_req):
-                where.append(f"COALESCE(`{gender_onehot[gender_req]}`,0) = 1")
-
-        # Day of week
-        day_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
-        if day_raw:
-            if "DATE_COMMITTED" in cols:
-                weekday_expr = "WEEKDAY(`DATE_COMMITTED`)"  # 0=Mon..6=Sun
-            elif "WEEKDAY" in cols:
-                weekday_expr = "CAST(`WEEKDAY` AS SIGNED)"
-            else:
-                weekday_expr = None
-
-            if weekday_expr:
-                name_to_int = {"MONDAY":0,"TUESDAY":1,"WEDNESDAY":2,"THURSDAY":3,"FRIDAY":4,"SATURDAY":5,"SUNDAY":6}
-                wd_ints = []
-                for item in day_raw:
-                    tok = item.split(".",1)[0].strip()
-                    if tok.isdigit():
-                        n = int(tok)
-                        if 1 <= n <= 7: wd_ints.append(n-1)
-                    else:
-                        got = name_to_int.get(tok.upper(), None)
-                        if got is not None:
-                            wd_ints.append(got)
-                if wd_ints:
-                    placeholders = ",".join(["%s"] * len(wd_ints))
-                    where.append(f"{weekday_expr} IN ({placeholders})")
-                    params.extend(wd_ints)
-
-        # Alcohol
-        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]
-        if alcohol_raw:
-            onehot_map = {k: (f"ALCOHOL_USED_{k}" in cols) for k in ["Yes","No","Unknown"]}
-            cat_col = next((c for c in ["ALCOHOL_USED","ALCOHOL_INVOLVEMENT","ALCOHOL","ALCOHOL_FLAG"] if c in cols), None)
-
-            if any(onehot_map.values()):
-                pieces = []
-                for v in alcohol_raw:
-                    col = f"ALCOHOL_USED_{v}"
-                    if col in cols:
-                        pieces.append(f"COALESCE(`{col}`,0)=1")
-                if pieces:
-                    where.append("(" + " OR ".join(pieces) + ")")
-            elif cat_col:
-                placeholders = ",".join(["%s"] * len(alcohol_raw))
-                where.append(f"UPPER(TRIM(`{cat_col}`)) IN ({placeholders})")
-                params.extend([v.upper() for v in alcohol_raw])
-
-        # Hour range (from HOUR_COMMITTED or time columns)
-        hour_from = q.get("hour_from"); hour_to = q.get("hour_to")
-        if hour_from is not None and hour_to is not None:
-            if "HOUR_COMMITTED" in cols:
-                where.append("CAST(`HOUR_COMMITTED` AS SIGNED) BETWEEN %s AND %s")
-            elif "TIME_COMMITTED" in cols:
-                where.append("HOUR(`TIME_COMMITTED`) BETWEEN %s AND %s")
-            elif "DATE_COMMITTED" in cols:
-                where.append("HOUR(`DATE_COMMITTED`) BETWEEN %s AND %s")
-            params.extend([hour_from, hour_to])
-
-        # Age range (for numeric age only)
-        age_from = q.get("age_from"); age_to = q.get("age_to")
-        if age_num_col and age_from is not None and age_to is not None:
-            where.append(f"CAST(`{age_num_col}` AS SIGNED) BETWEEN %s AND %s")
-            params.extend([age_from, age_to])
-
-        where_sql = " AND ".join(where)
-        if where_sql:
-            where_sql = "WHERE " + where_sql
-
         # ---------- Grouping ----------
-        if age_num_col:
+        if roles["age_bin"]:
+            # indexed generated label, same bins as below
+            sql = f"""
+                SELECT `{roles['age_bin']}` AS age_bin,
+                       SUM({vic_expr}) AS total_victims
+                FROM `{table}`{where_sql}
+                GROUP BY age_bin
+            """
+        elif age_num_col:
             # numeric binning: 0–9,10–19,...,70–79,80+,Unknown
             age_bin = f"""
                 CASE
@@ -951,28 +292,27 @@ def victims_by_age():
             sql = f"""
                 SELECT {age_bin} AS age_bin,
                        SUM({vic_expr}) AS total_victims
-                FROM `{table}`
-                {where_sql}
+                FROM `{table}`{where_sql}
                 GROUP BY age_bin
             """
         elif age_grp_col:
             sql = f"""
                 SELECT COALESCE(NULLIF(TRIM(`{age_grp_col}`),''), 'Unknown') AS age_bin,
                        SUM({vic_expr}) AS total_victims
-                FROM `{table}`
-                {where_sql}
+                FROM `{table}`{where_sql}
                 GROUP BY age_bin
             """
         else:
-            cur.close(); conn.close()
-            return jsonify(success=False, message="No age column found (AGE / AGE_GROUP)."), 200
+            return dict(success=False, message="No age column found (AGE / AGE_GROUP)."), 200
 
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-        cur.close(); conn.close()
+        conn = get_db_connection()
+        try:
+            rows = run_query(conn, sql, params)
+        finally:
+            conn.close()
 
         if not rows:
-            return jsonify(success=True, data={"labels": [], "values": []}), 200
+            return dict(success=True, data={"labels": [], "values": []}), 200
 
         # Sort bins nicely: 0–9,10–19,...,80+,Unknown
         def sort_key(lbl):
@@ -990,192 +330,51 @@ def victims_by_age():
                     return (0, 999)
             return (0, 999)
 
-        rows.sort(key=lambda r: sort_key(r[0] or "Unknown"))
+        rows = sorted(rows, key=lambda r: sort_key(r[0] or "Unknown"))
         labels = [r[0] or "Unknown" for r in rows]
         values = [int(r[1] or 0) for r in rows]
 
-        return jsonify(success=True, data={"labels": labels, "values": values}), 200
+        return dict(success=True, data={"labels": labels, "values": values}), 200
 
     except Exception as e:
-        return jsonify(success=False, message=str(e)), 500
-
+        return dict(success=False, message=str(e)), 500
 
-@api_bp.route("/accidents_by_hour", methods=["GET"])
-def accidents_by_hour():
-    if not is_logged_in():
-        return jsonify(success=False, message="Not authorized"), 401
 
-    table = session.get("forecast_table", "accidents")
+def _accidents_by_hour(table: str, args) -> tuple[dict, int]:
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # --- Discover columns present ---
-        cur.execute(f"SHOW COLUMNS FROM `{table}`")
-        cols = {r[0] for r in cur.fetchall()}
-
-        # Hour column/expression
-        if "HOUR_COMMITTED" in cols:
-            hour_expr = "CAST(`HOUR_COMMITTED` AS SIGNED)"
-            hour_where = "`HOUR_COMMITTED` IS NOT NULL"
-        elif "TIME_COMMITTED" in cols:
-            hour_expr = "HOUR(`TIME_COMMITTED`)"
-            hour_where = "`TIME_COMMITTED` IS NOT NULL"
-        elif "DATE_COMMITTED" in cols:
-            hour_expr = "HOUR(`DATE_COMMITTED`)"
-            hour_where = "`DATE_COMMITTED` IS NOT NULL"
-        else:
-            cur.close(); conn.close()
-            return jsonify(success=False, message="No hour column found (HOUR_COMMITTED/TIME_COMMITTED/DATE_COMMITTED)"), 200
-
-        # Location column candidates
-        brgy_candidates = ["BARANGAY", "Barangay", "BRGY", "BRGY_NAME", "LOCATION", "STATION"]
-        brgy_col = next((c for c in brgy_candidates if c in cols), None)
-
-        # Day of week expression (MySQL WEEKDAY: 0=Mon..6=Sun)
-        if "DATE_COMMITTED" in cols:
-            weekday_expr = "WEEKDAY(`DATE_COMMITTED`)"
-        elif "WEEKDAY" in cols:
-            weekday_expr = "CAST(`WEEKDAY` AS SIGNED)"
-        else:
-            weekday_expr = None
-
-        # Gender detection (cat or one-hot)
-        gender_cat = next((c for c in ["GENDER", "SEX", "VICTIM_GENDER", "SEX_OF_VICTIM"] if c in cols), None)
-        gender_onehot = {
-            "male":   next((c for c in cols if c.upper().endswith("MALE")   and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "female": next((c for c in cols if c.upper().endswith("FEMALE") and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-            "other":  next((c for c in cols if c.upper().endswith("OTHER")  and (c.startswith("GENDER_") or c.startswith("SEX_"))), None),
-        }
-
-        # Alcohol detection (cat or one-hot)
-        alcohol_onehot = {
-            "Yes": "ALCOHOL_USED_Yes" in cols,
-            "No": "ALCOHOL_USED_No" in cols,
-            "Unknown": "ALCOHOL_USED_Unknown" in cols,
-        }
-        alcohol_cat = next((c for c in ["ALCOHOL_USED", "ALCOHOL_INVOLVEMENT", "ALCOHOL", "ALCOHOL_FLAG"] if c in cols), None)
-
-        # Age detection
-        age_col = next((c for c in ["AGE", "VICTIM_AGE", "AGE_OF_VICTIM"] if c in cols), None)
-
-        # --- Read query params ---
-        q = request.args
-        location = (q.get("location") or "").strip()
+        roles = table_roles(table)
+        if not roles["hour"]:
+            return dict(success=False, message="No hour column found (HOUR_COMMITTED/TIME_COMMITTED/DATE_COMMITTED)"), 200
+        hour_expr = roles["hour"]["expr"]
 
-        gender = (q.get("gender") or "").strip().lower()           # "male"|"female"|"other"|""
-        # day_of_week accepts "1. Monday", "Monday", "1", etc.
-        day_of_week_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
-        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]  # ["Yes","No","Unknown"]
-
-        def to_int_safe(v, default=None):
-            try: return int(v)
-            except: return default
-
-        hour_from = to_int_safe(q.get("hour_from"), 0)
-        hour_to   = to_int_safe(q.get("hour_to"), 23)
-        age_from  = to_int_safe(q.get("age_from"), None)
-        age_to    = to_int_safe(q.get("age_to"), None)
-
-        # Normalize hour bounds
-        if hour_from is None: hour_from = 0
-        if hour_to   is None: hour_to   = 23
-        if hour_from > hour_to:
-            hour_from, hour_to = hour_to, hour_from
-        hour_from = max(0, min(23, hour_from))
-        hour_to   = max(0, min(23, hour_to))
-
-        # --- Build WHERE ---
-        where = [hour_where, f"({hour_expr} BETWEEN %s AND %s)"]
-        params = [hour_from, hour_to]
-
-        # Location
-        if brgy_col and location:
-            where.append(f"`{brgy_col}` = %s")
-            params.append(location)
-
-        # Day of Week
-        if weekday_expr and day_of_week_raw:
-            wanted = []
-            names = ["monday","tuesday","wednesday","thursday","friday","saturday","sunday"]
-            for item in day_of_week_raw:
-                # "1. Monday" or "1"
-                n = to_int_safe(item.split(".")[0], None)
-                if n is not None and 1 <= n <= 7:
-                    wanted.append(n - 1)  # 0..6
-                    continue
-                # by name
-                low = item.lower()
-                for idx, nm in enumerate(names):
-                    if nm in low:
-                        wanted.append(idx)
-                        break
-            if wanted:
-                where.append(f"{weekday_expr} IN (" + ",".join(["%s"]*len(wanted)) + ")")
-                params += wanted
-
-        # Gender
-        if gender in ("male", "female", "other"):
-            if gender_cat:
-                if gender == "male":
-                    where.append(f"UPPER(TRIM(`{gender_cat}`)) IN ('M','MALE')")
-                elif gender == "female":
-                    where.append(f"UPPER(TRIM(`{gender_cat}`)) IN ('F','FEMALE')")
-                else:
-                    where.append(f"(`{gender_cat}` IS NULL OR UPPER(TRIM(`{gender_cat}`)) NOT IN ('M','MALE','F','FEMALE'))")
-            else:
-                one = gender_onehot.get(gender)
-                if one:
-                    where.append(f"COALESCE(`{one}`,0)=1")
-
-        # Alcohol (supports any subset of Yes/No/Unknown)
-        if alcohol_raw:
-            alc_clauses = []
-            for val in alcohol_raw:
-                v = val.capitalize()
-                if alcohol_onehot.get(v, False):
-                    alc_clauses.append(f"COALESCE(`ALCOHOL_USED_{v}`,0)=1")
-                elif alcohol_cat:
-                    if v == "Yes":
-                        alc_clauses.append(f"UPPER(TRIM(`{alcohol_cat}`)) IN ('YES','Y','1','TRUE')")
-                    elif v == "No":
-                        alc_clauses.append(f"UPPER(TRIM(`{alcohol_cat}`)) IN ('NO','N','0','FALSE')")
-                    else:
-                        alc_clauses.append(f"(`{alcohol_cat}` IS NULL OR UPPER(TRIM(`{alcohol_cat}`)) NOT IN ('YES','Y','1','TRUE','NO','N','0','FALSE'))")
-            if alc_clauses:
-                where.append("(" + " OR ".join(alc_clauses) + ")")
-
-        # Age
-        if age_col and (age_from is not None or age_to is not None):
-            if age_from is not None and age_to is not None:
-                where.append(f"CAST(`{age_col}` AS SIGNED) BETWEEN %s AND %s")
-                params += [age_from, age_to]
-            elif age_from is not None:
-                where.append(f"CAST(`{age_col}` AS SIGNED) >= %s")
-                params.append(age_from)
-            elif age_to is not None:
-                where.append(f"CAST(`{age_col}` AS SIGNED) <= %s")
-                params.append(age_to)
-
-        where_sql = " AND ".join(where)
+        q = args
+        hour_from, hour_to = hour_bounds(q)   # this chart always filters its hour axis
+        spec = {**parse_filters(q), "hour": (hour_from, hour_to)}
+        where_sql, params = compile_where(roles, spec, extra=[roles["hour"]["not_null"]])
 
         # --- Query ---
         sql = f"""
             SELECT {hour_expr} AS hr, COUNT(*) AS cnt
-            FROM `{table}`
-            WHERE {where_sql}
+            FROM `{table}`{where_sql}
             GROUP BY hr
             ORDER BY hr
         """
-        cur.execute(sql, tuple(params))
-        rows = cur.fetchall()
-        cur.close(); conn.close()
+        conn = get_db_connection()
+        try:
+            rows = run_query(conn, sql, params)
+        finally:
+            conn.close()
 
         counts_by_hr = {int(hr): int(cnt) for hr, cnt in rows}
-        hours = list(range(hour_from, hour_to + 1))
+        hours = hour_axis(hour_from, hour_to)
         counts = [counts_by_hr.get(h, 0) for h in hours]
 
         # Title suffix for UI
+        location = (q.get("location") or "").strip()
+        gender = (q.get("gender") or "").strip().lower()
+        day_of_week_raw = [s.strip() for s in (q.get("day_of_week") or "").split(",") if s.strip()]
+        alcohol_raw = [s.strip() for s in (q.get("alcohol") or "").split(",") if s.strip()]
+        age_from, age_to = spec["age"] or (None, None)
         suffix_bits = []
         if location: suffix_bits.append(location)
         if gender:   suffix_bits.append(gender.capitalize())
@@ -1186,27 +385,125 @@ def accidents_by_hour():
             suffix_bits.append(f"Age {age_from if age_from is not None else 0}-{age_to if age_to is not None else '100+'}")
         title_suffix = " · " + " | ".join(suffix_bits) if suffix_bits else ""
 
-        return jsonify(success=True, data={"hours": hours, "counts": counts, "title_suffix": title_suffix}), 200
+        return dict(success=True, data={"hours": hours, "counts": counts, "title_suffix": title_suffix}), 200
+
+    except Exception as e:
+        return dict(success=False, message=f"{type(e).__name__}: {e}"), 500
+
+
+# --- chart routes ---------------------------------------------------------------
+# Each chart is a (table, args) -> (body, status) function so the same code
+# serves its own route and the combined dashboard bundle.
+CHARTS = {
+    "accidents_by_hour": _accidents_by_hour,
+    "accidents_by_day": _accidents_by_day,
+    "top_barangays": _top_barangays,
+    "alcohol_by_hour": _alcohol_by_hour,
+    "victims_by_age": _victims_by_age,
+    "gender_proportion": _gender_proportion,
+    "kpis": _kpis,
+}
+
+
+def _cached_chart(name: str, table: str, args, version: str | None = None) -> tuple[bytes, str | None, int]:
+    """(JSON body, ETag, status) for one chart; successful bodies are cached."""
+    cache = get_response_cache()
+    key = (table, version or data_version(table), name, filter_key(args))
+    hit = cache.get(key)
+    if hit is not None:
+        return hit[0], hit[1], 200
+    body, status = CHARTS[name](table, args)
+    raw = json_body(body)
+    if status != 200 or not body.get("success"):
+        return raw, None, status
+    return raw, cache.put(key, raw), status
+
+
+def _chart_route(name: str):
+    def view():
+        if not is_logged_in():
+            return jsonify(success=False, message="Not authorized"), 401
+        raw, etag, status = _cached_chart(name, session.get("forecast_table", "accidents"), request.args)
+        if etag is None:
+            return Response(raw, status=status, mimetype="application/json")
+        return conditional_json(raw, etag)
+    api_bp.add_url_rule(f"/{name}", name, view, methods=["GET"])
+
+
+for _name in CHARTS:
+    _chart_route(_name)
+
+
+@api_bp.route("/dashboard_bundle", methods=["GET"])
+def dashboard_bundle():
+    """
+    Every chart and the KPI cards for one filter set in a single response.
+    Cached charts are reused; the rest run concurrently, each on its own
+    pooled connection. `data[<chart>]` is exactly what /api/<chart> returns.
+    """
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
 
+    table = session.get("forecast_table", "accidents")
+    args = request.args.copy()
+    app = current_app._get_current_object()
+    try:
+        table_roles(table)  # load the column roles and the version once, before fanning out
+        version = data_version(table)
     except Exception as e:
-        return jsonify(success=False, message=f"{type(e).__name__}: {e}"), 500
+        return jsonify(success=False, message=str(e)), 500
 
+    cache = get_response_cache()
+    parts = {}
+    for name in CHARTS:
+        hit = cache.get((table, version, name, filter_key(args)))
+        if hit is not None:
+            parts[name] = hit[0]
 
+    def run(name):
+        with app.app_context():
+            return _cached_chart(name, table, args, version)[0]
 
-@api_bp.route("/barangays")
-def barangays():
-    table = session.get('forecast_table', 'accidents')
-    if table not in list_tables():
-        return jsonify(success=True, barangays=[])
+    missing = [name for name in CHARTS if name not in parts]
+    if missing:
+        workers = max(1, min(len(missing), int(app.config.get("DASHBOARD_BUNDLE_WORKERS", 4))))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(run, name) for name in missing}
+            parts.update((name, f.result()) for name, f in futures.items())
+
+    # splice the cached JSON bodies instead of re-encoding them
+    raw = (b'{"data":{' + b",".join(b'"%s":%s' % (name.encode(), parts[name].rstrip())
+                                    for name in CHARTS) + b'},"success":true}\n')
+    return conditional_json(raw, etag_for(raw))
+
+
+def _barangays(table: str) -> tuple[dict, int]:
     try:
         conn = get_db_connection(); cur = conn.cursor()
         cur.execute(f"SELECT DISTINCT BARANGAY FROM `{table}` WHERE BARANGAY IS NOT NULL AND BARANGAY <> ''")
         rows = [r[0] for r in cur.fetchall()]
         cur.close(); conn.close()
         rows = sorted({str(x).strip() for x in rows if x is not None})
-        return jsonify(success=True, barangays=rows)
+        return dict(success=True, barangays=rows), 200
     except Exception as e:
-        return jsonify(success=False, barangays=[], message=str(e)), 500
+        return dict(success=False, barangays=[], message=str(e)), 500
+
+
+@api_bp.route("/barangays")
+def barangays():
+    table = session.get('forecast_table', 'accidents')
+    if not table_exists(table):
+        return jsonify(success=True, barangays=[])
+    cache = get_response_cache()
+    key = (table, data_version(table), "barangays", ())
+    hit = cache.get(key)
+    if hit is not None:
+        return conditional_json(*hit)
+    body, status = _barangays(table)
+    if status != 200:
+        return jsonify(body), status
+    raw = json_body(body)
+    return conditional_json(raw, cache.put(key, raw))
 
 
 @api_bp.route("/set_forecast_source", methods=["POST"])
@@ -1214,7 +511,7 @@ def set_forecast_source():
     if not is_logged_in(): return jsonify(success=False, message="Not authorized."), 401
     data = request.get_json(silent=True) or {}; table = (data.get('table') or "").strip()
     if not table: return jsonify(success=False, message="Missing table."), 400
-    if table not in list_tables(): return jsonify(success=False, message=f'Unknown table "{table}".'), 400
+    if not table_exists(table): return jsonify(success=False, message=f'Unknown table "{table}".'), 400
     session['forecast_table'] = table
     return jsonify(success=True, message=f'"{table}" set as forecast source.')
 
@@ -1222,7 +519,16 @@ def set_forecast_source():
 def rf_monthly_forecast():
     if not is_logged_in(): return jsonify(success=False, message="Not authorized."), 401
     table = (request.args.get("table") or "accidents").strip()
-    return jsonify(**rf_monthly_payload(table))
+    mode = (request.args.get("mode") or "recursive").strip().lower()  # "recursive" | "direct"
+    if mode not in RF_MODES: mode = "recursive"
+    result, etag = rf_monthly_cached(table, mode)
+    resp = jsonify(**result)
+    if etag:
+        # browser revalidates every time; unchanged data -> 304 with empty body
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        resp = resp.make_conditional(request)
+    return resp
 
 @api_bp.route("/folium_map")
 def folium_map():
@@ -1234,12 +540,18 @@ def folium_map():
     time_from = (request.args.get("time_from") or "").strip()  # "07:00"
     time_to   = (request.args.get("time_to") or "").strip()    # "10:00"
     legacy_time = (request.args.get("time") or "").strip()     # "Live" | "All" | "7" etc.
+    hotspot_engine = (request.args.get("engine") or "").strip().lower() or None  # "window" | "hourly"
 
     table = session.get('forecast_table', 'accidents')
-    if table not in list_tables():
+    if not table_exists(table):
         return Response("<h4>No data: table not found.</h4>", mimetype='text/html')
 
+    warmer = get_prewarmer()
+    warmer.note_table(table)
     try:
+        data = warmer.get(table, manila_hour()) if is_default_live_request(request.args) else None
+        if data is not None:
+            return Response(render_forecast_map_html(data), mimetype='text/html')
         html = build_forecast_map_html(
             table=table,
             start_str=start,
@@ -1247,13 +559,77 @@ def folium_map():
             time_from=time_from,
             time_to=time_to,
             legacy_time=legacy_time,   # keep compatibility
-            barangay_filter=barangay
+            barangay_filter=barangay,
+            hotspot_engine=hotspot_engine
         )
         return Response(html, mimetype='text/html')
     except Exception:
         return Response("<h4>No data available for the selected filters.</h4>", mimetype='text/html')
 
 
+@api_bp.route("/hotspot_forecast")
+def hotspot_forecast():
+    """Same filters as /folium_map, but only the marker data (columnar JSON)."""
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
+    q = request.args
+    table = session.get('forecast_table', 'accidents')
+    if not table_exists(table):
+        return jsonify(success=False, message="Table not found"), 404
+
+    warmer = get_prewarmer()
+    warmer.note_table(table)
+    if is_default_live_request(q):
+        data = warmer.get(table, manila_hour())
+        if data is not None:
+            return jsonify(success=True, data=data, prewarmed=True)
+
+    try:
+        data = hotspot_forecast_data(
+            table=table,
+            start_str=(q.get("start") or "").strip(),
+            end_str=(q.get("end") or "").strip(),
+            time_from=(q.get("time_from") or "").strip(),
+            time_to=(q.get("time_to") or "").strip(),
+            legacy_time=(q.get("time") or "").strip(),
+            barangay_filter=(q.get("barangay") or "").strip(),
+            hotspot_engine=(q.get("engine") or "").strip().lower() or None
+        )
+        return jsonify(success=True, data=data)
+    except Exception:
+        return jsonify(success=False, message="No data available for the selected filters."), 500
+
+
+@api_bp.route("/db_pool_status")
+def db_pool_status():
+    """Connection pool occupancy and lifetime connect/checkout counters for this process."""
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
+    return jsonify(success=True, **pool_stats())
+
+
+@api_bp.route("/table_versions")
+def table_versions_status():
+    """Persisted data version, row count, latest DATE_COMMITTED and content hash per table."""
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
+    table = (request.args.get("table") or "").strip()
+    try:
+        if table:
+            return jsonify(success=True, table=table, **table_fingerprint(table))
+        return jsonify(success=True, tables=read_all_versions())
+    except Exception as e:
+        return jsonify(success=False, message=str(e)), 500
+
+
+@api_bp.route("/prewarm_status")
+def prewarm_status():
+    """Live-map pre-warming: schedule, last run timings, stored hours, hit/miss counts."""
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
+    return jsonify(success=True, enabled=bool(current_app.config.get("PREWARM_ENABLED")),
+                   **get_prewarmer().status())
+
 
 @api_bp.route("/upload_files", methods=["POST"])
 def upload_files():
@@ -1266,6 +642,8 @@ def upload_files():
 
         append_mode = (request.form.get("append_mode") or "0").strip() == "1"
         append_target = (request.form.get("append_target") or "").strip()
+        # "1"/"0" forces chunked/in-memory ingest; absent -> by upload size
+        stream = {"1": True, "0": False}.get((request.form.get("stream") or "").strip())
 
         if not file1 or not file2:
             return jsonify(success=False, message="Please select two files."), 400
@@ -1277,10 +655,20 @@ def upload_files():
         else:
             table_name = custom_name
 
+        if current_app.config.get("INGEST_ASYNC", True):
+            job_id = get_ingest_jobs().submit(file1, file2, table_name, append=append_mode, stream=stream)
+            return jsonify(
+                success=True,
+                message="Files received; processing in the background.",
+                job_id=job_id,
+                status_url=url_for("api.job_status", job_id=job_id),
+            ), 202
+
         processed, saved = process_merge_and_save_to_db(
             file1, file2,
             table_name=table_name,
-            append=append_mode  # NEW
+            append=append_mode,  # NEW
+            stream=stream,
         )
         verb = "Appended to" if append_mode else "Saved to"
         return jsonify(
@@ -1292,6 +680,51 @@ def upload_files():
     except Exception as e:
         return jsonify(success=False, message=str(e)), 500
 
+
+@api_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Stage, row counts, throughput and error of a background ingest job."""
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
+    try:
+        job = get_ingest_jobs().get(job_id)
+    except Exception as e:
+        return jsonify(success=False, message=str(e)), 500
+    if job is None:
+        return jsonify(success=False, message="Unknown job."), 404
+    return jsonify(success=True, job=job)
+
+
+@api_bp.route("/jobs")
+def list_jobs():
+    """The latest ingest jobs, newest first."""
+    if not is_logged_in():
+        return jsonify(success=False, message="Not authorized"), 401
+    try:
+        limit = max(1, min(100, int(request.args.get("limit", 20))))
+        return jsonify(success=True, jobs=get_ingest_jobs().recent(limit))
+    except Exception as e:
+        return jsonify(success=False, message=str(e)), 500
+
+_SAVE_FLOATS = ('LATITUDE', 'LONGITUDE')
+_SAVE_INTS = ('VICTIM_COUNT', 'SUSPECT_COUNT', 'AGE', 'YEAR', 'MONTH', 'DAY')
+
+def _save_frame(db_headers, data):
+    """Grid rows -> typed frame: blanks NULL, numeric columns parsed (bad -> NULL), the rest str."""
+    import pandas as pd
+    import numpy as np
+    frame = pd.DataFrame(data, columns=db_headers, dtype=object)
+    for col in frame.columns:
+        s = frame[col]
+        blank = s.isna() | s.eq('')
+        if col in _SAVE_FLOATS or col in _SAVE_INTS:
+            num = pd.to_numeric(s.where(~blank).astype(str).str.strip(), errors='coerce')
+            frame[col] = num if col in _SAVE_FLOATS else np.trunc(num).astype('Int64')
+        else:
+            keep = ~blank & s.astype(bool)             # falsy values (0, False) were stored as NULL
+            frame[col] = s.astype(str).where(keep, None)
+    return frame
+
 @api_bp.route("/save_table", methods=["POST"])
 def save_table():
     if not is_logged_in(): return jsonify({"message":"Not authorized","success":False}), 401
@@ -1304,32 +737,22 @@ def save_table():
             cursor.execute("TRUNCATE TABLE accidents")
             db_column_mapping = {'STATION':'STATION','BARANGAY':'BARANGAY','DATE_COMMITTED':'DATE_COMMITTED','TIME_COMMITTED':'TIME_COMMITTED','OFFENSE':'OFFENSE','LATITUDE':'LATITUDE','LONGITUDE':'LONGITUDE','VICTIM_COUNT':'VICTIM_COUNT','SUSPECT_COUNT':'SUSPECT_COUNT','VEHICLE_KIND':'VEHICLE_KIND','AGE':'AGE','GENDER':'GENDER','ALCOHOL_USED':'ALCOHOL_USED','YEAR':'YEAR','MONTH':'MONTH','DAY':'DAY','WEEKDAY':'WEEKDAY'}
             db_headers = [db_column_mapping.get(h, h) for h in headers]
-            quoted_headers = ", ".join([f"`{h}`" for h in db_headers])
-            placeholders = ", ".join(["%s"] * len(db_headers))
-            insert_query = f"INSERT INTO accidents ({quoted_headers}) VALUES ({placeholders})"
-            processed_data=[]
-            for row in data:
-                processed_row=[]
-                for i, value in enumerate(row):
-                    if value is None or value == '':
-                        processed_row.append(None)
-                    elif db_headers[i] in ['LATITUDE','LONGITUDE','VICTIM_COUNT','SUSPECT_COUNT','AGE','YEAR','MONTH','DAY']:
-                        try:
-                            processed_row.append(float(value) if db_headers[i] in ['LATITUDE','LONGITUDE'] else int(float(value)))
-                        except (ValueError, TypeError):
-                            processed_row.append(None)
-                    elif db_headers[i] in ['DATE_COMMITTED','TIME_COMMITTED']:
-                        processed_row.append(str(value) if value else None)
-                    else:
-                        processed_row.append(str(value) if value else None)
-                processed_data.append(tuple(processed_row))
-            cursor.executemany(insert_query, processed_data); conn.commit()
-            message = f"Table saved to MySQL successfully! {len(processed_data)} rows updated."
+            frame = _save_frame(db_headers, data)
+            stats = bulk_insert(cursor, "accidents", frame); conn.commit()
+            get_catalog().invalidate("accidents")
+            try: bump_data_version("accidents")
+            except Exception: pass
+            get_response_cache().invalidate("accidents")
+            message = f"Table saved to MySQL successfully! {len(frame)} rows updated."
+            try: build_cube("accidents")  # from the new rows
+            except Exception: pass
+            try: drop_hotspot_index("accidents")  # re-clustered on the next append
+            except Exception: pass
         except Exception as e:
             conn.rollback(); message=f"Error: {e}"; return jsonify({"message":message,"success":False}), 500
         finally:
             cursor.close(); conn.close()
-        return jsonify({"message": message, "success": True})
+        return jsonify({"message": message, "success": True, "write": stats})
     except Exception as e:
         return jsonify({"message": f"Error processing request: {str(e)}", "success": False}), 500
 
@@ -1358,6 +781,17 @@ def delete_file():
         conn = get_db_connection(); cursor = conn.cursor()
         cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`;"); conn.commit()
         cursor.close(); conn.close()
+        get_catalog().invalidate(table_name)
+        try: bump_data_version(table_name)
+        except Exception: pass
+        get_response_cache().invalidate(table_name)
+        get_model_cache().invalidate(table_name)
+        forget_rf_results(table_name)
+        get_prewarmer().forget(table_name)
+        try: drop_cube(table_name)
+        except Exception: pass
+        try: drop_hotspot_index(table_name)
+        except Exception: pass
         return jsonify({"success": True, "message": f"Table {table_name} deleted successfully."})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -25,9 +25,9 @@ def dashboard():
     current_time = now.strftime("%I:%M %p").lower()
     forecast_table = session.get("forecast_table", "accidents")
     # do a light table check
-    from ..services.database import list_tables
+    from ..services.database import table_exists
     no_data = True
-    if forecast_table in list_tables():
+    if table_exists(forecast_table):
         from ..extensions import get_db_connection
         try:
             conn = get_db_connection(); cur = conn.cursor()
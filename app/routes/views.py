@@ -3,6 +3,7 @@ from .auth import is_logged_in
 from ..extensions import get_engine
 from ..services.preprocessing import make_display_copy
 from ..services.database import list_tables
+from ..services.filter_columns import FILTER_COLUMNS
 from ..extensions import get_db_connection
 from markupsafe import Markup
 from flask import request
@@ -16,6 +17,13 @@ def graphs():
         return redirect(url_for("auth.login"))
     return render_template("graphs.html")
 
+@views_bp.route("/hotspot_map")
+def hotspot_map():
+    # persistent Leaflet base map; markers come from /api/hotspot_forecast
+    if not is_logged_in():
+        return redirect(url_for("auth.login"))
+    return render_template("hotspot_map.html")
+
 @views_bp.route("/database")
 def database_page():
     if not is_logged_in():
@@ -37,6 +45,7 @@ def database_page():
     
     display_df = make_display_copy(df)
     hide_cols = ["MONTH_SIN","MONTH_COS","DAYOWEEK_SIN","DAYOWEEK_COS","GENDER_Female","GENDER_Male","GENDER_Unknown","ALCOHOL_USED_No","ALCOHOL_USED_Yes","ALCOHOL_USED_Unknown","TIME_CLUSTER_Midday","TIME_CLUSTER_Midnight","TIME_CLUSTER_Morning", "TIME_CLUSTER_Evening","TIME"]
+    hide_cols += list(FILTER_COLUMNS)  # generated filter columns; never written back
     display_df = display_df.drop(columns=[c for c in hide_cols if c in display_df.columns])
     preferred_front = [c for c in ["MONTH","DAY_OF_WEEK","TIME","TIME_CLUSTER"] if c in display_df.columns]
     other_cols = [c for c in display_df.columns if c not in preferred_front]
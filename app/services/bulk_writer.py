@@ -0,0 +1,121 @@
+# app/services/bulk_writer.py
+"""
+Bulk row writer for ingest and save.
+
+`bulk_insert()` serializes a DataFrame column by column into a temporary
+tab-separated file and loads it with LOAD DATA LOCAL INFILE (opt-in:
+DB_LOCAL_INFILE). LOCAL loads never fail on bad values, they truncate/clamp
+them with a warning, so a load that warns is rolled back to a savepoint and
+re-run as INSERTs, which strict mode rejects as before. When the client or
+server has local infile disabled it falls back to multi-row INSERTs of
+DB_INSERT_BATCH_ROWS rows, building only one batch of tuples at a time.
+Either way it runs on the caller's cursor (same transaction) and reports
+rows/sec.
+"""
+import os, tempfile, time
+import pandas as pd
+from flask import current_app
+
+NULL = "\\N"
+# client/server refusing LOCAL INFILE: 1148 not allowed, 2068 rejected by client, 3948/3950 disabled
+_LOCAL_INFILE_ERRNOS = {1148, 2068, 3948, 3950}
+
+
+def _escape(s: pd.Series) -> pd.Series:
+    # LOAD DATA default escaping: backslash, tab, newline, carriage return
+    return (s.str.replace("\\", "\\\\", regex=False).str.replace("\t", "\\t", regex=False)
+             .str.replace("\n", "\\n", regex=False).str.replace("\r", "\\r", regex=False))
+
+
+def _column_text(s: pd.Series) -> pd.Series:
+    """One column as LOAD DATA text, NULL as \\N."""
+    missing = s.isna()
+    if pd.api.types.is_bool_dtype(s):
+        text = s.astype("int8").astype(str)
+    elif pd.api.types.is_numeric_dtype(s):
+        text = s.astype(str)                      # shortest round-trip repr for floats
+    elif pd.api.types.is_datetime64_any_dtype(s):
+        text = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        obj = s.astype(object)
+        text = _escape(obj.where(~missing, "").map(lambda v: str(int(v)) if isinstance(v, bool) else str(v)))
+    return text.where(~missing, NULL)
+
+
+def to_tsv(df: pd.DataFrame) -> str:
+    """`df` as LOAD DATA text (tab-separated, one row per line, no header)."""
+    if df.empty:
+        return ""
+    cols = [_column_text(df[c]) for c in df.columns]
+    lines = cols[0].str.cat(cols[1:], sep="\t") if len(cols) > 1 else cols[0]
+    return "\n".join(lines.tolist()) + "\n"
+
+
+def _load_data(cur, table: str, cols: list[str], df: pd.DataFrame) -> tuple[int, int]:
+    """LOAD DATA LOCAL INFILE `df` into `table`; returns (rows loaded, warnings)."""
+    fd, path = tempfile.mkstemp(prefix=f"bulk_{table}_", suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            fh.write(to_tsv(df))
+        cur.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(f'`{c}`' for c in cols)})",
+            (path,),
+        )
+        return int(cur.rowcount), int(getattr(cur, "warning_count", 0) or 0)
+    finally:
+        try: os.remove(path)
+        except OSError: pass
+
+
+def _batched_insert(cur, table: str, cols: list[str], df: pd.DataFrame, batch_rows: int) -> int:
+    row_sql = "(" + ", ".join(["%s"] * len(cols)) + ")"
+    head = f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in cols)}) VALUES "
+    saved = 0
+    for start in range(0, len(df), batch_rows):
+        chunk = df.iloc[start:start + batch_rows].astype(object)   # python scalars for the driver
+        chunk = chunk.where(chunk.notna(), None)
+        params = [v for row in chunk.itertuples(index=False, name=None) for v in row]
+        cur.execute(head + ", ".join([row_sql] * len(chunk)), params)
+        saved += int(cur.rowcount)
+    return saved
+
+
+def bulk_insert(cur, table: str, df: pd.DataFrame, batch_rows: int | None = None) -> dict:
+    """
+    Insert every row of `df` (columns = table columns) into `table` on `cur`.
+    Does not commit. Returns {"rows", "seconds", "rows_per_sec", "method"}.
+    """
+    cfg = current_app.config
+    batch_rows = max(1, int(batch_rows or cfg.get("DB_INSERT_BATCH_ROWS", 1000)))
+    cols = list(df.columns)
+    started = time.perf_counter()
+    method, rows = "none", 0
+    if len(df):
+        use_local = cfg.get("DB_LOCAL_INFILE", False) and current_app.extensions.get("local_infile_ok", True)
+        if use_local:
+            try:
+                cur.execute("SAVEPOINT bulk_load")
+                rows, warnings = _load_data(cur, table, cols, df)
+                if warnings:
+                    # truncated/clamped/skipped values: undo, let strict INSERTs accept or reject the rows
+                    cur.execute("ROLLBACK TO SAVEPOINT bulk_load")
+                    current_app.logger.warning("LOAD DATA into %s gave %d warnings; re-running as INSERTs",
+                                               table, warnings)
+                    rows = 0
+                else:
+                    cur.execute("RELEASE SAVEPOINT bulk_load")
+                    method = "load_data"
+            except Exception as e:
+                if getattr(e, "errno", None) not in _LOCAL_INFILE_ERRNOS:
+                    raise
+                current_app.extensions["local_infile_ok"] = False   # don't retry on every write
+                current_app.logger.info("LOCAL INFILE unavailable (%s); using batched INSERTs", e)
+        if method == "none":
+            rows, method = _batched_insert(cur, table, cols, df, batch_rows), "insert"
+    seconds = time.perf_counter() - started
+    stats = {"rows": rows, "seconds": round(seconds, 3),
+             "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None, "method": method}
+    current_app.logger.info("bulk_insert %s: %s", table, stats)
+    return stats
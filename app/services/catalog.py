@@ -0,0 +1,167 @@
+# app/services/catalog.py
+"""
+In-process cache of the schema the chart endpoints ask about on every
+request: the table list, each table's columns, and the columns that play
+each role (gender, alcohol, age, victims, hour and weekday sources, ...).
+
+Writers (upload, save, delete) call `invalidate()`; a short TTL covers other
+worker processes, and an unknown table name triggers one refresh so a table
+created elsewhere is visible at once.
+"""
+import threading, time
+from flask import current_app
+from ..extensions import get_db_connection
+
+GENDER_CAT_COLUMNS  = ["GENDER", "SEX", "VICTIM_GENDER", "SEX_OF_VICTIM"]
+ALCOHOL_CAT_COLUMNS = ["ALCOHOL_USED", "ALCOHOL_INVOLVEMENT", "ALCOHOL", "ALCOHOL_FLAG"]
+AGE_COLUMNS         = ["AGE", "VICTIM_AGE", "AGE_YEARS", "AGE_OF_VICTIM"]
+AGE_GROUP_COLUMNS   = ["AGE_GROUP", "AGE_BUCKET", "AGE_RANGE"]
+VICTIM_COLUMNS      = ["VICTIM_COUNT", "VICTIM COUNT", "TOTAL_VICTIMS", "NUM_VICTIMS"]
+BARANGAY_COLUMNS    = ["BARANGAY", "Barangay", "BRGY", "BRGY_NAME", "LOCATION", "STATION"]
+ALCOHOL_VALUES      = ("Yes", "No", "Unknown")
+
+
+def _first(cols: set[str], candidates) -> str | None:
+    return next((c for c in candidates if c in cols), None)
+
+
+def detect_roles(columns) -> dict:
+    """Which column (or SQL expression) serves each filter/aggregate role."""
+    cols = set(columns)
+
+    gender_onehot = {"male": None, "female": None, "other": None, "unknown": None}
+    for c in sorted(cols):
+        if c.startswith(("GENDER_", "SEX_")):
+            suffix = c.split("_", 1)[1].lower()
+            if suffix in gender_onehot and gender_onehot[suffix] is None:
+                gender_onehot[suffix] = c
+
+    # F_* are the indexed generated columns ingest adds (see filter_columns.py)
+    if "HOUR_COMMITTED" in cols:
+        expr = "`F_HOUR`" if "F_HOUR" in cols else "CAST(`HOUR_COMMITTED` AS SIGNED)"
+        hour = {"expr": expr, "not_null": "`HOUR_COMMITTED` IS NOT NULL"}
+    elif "TIME_COMMITTED" in cols:
+        hour = {"expr": "HOUR(`TIME_COMMITTED`)", "not_null": "`TIME_COMMITTED` IS NOT NULL"}
+    elif "DATE_COMMITTED" in cols:
+        hour = {"expr": "HOUR(`DATE_COMMITTED`)", "not_null": "`DATE_COMMITTED` IS NOT NULL"}
+    else:
+        hour = None
+
+    if "DATE_COMMITTED" in cols:
+        weekday = "`F_WEEKDAY`" if "F_WEEKDAY" in cols else "WEEKDAY(`DATE_COMMITTED`)"   # 0=Mon..6=Sun
+    elif "WEEKDAY" in cols:
+        weekday = "CAST(`WEEKDAY` AS SIGNED)"
+    else:
+        weekday = None
+
+    age = _first(cols, AGE_COLUMNS)
+    if "F_AGE" in cols:
+        age_num = "`F_AGE`"
+    else:
+        age_num = age and f"CAST(`{age}` AS SIGNED)"
+
+    return {
+        "barangay": _first(cols, BARANGAY_COLUMNS),
+        "gender_cat": _first(cols, GENDER_CAT_COLUMNS),
+        "gender_onehot": gender_onehot,
+        "alcohol_cat": _first(cols, ALCOHOL_CAT_COLUMNS),
+        "alcohol_onehot": {v: (f"ALCOHOL_USED_{v}" if f"ALCOHOL_USED_{v}" in cols else None) for v in ALCOHOL_VALUES},
+        "age": age,
+        "age_num": age_num,
+        "age_bin": "F_AGE_BIN" if "F_AGE_BIN" in cols else None,
+        "gender_code": "F_GENDER" if "F_GENDER" in cols else None,
+        "alcohol_code": "F_ALCOHOL" if "F_ALCOHOL" in cols else None,
+        "age_group": _first(cols, AGE_GROUP_COLUMNS),
+        "victim": _first(cols, VICTIM_COLUMNS),
+        "injuries": "INJURIES" if "INJURIES" in cols else None,
+        "fatalities": "FATALITIES" if "FATALITIES" in cols else None,
+        "hour": hour,
+        "weekday": weekday,
+    }
+
+
+class Catalog:
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._tables: set[str] | None = None
+        self._tables_at = 0.0
+        self._columns: dict[str, tuple[list[str], dict, float]] = {}   # table -> (columns, roles, loaded_at)
+        self.hits = self.misses = 0
+
+    def _fresh(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at < self.ttl
+
+    def tables(self, refresh: bool = False) -> set[str]:
+        with self._lock:
+            if not refresh and self._tables is not None and self._fresh(self._tables_at):
+                self.hits += 1
+                return set(self._tables)
+            self.misses += 1
+        conn = get_db_connection(); cur = conn.cursor()
+        try:
+            cur.execute("SHOW TABLES")
+            tables = {t[0] for t in cur.fetchall()}
+        finally:
+            cur.close(); conn.close()
+        with self._lock:
+            self._tables, self._tables_at = tables, time.monotonic()
+        return set(tables)
+
+    def has_table(self, table: str) -> bool:
+        return table in self.tables() or table in self.tables(refresh=True)
+
+    def _load(self, table: str) -> tuple[list[str], dict]:
+        with self._lock:
+            entry = self._columns.get(table)
+            if entry is not None and self._fresh(entry[2]):
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+        conn = get_db_connection(); cur = conn.cursor()
+        try:
+            cur.execute(f"SHOW COLUMNS FROM `{table}`")
+            columns = [r[0] for r in cur.fetchall()]
+        finally:
+            cur.close(); conn.close()
+        roles = detect_roles(columns)
+        with self._lock:
+            self._columns[table] = (columns, roles, time.monotonic())
+        return columns, roles
+
+    def columns(self, table: str) -> set[str]:
+        return set(self._load(table)[0])
+
+    def roles(self, table: str) -> dict:
+        return self._load(table)[1]
+
+    def invalidate(self, table: str | None = None):
+        """Forget cached metadata (all, or one table's columns plus the table list)."""
+        with self._lock:
+            self._tables = None
+            if table is None:
+                self._columns.clear()
+            else:
+                self._columns.pop(table, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tables_cached": self._tables is not None, "column_sets": len(self._columns),
+                    "ttl_seconds": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+def get_catalog() -> Catalog:
+    """Per-app catalog cache, created on first use."""
+    catalog = current_app.extensions.get("catalog")
+    if catalog is None:
+        catalog = Catalog(current_app.config.get("CATALOG_TTL_SECONDS", 60))
+        current_app.extensions["catalog"] = catalog
+    return catalog
+
+
+def table_columns(table: str) -> set[str]:
+    return get_catalog().columns(table)
+
+
+def table_roles(table: str) -> dict:
+    return get_catalog().roles(table)
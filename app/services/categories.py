@@ -0,0 +1,90 @@
+# app/services/categories.py
+"""
+Categorical columns of processed tables (GENDER, ALCOHOL_USED, TIME_CLUSTER).
+
+Raw values are mapped once per distinct value through a lookup table into a
+pandas Categorical with a fixed category list; one-hot columns and the
+readable *_CLUSTER labels are then derived from the category codes instead
+of per-row applies and repeated to_numeric passes.
+"""
+import numpy as np
+import pandas as pd
+
+GENDER_CATEGORIES = ("Female", "Male", "Unknown")
+ALCOHOL_CATEGORIES = ("No", "Unknown", "Yes")
+TIME_CLUSTERS = ("Midnight", "Morning", "Midday", "Evening")
+
+GENDER_LOOKUP = {"m": "Male", "male": "Male", "f": "Female", "female": "Female"}
+ALCOHOL_LOOKUP = {"yes": "Yes", "y": "Yes", "1": "Yes", "true": "Yes",
+                  "no": "No", "n": "No", "0": "No", "false": "No"}
+_BLANKS = {"", "nan", "NaN", "<NA>", "None"}
+
+# *_CLUSTER label from the one-hot flags: later flags win, no flag -> default
+CLUSTER_LABELS = {
+    "GENDER": ((("Male", "Male"), ("Unknown", "Unknown")), "Female"),
+    "ALCOHOL_USED": ((("Yes", "Yes"), ("Unknown", "Unknown")), "No"),
+}
+
+
+def normalize_category(s: pd.Series, lookup: dict, categories, default: str = "Unknown") -> pd.Series:
+    """
+    str(value).strip(), blanks -> default, lower-cased lookup (miss -> default),
+    as a Categorical over `categories`. Each distinct text is looked up once.
+    """
+    codes, texts = pd.factorize(s.astype(str))     # str() first: 1, 1.0 and True must stay apart
+    labels = []
+    for t in texts:
+        t = str(t).strip()
+        labels.append(default if t in _BLANKS else lookup.get(t.lower(), default))
+    labels.append(default)                          # code -1: value missing even as text
+    cat = pd.Categorical(np.asarray(labels, dtype=object)[codes], categories=list(categories))
+    return pd.Series(cat, index=s.index, name=s.name)
+
+
+def normalize_gender(s: pd.Series) -> pd.Series:
+    return normalize_category(s, GENDER_LOOKUP, GENDER_CATEGORIES)
+
+
+def normalize_alcohol(s: pd.Series) -> pd.Series:
+    return normalize_category(s, ALCOHOL_LOOKUP, ALCOHOL_CATEGORIES)
+
+
+def time_clusters(hours: pd.Series) -> pd.Series:
+    """Hour -> Midnight / Morning (6–9) / Midday (10–15) / Evening (16–19); non-numeric -> Midnight."""
+    h = np.trunc(pd.to_numeric(hours, errors="coerce").to_numpy(dtype="float64"))
+    codes = np.select([(h >= 6) & (h <= 9), (h >= 10) & (h <= 15), (h >= 16) & (h <= 19)], [1, 2, 3], default=0)
+    cat = pd.Categorical.from_codes(codes, categories=list(TIME_CLUSTERS))
+    return pd.Series(cat, index=hours.index, name=hours.name)
+
+
+def onehot(s: pd.Series, prefix: str) -> pd.DataFrame:
+    """int64 flag per category of a categorical `s` (missing -> all 0), columns `{prefix}_{category}`."""
+    codes = s.cat.codes.to_numpy()
+    flags = (codes[:, None] == np.arange(len(s.cat.categories))).astype("int64")
+    return pd.DataFrame(flags, index=s.index, columns=[f"{prefix}_{c}" for c in s.cat.categories])
+
+
+def _flag(col: pd.Series) -> np.ndarray:
+    if col.dtype.kind in "iub":                     # plain numpy ints/bools: no parsing needed
+        return col.to_numpy() == 1
+    return pd.to_numeric(col, errors="coerce").fillna(0).astype(int).eq(1).to_numpy()
+
+
+def cluster_label(df: pd.DataFrame, prefix: str) -> pd.Series:
+    """GENDER_CLUSTER / ALCOHOL_USED_CLUSTER from the `prefix`_* one-hot columns present in `df`."""
+    flags, default = CLUSTER_LABELS[prefix]
+    present = [(f"{prefix}_{suffix}", label) for suffix, label in flags if f"{prefix}_{suffix}" in df.columns]
+    conds = [_flag(df[col]) for col, _ in reversed(present)]
+    labels = np.select(conds, [label for _, label in reversed(present)], default=default) if conds \
+        else np.full(len(df), default)
+    categories = [default] + [label for _, label in flags]
+    return pd.Series(pd.Categorical(labels, categories=categories), index=df.index)
+
+
+def cluster_label_from_codes(s: pd.Series, prefix: str) -> pd.Series:
+    """Same label as `cluster_label()` over `onehot(s)`, read straight off the codes."""
+    flags, default = CLUSTER_LABELS[prefix]
+    by_suffix = dict(flags)
+    per_code = np.array([by_suffix.get(c, default) for c in s.cat.categories] + [default], dtype=object)
+    labels = per_code[s.cat.codes.to_numpy()]      # code -1 (missing) -> last entry
+    return pd.Series(pd.Categorical(labels, categories=[default] + [label for _, label in flags]), index=s.index)
@@ -1,10 +1,26 @@
 # from . import __all__  # silence linters
-from ..extensions import get_db_connection
+from .catalog import get_catalog
+from . import table_versions
 
 def list_tables() -> set[str]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SHOW TABLES")
-    tables = {t[0] for t in cur.fetchall()}
-    cur.close(); conn.close()
-    return tables
+    """Table names, served from the catalog cache."""
+    return get_catalog().tables()
+
+def table_exists(table: str) -> bool:
+    """Like `table in list_tables()`, but re-reads the catalog once on a miss."""
+    return get_catalog().has_table(table)
+
+def table_fingerprint(table: str) -> dict:
+    """
+    Cheap "has this table changed?" answer from `app_table_versions` (one
+    primary-key lookup): version, row count, latest DATE_COMMITTED and the
+    content hash taken at the last write. `version` is what caches key on.
+    """
+    return table_versions.read(table)
+
+def data_version(table: str) -> str:
+    return table_fingerprint(table)["version"]
+
+def bump_data_version(table: str) -> str:
+    """Called by writers after `table` changed; anything keyed on the old version goes stale."""
+    return table_versions.bump(table)["version"]
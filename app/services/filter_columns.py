@@ -0,0 +1,107 @@
+# app/services/filter_columns.py
+"""
+Stored generated columns (and indexes on them) for the dashboard filters.
+
+The chart SQL used to filter on expressions such as WEEKDAY(DATE_COMMITTED)
+or CAST(AGE AS SIGNED), which no index can serve. Processed tables get one
+normalized column per filter instead (all prefixed `F_`), computed by MySQL
+on insert, plus composite indexes for the usual filter combinations.
+`detect_roles()` points the filter compiler at them when they exist.
+
+Codes: F_GENDER 'M'/'F'/'U'/'O', F_ALCOHOL 'Y'/'N'/'U' (NULL when a one-hot
+row has no flag set), F_AGE_BIN is the victims-by-age label ('20–29', '80+',
+'Unknown').
+"""
+from .catalog import detect_roles
+from .filters import GENDER_MALE, GENDER_FEMALE, ALCOHOL_YES, ALCOHOL_NO
+
+F_WEEKDAY, F_HOUR, F_AGE, F_AGE_BIN, F_GENDER, F_ALCOHOL = (
+    "F_WEEKDAY", "F_HOUR", "F_AGE", "F_AGE_BIN", "F_GENDER", "F_ALCOHOL")
+FILTER_COLUMNS = (F_WEEKDAY, F_HOUR, F_AGE, F_AGE_BIN, F_GENDER, F_ALCOHOL)
+UNKNOWN = "'U'"
+
+# range predicates (hour, age) last so the equality prefix narrows first
+FILTER_INDEXES = {
+    "ix_f_gender_alcohol_hour": (F_GENDER, F_ALCOHOL, F_HOUR),
+    "ix_f_weekday_hour": (F_WEEKDAY, F_HOUR),
+    "ix_f_barangay_hour": ("BARANGAY", F_HOUR),
+    "ix_f_age": (F_AGE,),
+}
+
+
+def _numeric(col: str, digits: int) -> str:
+    # guarded: a bad or oversized value must give NULL, not a strict-mode insert error
+    return (f"IF(`{col}` REGEXP '^-?[0-9]{{1,{digits}}}(\\\\.[0-9]+)?$', "
+            f"TRUNCATE(CAST(`{col}` AS DECIMAL(12,2)), 0), NULL)")
+
+
+def _flag(col: str | None) -> str | None:
+    return col and f"COALESCE(`{col}`,0) = 1"
+
+
+def _code(pairs, default: str = "NULL") -> str:
+    whens = " ".join(f"WHEN {cond} THEN '{code}'" for cond, code in pairs if cond)
+    return f"CASE {whens} ELSE {default} END" if whens else default
+
+
+def column_definitions(columns) -> dict[str, str]:
+    """Generated column -> 'TYPE AS (expr) STORED' for the sources `columns` has."""
+    cols = set(columns)
+    roles = detect_roles(columns)
+    defs = {}
+
+    if "DATE_COMMITTED" in cols:
+        defs[F_WEEKDAY] = "TINYINT AS (WEEKDAY(`DATE_COMMITTED`)) STORED"
+    if "HOUR_COMMITTED" in cols:
+        defs[F_HOUR] = f"TINYINT AS ({_numeric('HOUR_COMMITTED', 2)}) STORED"
+    if roles["age"]:
+        defs[F_AGE] = f"SMALLINT AS ({_numeric(roles['age'], 4)}) STORED"
+        defs[F_AGE_BIN] = (
+            "VARCHAR(16) AS (CASE WHEN `F_AGE` IS NULL OR `F_AGE` < 0 THEN 'Unknown' "
+            "WHEN `F_AGE` >= 80 THEN '80+' "
+            "ELSE CONCAT(FLOOR(`F_AGE`/10)*10, '–', FLOOR(`F_AGE`/10)*10 + 9) END) STORED"
+        )
+
+    cat, onehot = roles["gender_cat"], roles["gender_onehot"]
+    if cat:
+        g = f"UPPER(TRIM(`{cat}`))"
+        pairs = [(f"{g} IN {GENDER_MALE}", "M"), (f"{g} IN {GENDER_FEMALE}", "F")]
+        defs[F_GENDER] = f"CHAR(1) AS ({_code(pairs, UNKNOWN)}) STORED"
+    elif any(onehot.values()):
+        pairs = [(_flag(onehot[k]), code) for k, code in
+                 (("male", "M"), ("female", "F"), ("unknown", "U"), ("other", "O"))]
+        defs[F_GENDER] = f"CHAR(1) AS ({_code(pairs)}) STORED"
+
+    cat, onehot = roles["alcohol_cat"], roles["alcohol_onehot"]
+    if any(onehot.values()):
+        pairs = [(_flag(onehot[v]), v[0]) for v in ("Yes", "No", "Unknown")]
+        defs[F_ALCOHOL] = f"CHAR(1) AS ({_code(pairs)}) STORED"
+    elif cat:
+        a = f"UPPER(TRIM(`{cat}`))"
+        pairs = [(f"{a} IN {ALCOHOL_YES}", "Y"), (f"{a} IN {ALCOHOL_NO}", "N")]
+        defs[F_ALCOHOL] = f"CHAR(1) AS ({_code(pairs, UNKNOWN)}) STORED"
+    return defs
+
+
+def ensure_filter_columns(cur, table: str) -> list[str]:
+    """
+    Add the missing generated columns and indexes to `table` in one ALTER.
+    DDL commits implicitly, so call it before inserting. Returns what was added.
+    """
+    cur.execute(f"SHOW COLUMNS FROM `{table}`")
+    existing = [r[0] for r in cur.fetchall()]
+    cur.execute(f"SHOW INDEX FROM `{table}`")
+    have_indexes = {r[2] for r in cur.fetchall()}
+
+    defs = column_definitions([c for c in existing if c not in FILTER_COLUMNS])
+    present = set(existing) | set(defs)
+    clauses, added = [], []
+    for col, decl in defs.items():        # dict order keeps F_AGE ahead of F_AGE_BIN
+        if col not in existing:
+            clauses.append(f"ADD COLUMN `{col}` {decl}"); added.append(col)
+    for name, parts in FILTER_INDEXES.items():
+        if name not in have_indexes and all(p in present for p in parts):
+            clauses.append(f"ADD INDEX `{name}` ({', '.join(f'`{p}`' for p in parts)})"); added.append(name)
+    if clauses:
+        cur.execute(f"ALTER TABLE `{table}` " + ", ".join(clauses))
+    return added
@@ -0,0 +1,174 @@
+# app/services/filters.py
+"""
+One filter compiler for the chart endpoints.
+
+`parse_filters(request.args)` turns the dashboard's query string into a
+canonical filter spec (sorted weekdays, canonical alcohol values, clamped
+hour bounds; hour from > to is a window across midnight);
+`compile_where(roles, spec)` turns that spec plus the table's cached column
+roles into a parameterized WHERE clause. Equal filter sets
+always give the same SQL text and parameters, whichever endpoint asks.
+"""
+
+WEEKDAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+ALCOHOL_ORDER = ("Yes", "No", "Unknown")
+GENDERS = ("male", "female", "unknown", "other")
+FILTER_ARGS = ("location", "gender", "day_of_week", "alcohol", "hour_from", "hour_to", "age_from", "age_to")
+
+# categorical spellings, matched on UPPER(TRIM(col))
+GENDER_MALE   = "('M','MALE')"
+GENDER_FEMALE = "('F','FEMALE')"
+GENDER_KNOWN  = "('M','MALE','F','FEMALE')"
+ALCOHOL_YES   = "('YES','Y','1','TRUE')"
+ALCOHOL_NO    = "('NO','N','0','FALSE')"
+ALCOHOL_KNOWN = "('YES','Y','1','TRUE','NO','N','0','FALSE')"
+
+
+def _int_or_none(v):
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+def _split(v) -> list[str]:
+    return [s.strip() for s in (v or "").split(",") if s.strip()]
+
+
+def _weekday(item: str) -> int | None:
+    """"1. Monday" / "1" (1=Mon..7=Sun) / "Monday" -> 0..6 (MySQL WEEKDAY)."""
+    n = _int_or_none(item.split(".", 1)[0].strip())
+    if n is not None:
+        return n - 1 if 1 <= n <= 7 else None
+    low = item.lower()
+    return next((i for i, name in enumerate(WEEKDAY_NAMES) if name in low), None)
+
+
+def parse_filters(args) -> dict:
+    """Canonical filter spec from request.args (missing/invalid values dropped)."""
+    gender = (args.get("gender") or "").strip().lower()
+
+    alcohol = {v.capitalize() for v in _split(args.get("alcohol"))}
+
+    hour = None
+    h_from, h_to = _int_or_none(args.get("hour_from")), _int_or_none(args.get("hour_to"))
+    if h_from is not None and h_to is not None:
+        hour = (max(0, min(23, h_from)), max(0, min(23, h_to)))   # from > to: a window across midnight
+
+    age = None
+    a_from, a_to = _int_or_none(args.get("age_from")), _int_or_none(args.get("age_to"))
+    if a_from is not None or a_to is not None:
+        if a_from is not None and a_to is not None and a_from > a_to:
+            a_from, a_to = a_to, a_from
+        age = (a_from, a_to)
+
+    return {
+        "location": (args.get("location") or "").strip() or None,
+        "gender": gender if gender in GENDERS else None,
+        "weekdays": tuple(sorted({w for w in map(_weekday, _split(args.get("day_of_week"))) if w is not None})),
+        "alcohol": tuple(v for v in ALCOHOL_ORDER if v in alcohol),
+        "hour": hour,
+        "age": age,
+    }
+
+
+def hour_bounds(args) -> tuple[int, int]:
+    """
+    Hour filter of the accidents-by-hour chart: missing bounds default to
+    0 / 23; from > to wraps across midnight, as in `parse_filters()`.
+    """
+    h_from, h_to = _int_or_none(args.get("hour_from")), _int_or_none(args.get("hour_to"))
+    return (max(0, min(23, 0 if h_from is None else h_from)),
+            max(0, min(23, 23 if h_to is None else h_to)))
+
+
+def hour_axis(lo: int, hi: int) -> list[int]:
+    """The hours of a `hour_bounds()` window in order, e.g. 22, 23, 0, 1 for (22, 1)."""
+    return list(range(lo, hi + 1)) if lo <= hi else list(range(lo, 24)) + list(range(0, hi + 1))
+
+
+def filter_key(args) -> tuple:
+    """Hashable form of the filter query args (unknown keys and blanks dropped), for cache keys."""
+    return tuple((k, v) for k in FILTER_ARGS if (v := (args.get(k) or "").strip()))
+
+
+def _gender_clause(roles: dict, gender: str) -> str | None:
+    cat = roles["gender_cat"]
+    if roles["gender_code"] and (cat or roles["gender_onehot"].get(gender)):
+        code = {"male": "M", "female": "F", "unknown": "U"}.get(gender, "U" if cat else "O")
+        return f"`{roles['gender_code']}` = '{code}'"
+    if cat:
+        if gender == "male":
+            return f"UPPER(TRIM(`{cat}`)) IN {GENDER_MALE}"
+        if gender == "female":
+            return f"UPPER(TRIM(`{cat}`)) IN {GENDER_FEMALE}"
+        return f"(`{cat}` IS NULL OR UPPER(TRIM(`{cat}`)) NOT IN {GENDER_KNOWN})"
+    col = roles["gender_onehot"].get(gender)
+    return f"COALESCE(`{col}`,0) = 1" if col else None
+
+
+def _alcohol_clause(roles: dict, values: tuple) -> str | None:
+    if roles["alcohol_code"]:
+        onehot = roles["alcohol_onehot"]
+        codes = [v[0] for v in values if (onehot[v] if any(onehot.values()) else roles["alcohol_cat"])]
+        quoted = ", ".join(f"'{c}'" for c in codes)
+        return f"`{roles['alcohol_code']}` IN ({quoted})" if codes else None
+    pieces = []
+    for v in values:
+        col = roles["alcohol_onehot"].get(v)
+        cat = roles["alcohol_cat"]
+        if col:
+            pieces.append(f"COALESCE(`{col}`,0) = 1")
+        elif cat and not any(roles["alcohol_onehot"].values()):
+            if v == "Yes":
+                pieces.append(f"UPPER(TRIM(`{cat}`)) IN {ALCOHOL_YES}")
+            elif v == "No":
+                pieces.append(f"UPPER(TRIM(`{cat}`)) IN {ALCOHOL_NO}")
+            else:
+                pieces.append(f"(`{cat}` IS NULL OR UPPER(TRIM(`{cat}`)) NOT IN {ALCOHOL_KNOWN})")
+    return "(" + " OR ".join(pieces) + ")" if pieces else None
+
+
+def compile_where(roles: dict, spec: dict, extra=()) -> tuple[str, tuple]:
+    """
+    (" WHERE ..." or "", params) for `spec` against a table's column roles.
+    `extra` conditions (endpoint-specific, parameter-free) come first.
+    Filters whose column is missing are skipped rather than erroring.
+    """
+    where, params = [c for c in extra if c], []
+
+    if spec["location"] and roles["barangay"]:
+        where.append(f"`{roles['barangay']}` = %s")
+        params.append(spec["location"])
+
+    if spec["gender"]:
+        clause = _gender_clause(roles, spec["gender"])
+        if clause:
+            where.append(clause)
+
+    if spec["weekdays"] and roles["weekday"]:
+        where.append(f"{roles['weekday']} IN ({', '.join(['%s'] * len(spec['weekdays']))})")
+        params.extend(spec["weekdays"])
+
+    if spec["alcohol"]:
+        clause = _alcohol_clause(roles, spec["alcohol"])
+        if clause:
+            where.append(clause)
+
+    if spec["hour"] and roles["hour"]:
+        lo, hi = spec["hour"]
+        expr = roles["hour"]["expr"]
+        where.append(f"{expr} BETWEEN %s AND %s" if lo <= hi else f"({expr} >= %s OR {expr} <= %s)")
+        params.extend([lo, hi])
+
+    if spec["age"] and roles["age_num"]:
+        lo, hi = spec["age"]
+        age = roles["age_num"]
+        if lo is not None and hi is not None:
+            where.append(f"{age} BETWEEN %s AND %s"); params.extend([lo, hi])
+        elif lo is not None:
+            where.append(f"{age} >= %s"); params.append(lo)
+        else:
+            where.append(f"{age} <= %s"); params.append(hi)
+
+    return (" WHERE " + " AND ".join(where) if where else ""), tuple(params)
@@ -1,13 +1,90 @@
-import numpy as np, pandas as pd, folium
-from flask import jsonify, request, session, Response
+import json, os, threading, time
+import numpy as np, pandas as pd, folium, xgboost as xgb
+from flask import jsonify, request, session, Response, current_app
 from datetime import datetime
 from xgboost import XGBRegressor
 from sklearn.ensemble import RandomForestRegressor
-from .database import list_tables
+from .database import list_tables, table_fingerprint
+from .model_cache import get_model_cache
+from .hotspot_cube import load_cube, cube_frame
 from ..extensions import get_engine   # ⬅ use engine for pandasz
 
+# Hotspot model hyper-parameters (same as Colab)
+HOTSPOT_XGB_PARAMS = dict(
+    objective='count:poisson',
+    n_estimators=1000, learning_rate=0.01,
+    max_depth=4, min_child_weight=1, gamma=0.1,
+    random_state=42
+)
+
 # === 1) RF monthly API (from your /api/rf_monthly_forecast) ===
-def rf_monthly_payload(table: str):
+RF_FEATURES = ["lag_1_month", "lag_2_month", "lag_3_month", "lag_12_month",
+               "rolling_mean_3_months", "month_of_year", "quarter_of_year"]
+RF_MODES = ("recursive", "direct")
+
+def _rf_recursive_rollout(rf, history: np.ndarray, last_row: np.ndarray, future_idx) -> np.ndarray:
+    """
+    Recursive 12-step rollout over a preallocated lag buffer.
+
+    `history` is the (post-dropna) monthly count series, `last_row` the
+    feature row of its last month in RF_FEATURES order. Each step is one
+    predict() on a contiguous (1, n_features) array; lags are rolled in place.
+    Produces exactly what the old pandas concat/shift loop produced,
+    including lag_12/month being taken from the month just predicted.
+    """
+    i_l1, i_l2, i_l3, i_l12, i_rm, i_moy, i_qoy = (RF_FEATURES.index(c) for c in RF_FEATURES)
+    n_hist, horizon = len(history), len(future_idx)
+    buf = np.empty(n_hist + horizon, dtype=float)
+    buf[:n_hist] = history
+    x = np.ascontiguousarray(last_row, dtype=float).reshape(1, -1).copy()
+    months = future_idx.month.to_numpy()
+    quarters = future_idx.quarter.to_numpy()
+
+    for i in range(horizon):
+        pred = float(np.round(rf.predict(x)[0]))
+        buf[n_hist + i] = pred
+        j = n_hist + i - 12
+        if j >= 0 and not np.isnan(buf[j]):
+            x[0, i_l12] = buf[j]
+        # else: keep the previous lag_12 (same fallback as before)
+        x[0, i_l3] = x[0, i_l2]
+        x[0, i_l2] = x[0, i_l1]
+        x[0, i_l1] = pred
+        x[0, i_rm] = (x[0, i_l1] + x[0, i_l2] + x[0, i_l3]) / 3.0
+        x[0, i_moy] = months[i]
+        x[0, i_qoy] = quarters[i]
+    return buf[n_hist:]
+
+def _rf_direct_fit_predict(counts: np.ndarray, index: pd.DatetimeIndex, horizon: int = 12) -> np.ndarray | None:
+    """
+    Direct multi-horizon forecast: one multi-output forest maps the features
+    known at the end of month t to counts for t+1..t+horizon, so all months
+    come out of a single predict() call. Returns None when the history is
+    too short to build at least a few training rows.
+    """
+    n = len(counts)
+    if n < 12 + horizon + 3:
+        return None
+    y = counts.astype(float)
+
+    # row s describes the month s (features use data up to s-1)
+    s_idx = np.arange(12, n + 1)                   # n+1 -> "next month" origin
+    lag1 = y[s_idx - 1]; lag2 = y[s_idx - 2]; lag3 = y[s_idx - 3]
+    lag12 = y[s_idx - 12]
+    rmean = (lag1 + lag2 + lag3) / 3.0
+    months = np.append(index.month.to_numpy(), (index[-1] + pd.offsets.MonthEnd(1)).month)[s_idx]
+    quarters = (months - 1) // 3 + 1
+    X = np.column_stack([lag1, lag2, lag3, lag12, rmean, months, quarters]).astype(float)
+
+    n_train = n - horizon - 12 + 1                 # rows whose whole horizon is observed
+    windows = np.lib.stride_tricks.sliding_window_view(y, horizon)
+    Y = windows[12: 12 + n_train]
+
+    rf = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2)
+    rf.fit(X[:n_train], Y)
+    return np.round(rf.predict(X[-1:])[0])
+
+def rf_monthly_payload(table: str, mode: str = "recursive"):
     # read with SQLAlchemy engine (no pandas warning)
     engine = get_engine()
     df = pd.read_sql_query(
@@ -22,6 +99,8 @@ def rf_monthly_payload(table: str):
     ts = df.set_index("DATE_COMMITTED").resample("ME").size().to_frame("accident_count")
     if len(ts) < 15:
         return {"success": True, "data": None, "message": "Not enough monthly history (need ≥15 months for lags)."}
+    monthly_counts = ts["accident_count"].to_numpy(dtype=float)
+    monthly_index = ts.index
 
     ts["lag_1_month"] = ts["accident_count"].shift(1)
     ts["lag_2_month"] = ts["accident_count"].shift(2)
@@ -34,47 +113,22 @@ def rf_monthly_payload(table: str):
     if ts.empty:
         return {"success": True, "data": None, "message": "Not enough rows after feature engineering."}
 
-    y_full = ts["accident_count"].astype(float)
-    X_full = ts.drop(columns=["accident_count"]).astype(float)
-    feature_cols = X_full.columns.tolist()
-
-    rf = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2)
-    rf.fit(X_full, y_full)
-
     months_to_forecast = 12
     last_idx = ts.index.max()
     future_idx = pd.date_range(start=last_idx + pd.DateOffset(months=1),
                                periods=months_to_forecast, freq="ME")
 
-    future_preds = []
-    history_series = ts["accident_count"].copy()
-    current_features = ts.iloc[[-1]][feature_cols].copy()
-
-    for i, fdate in enumerate(future_idx):
-        pred = float(np.round(rf.predict(current_features[feature_cols])[0]))
-        future_preds.append(pred)
-
-        history_plus_future = pd.concat([history_series, pd.Series(future_preds, index=future_idx[: i + 1])])
-        next_row = current_features.copy(); next_row.index = [fdate]
-        next_row.loc[fdate, "lag_3_month"] = current_features["lag_2_month"].values[0]
-        next_row.loc[fdate, "lag_2_month"] = current_features["lag_1_month"].values[0]
-        next_row.loc[fdate, "lag_1_month"] = pred
+    future_preds = None
+    if mode == "direct":
+        future_preds = _rf_direct_fit_predict(monthly_counts, monthly_index, months_to_forecast)
+    if future_preds is None:
+        # contiguous float arrays; fitting on ndarray keeps predict() free of feature-name checks
+        y_full = ts["accident_count"].to_numpy(dtype=float)
+        X_full = np.ascontiguousarray(ts[RF_FEATURES].to_numpy(dtype=float))
 
-        lag12_val = history_plus_future.shift(12).get(fdate, np.nan)
-        if pd.isna(lag12_val):
-            lag12_val = current_features.get("lag_12_month", pd.Series([0.0])).values[0]
-        next_row.loc[fdate, "lag_12_month"] = float(lag12_val)
-
-        rmean = np.mean([
-            next_row.loc[fdate, "lag_1_month"],
-            next_row.loc[fdate, "lag_2_month"],
-            next_row.loc[fdate, "lag_3_month"],
-        ])
-        next_row.loc[fdate, "rolling_mean_3_months"] = float(rmean)
-        next_row.loc[fdate, "month_of_year"] = fdate.month
-        next_row.loc[fdate, "quarter_of_year"] = fdate.quarter
-
-        current_features = next_row[feature_cols].copy()
+        rf = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2)
+        rf.fit(X_full, y_full)
+        future_preds = _rf_recursive_rollout(rf, y_full, X_full[-1], future_idx)
 
     last_actual_year = ts.index.max().year
     last_year_mask = ts.index.year == last_actual_year
@@ -93,197 +147,497 @@ def rf_monthly_payload(table: str):
     return {"success": True, "data": payload}
 
 
+# --- RF result store: one payload per table, reused until the fingerprint moves ---
+_RF_RESULTS: dict[tuple[str, str], tuple[str, dict]] = {}
+_RF_LOCK = threading.Lock()
+
+def _rf_store_path(table: str, mode: str = "recursive") -> str | None:
+    try:
+        directory = current_app.config.get("MODEL_CACHE_DIR")
+    except RuntimeError:
+        return None
+    if not directory:
+        return None
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in table)[:60]
+    return os.path.join(directory, f"rf_monthly-{safe}-{mode}.json")
+
+def rf_monthly_cached(table: str, mode: str = "recursive") -> tuple[dict, str | None]:
+    """
+    rf_monthly_payload(), memoized per table on its data fingerprint.
+
+    Returns (result, etag). The etag is derived from the data version, so it
+    stays stable across workers and restarts; it is None when the table
+    cannot be fingerprinted (result is then computed uncached).
+    """
+    try:
+        version = table_fingerprint(table)["version"]
+    except Exception:
+        return rf_monthly_payload(table, mode), None
+    etag = f"rf-{mode}-{version}"
+
+    with _RF_LOCK:
+        hit = _RF_RESULTS.get((table, mode))
+    if hit and hit[0] == version:
+        return hit[1], etag
+
+    # other workers may already have computed it
+    path = _rf_store_path(table, mode)
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                stored = json.load(fh)
+            if stored.get("version") == version:
+                with _RF_LOCK:
+                    _RF_RESULTS[(table, mode)] = (version, stored["result"])
+                return stored["result"], etag
+        except (OSError, ValueError, KeyError):
+            pass
+
+    result = rf_monthly_payload(table, mode)
+    with _RF_LOCK:
+        _RF_RESULTS[(table, mode)] = (version, result)
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"version": version, "result": result}, fh)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return result, etag
+
+def forget_rf_results(table: str | None = None):
+    """Drop stored RF payloads (all tables, or just `table`)."""
+    with _RF_LOCK:
+        for key in [k for k in _RF_RESULTS if table is None or k[0] == table]:
+            del _RF_RESULTS[key]
+    if table is not None:
+        for mode in RF_MODES:
+            path = _rf_store_path(table, mode)
+            if path and os.path.exists(path):
+                try: os.remove(path)
+                except OSError: pass
+
+
 # === 2) Folium map builder (from your _build_forecast_map_html) ===
-def build_forecast_map_html(
+# "window": one model per hour window (trained on the selected hours only).
+# "hourly": one model over hotspot × hour × month counts with hour as a feature;
+#           any window is the sum of its hours, so every window shares one booster.
+HOTSPOT_ENGINES = ("window", "hourly")
+HOURLY_FEATURES = ['ACCIDENT_HOTSPOT', 'HOUR_COMMITTED', 'lag_1_month',
+                   'rolling_mean_3_months', 'month_of_year', 'quarter_of_year']
+
+def _parse_hour(hmm: str) -> int | None:
+    if not hmm: return None
+    try:
+        return int(hmm.split(":")[0])
+    except Exception:
+        return None
+
+def _resolve_hours(time_from: str, time_to: str, legacy_time: str,
+                   live_hour: int | None = None) -> tuple[list[int] | None, str, str]:
+    """
+    Map the time filters to (hours or None for all, display label, cache key).
+    `live_hour` pins "Live" to a given hour (used when pre-warming the next hour).
+    """
+    h_from = _parse_hour(time_from)
+    h_to   = _parse_hour(time_to)
+
+    if (h_from is not None) and (h_to is not None):
+        if h_from <= h_to:
+            hours = list(range(h_from, h_to + 1))
+        else:
+            hours = list(range(h_from, 24)) + list(range(0, h_to + 1))
+        return hours, f"{h_from:02d}:00–{h_to:02d}:00", f"hours:{h_from:02d}-{h_to:02d}"
+
+    t = (legacy_time or "Live").lower()
+    if t == "live":
+        current_hour = manila_hour() if live_hour is None else int(live_hour) % 24
+        return [current_hour], f"Live ({current_hour:02d}:00)", f"hours:{current_hour:02d}-{current_hour:02d}"
+    if t == "all":
+        return None, "All Hours", "hours:all"
+    try:
+        hour_val = max(0, min(23, int(t)))
+        return [hour_val], f"Hour {hour_val:02d}:00", f"hours:{hour_val:02d}-{hour_val:02d}"
+    except Exception:
+        return None, "All Hours", "hours:all"
+
+def manila_hour() -> int:
+    try:
+        import pytz
+        tz = pytz.timezone("Asia/Manila")
+        return int(datetime.now(tz).hour)
+    except Exception:
+        return int(pd.Timestamp.now().hour)
+
+# --- Hotspot model training ---------------------------------------------------
+HOTSPOT_TRAINING_MODES = ("full", "early_stop")
+
+class _TimeBudget(xgb.callback.TrainingCallback):
+    """Stop boosting once `seconds` of wall-clock time have been spent."""
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.hit = False
+
+    def before_training(self, model):
+        self.started = time.perf_counter()
+        return model
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.hit = time.perf_counter() - self.started >= self.seconds
+        return self.hit
+
+def _training_settings() -> dict:
+    try:
+        cfg = current_app.config
+    except RuntimeError:
+        cfg = {}
+    mode = str(cfg.get("HOTSPOT_TRAINING", "full")).lower()
+    return {
+        "mode": mode if mode in HOTSPOT_TRAINING_MODES else "full",
+        "holdout_months": max(1, int(cfg.get("HOTSPOT_HOLDOUT_MONTHS", 3))),
+        "budget_seconds": float(cfg.get("HOTSPOT_TRAIN_BUDGET_SECONDS", 10.0)),
+        "early_stopping_rounds": max(1, int(cfg.get("HOTSPOT_EARLY_STOPPING_ROUNDS", 50))),
+    }
+
+def _fit_full(X_full, y_full) -> XGBRegressor:
+    """Original fit: all n_estimators trees on every row."""
+    started = time.perf_counter()
+    model = XGBRegressor(**HOTSPOT_XGB_PARAMS)
+    model.fit(X_full, y_full, verbose=False)
+    model.get_booster().set_attr(training_report=json.dumps({
+        "mode": "full", "trees": HOTSPOT_XGB_PARAMS["n_estimators"],
+        "seconds": round(time.perf_counter() - started, 3), "train_rows": int(len(y_full)),
+    }))
+    return model
+
+def _fit_early_stop(X_full, y_full, dates, settings: dict) -> XGBRegressor:
+    """
+    Hist-tree fit with early stopping on a time-ordered holdout (the last
+    `holdout_months` months of ts_data) under a wall-clock budget, then a
+    refit on all rows with the number of trees the holdout picked. The
+    training QuantileDMatrix's bin edges are reused for the holdout and
+    refit matrices, so the data is sketched once.
+    """
+    started = time.perf_counter()
+    months = np.sort(pd.unique(dates))
+    if len(months) <= settings["holdout_months"]:
+        return _fit_full(X_full, y_full)
+    is_hold = (dates >= months[-settings["holdout_months"]]).to_numpy()
+
+    params = {
+        "objective": HOTSPOT_XGB_PARAMS["objective"],
+        "eta": HOTSPOT_XGB_PARAMS["learning_rate"],
+        "max_depth": HOTSPOT_XGB_PARAMS["max_depth"],
+        "min_child_weight": HOTSPOT_XGB_PARAMS["min_child_weight"],
+        "gamma": HOTSPOT_XGB_PARAMS["gamma"],
+        "seed": HOTSPOT_XGB_PARAMS["random_state"],
+        "tree_method": "hist",
+        "eval_metric": ["poisson-nloglik", "rmse"],
+    }
+    train = xgb.QuantileDMatrix(X_full[~is_hold], y_full[~is_hold])
+    hold = xgb.QuantileDMatrix(X_full[is_hold], y_full[is_hold], ref=train)
+    full = xgb.QuantileDMatrix(X_full, y_full, ref=train)
+
+    budget = _TimeBudget(settings["budget_seconds"])
+    evals_log: dict = {}
+    search = xgb.train(
+        params, train, num_boost_round=HOTSPOT_XGB_PARAMS["n_estimators"],
+        evals=[(hold, "holdout")], evals_result=evals_log, verbose_eval=False,
+        callbacks=[xgb.callback.EarlyStopping(rounds=settings["early_stopping_rounds"],
+                                              metric_name="poisson-nloglik", data_name="holdout"),
+                   budget],
+    )
+    best = int(getattr(search, "best_iteration", search.num_boosted_rounds() - 1))
+    trees = best + 1
+    search_seconds = time.perf_counter() - started
+
+    # refit on every month (the holdout months carry the freshest lags)
+    booster = xgb.train(params, full, num_boost_round=trees, verbose_eval=False)
+    booster.set_attr(training_report=json.dumps({
+        "mode": "early_stop",
+        "trees": trees,
+        "trees_searched": int(search.num_boosted_rounds()),
+        "budget_hit": budget.hit,
+        "seconds": round(time.perf_counter() - started, 3),
+        "search_seconds": round(search_seconds, 3),
+        "holdout_months": settings["holdout_months"],
+        "holdout_poisson_nloglik": round(float(evals_log["holdout"]["poisson-nloglik"][best]), 5),
+        "holdout_rmse": round(float(evals_log["holdout"]["rmse"][best]), 5),
+        "train_rows": int((~is_hold).sum()),
+        "holdout_rows": int(is_hold.sum()),
+    }))
+    model = XGBRegressor()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+def training_report(model) -> dict | None:
+    """How a hotspot booster was trained (stored on the booster, so it survives the disk cache)."""
+    try:
+        raw = model.get_booster().attr("training_report")
+    except Exception:
+        return None
+    return json.loads(raw) if raw else None
+
+def _fit_hotspot_model(table: str, key_parts: tuple, X_full, y_full, dates=None):
+    """Fit the Poisson XGB, or reuse a cached booster for the same table version + key."""
+    settings = _training_settings()
+    if dates is None:
+        settings["mode"] = "full"
+
+    def _fit():
+        if settings["mode"] == "early_stop":
+            return _fit_early_stop(X_full, y_full, dates, settings)
+        return _fit_full(X_full, y_full)
+
+    if settings["mode"] == "early_stop":
+        key_parts = tuple(key_parts) + (("train", settings["holdout_months"], settings["budget_seconds"],
+                                         settings["early_stopping_rounds"]),)
+    try:
+        data_version = table_fingerprint(table)["version"]
+    except Exception:
+        data_version = None
+    if not data_version:
+        return _fit()
+    return get_model_cache().get_or_fit((table, data_version) + tuple(key_parts), _fit)
+
+# --- Dense hotspot × month engine -----------------------------------------------
+WINDOW_FEATURES = ['ACCIDENT_HOTSPOT', 'lag_1_month', 'rolling_mean_3_months',
+                   'month_of_year', 'quarter_of_year']
+
+def _dense_counts(rows: np.ndarray, month_end: pd.Series, counts: pd.Series,
+                  n_series: int, months: pd.DatetimeIndex) -> np.ndarray:
+    """(series × month) matrix of summed counts; cells outside `months` are ignored."""
+    col = (np.asarray(month_end, dtype="datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+           - np.datetime64(months[0], "M").astype(np.int64))
+    ok = (col >= 0) & (col < len(months))
+    mat = np.zeros((n_series, len(months)))
+    np.add.at(mat, (rows[ok], col[ok]), counts.to_numpy(dtype=float)[ok])
+    return mat
+
+def _lag_features(C: np.ndarray, months: pd.DatetimeIndex):
+    """
+    Training rows for months 3..M-1 of every series (series-major, like the
+    old long frame after dropna): lag-1, mean of the 3 prior months, month
+    of year and quarter, plus the targets and each row's month.
+    """
+    S, M = C.shape
+    lag1 = C[:, 2:M-1]
+    roll = (C[:, 0:M-3] + C[:, 1:M-2] + C[:, 2:M-1]) / 3
+    target_months = months[3:]
+    return {
+        "lag_1_month": lag1.ravel(),
+        "rolling_mean_3_months": roll.ravel(),
+        "month_of_year": np.tile(target_months.month.to_numpy(), S),
+        "quarter_of_year": np.tile(target_months.quarter.to_numpy(), S),
+        "y": C[:, 3:].ravel(),
+        "dates": pd.Series(np.tile(target_months.to_numpy(), S)),
+    }
+
+def _month_sum(C: np.ndarray, months: pd.DatetimeIndex, first: int, start_date, end_date) -> np.ndarray:
+    """Per-series sum over months[first:] that fall inside [start_date, end_date]."""
+    in_range = np.zeros(len(months), dtype=bool)
+    in_range[first:] = True
+    in_range &= (months >= start_date) & (months <= end_date)
+    return C[:, in_range].sum(axis=1)
+
+def _months_between(last_known_month, end_date) -> int:
+    return (end_date.year - last_known_month.year)*12 + (end_date.month - last_known_month.month)
+
+def _window_engine_totals(table, cube, cube_filtered, hour_key, barangay_filter, start_date, end_date):
+    """Per-hotspot actual/forecast totals from a model trained on the selected hours."""
+    hotspots = np.unique(cube['ACCIDENT_HOTSPOT'].to_numpy())
+    months = pd.date_range(cube['MIN_DATE'].min(), cube['MAX_DATE'].max(), freq='ME')
+    if len(months) < 4:
+        return None
+
+    # hotspot × month counts, restricted to the chosen hours
+    rows = np.searchsorted(hotspots, cube_filtered['ACCIDENT_HOTSPOT'].to_numpy())
+    C = _dense_counts(rows, cube_filtered['MONTH_END'], cube_filtered['ACCIDENT_COUNT'], len(hotspots), months)
+
+    feats = _lag_features(C, months)
+    X_full = pd.DataFrame({'ACCIDENT_HOTSPOT': np.repeat(hotspots, len(months) - 3),
+                           **{k: feats[k] for k in WINDOW_FEATURES[1:]}})
+    y_full = pd.Series(feats["y"], name='accident_count')
+
+    # Training only depends on (table contents, hour window, barangay filter);
+    # the month window just changes what we sum afterwards, so reuse the booster.
+    final_model = _fit_hotspot_model(table, (hour_key, (barangay_filter or "").strip().lower()), X_full, y_full,
+                                     dates=feats["dates"])
+
+    last_known_month = months[-1]
+
+    # Actuals within date window (the first 3 months have no lag features)
+    actual = None
+    if start_date <= last_known_month:
+        actual = _month_sum(C, months, 3, start_date, min(end_date, last_known_month))
+
+    # Forecast months until end_date, rolling the last row's features in place.
+    # The first step re-scores the last known month's features and lags 2/3
+    # start at zero, exactly as the long-frame rollout did.
+    forecast = None
+    if end_date > last_known_month:
+        X = np.empty((len(hotspots), len(WINDOW_FEATURES)))
+        X[:, 0] = hotspots
+        X[:, 1] = C[:, -2]
+        X[:, 2] = C[:, -4:-1].mean(axis=1)
+        X[:, 3] = last_known_month.month
+        X[:, 4] = last_known_month.quarter
+        lag2 = np.zeros(len(hotspots)); lag3 = np.zeros(len(hotspots))
+        frame = pd.DataFrame(X, columns=WINDOW_FEATURES, copy=False)
+        forecast = np.zeros(len(hotspots))
+        for i in range(_months_between(last_known_month, end_date)):
+            preds = final_model.predict(frame)
+            forecast += preds
+            lag3, lag2 = lag2, frame['lag_1_month'].to_numpy(copy=True)
+            frame['lag_1_month'] = preds
+            frame['rolling_mean_3_months'] = (preds + lag2 + lag3) / 3
+            nm = last_known_month + pd.DateOffset(months=i+2)
+            frame['month_of_year'] = nm.month
+            frame['quarter_of_year'] = nm.quarter
+
+    return _totals_frames(hotspots, actual, forecast) + (training_report(final_model),)
+
+def _hourly_engine_totals(table, cube, hours, barangay_filter, start_date, end_date):
+    """Per-hotspot totals from one hour-aware model; the window is a sum over `hours`."""
+    hotspots = np.unique(cube['ACCIDENT_HOTSPOT'].to_numpy())
+    months = pd.date_range(cube['MIN_DATE'].min(), cube['MAX_DATE'].max(), freq='ME')
+    if len(months) < 4:
+        return None
+
+    # (hotspot × hour) × month counts, all 24 hours always; series row = hotspot*24 + hour
+    rows = (np.searchsorted(hotspots, cube['ACCIDENT_HOTSPOT'].to_numpy()) * 24
+            + cube['HOUR_COMMITTED'].to_numpy(dtype=int))
+    C = _dense_counts(rows, cube['MONTH_END'], cube['ACCIDENT_COUNT'], len(hotspots) * 24, months)
+
+    feats = _lag_features(C, months)
+    n_train = len(months) - 3
+    X_train = pd.DataFrame({'ACCIDENT_HOTSPOT': np.repeat(hotspots, 24 * n_train),
+                            'HOUR_COMMITTED': np.tile(np.repeat(np.arange(24), n_train), len(hotspots)),
+                            **{k: feats[k] for k in HOURLY_FEATURES[2:]}})
+
+    final_model = _fit_hotspot_model(
+        table, ("engine:hourly", (barangay_filter or "").strip().lower()),
+        X_train, pd.Series(feats["y"], name='accident_count'), dates=feats["dates"],
+    )
+
+    sel = np.arange(24) if hours is None else np.array(sorted(set(hours)), dtype=int)
+    wanted = C.reshape(len(hotspots), 24, len(months))[:, sel, :]      # hotspot × hour × month
+    last_known_month = months[-1]
+
+    # Actuals within date window (selected hours only), from month 3 like the window engine
+    actual = None
+    if start_date <= last_known_month:
+        actual = _month_sum(wanted.sum(axis=1), months, 3, start_date, min(end_date, last_known_month))
+
+    # Forecast each selected hotspot × hour series in place, then sum per hotspot
+    forecast = None
+    if end_date > last_known_month:
+        last3 = wanted[:, :, -3:].reshape(-1, 3).copy()                  # oldest → newest
+        frame = pd.DataFrame({
+            'ACCIDENT_HOTSPOT': np.repeat(hotspots, len(sel)), 'HOUR_COMMITTED': np.tile(sel, len(hotspots)),
+            'lag_1_month': 0.0, 'rolling_mean_3_months': 0.0,
+            'month_of_year': 0, 'quarter_of_year': 0,
+        })[HOURLY_FEATURES]
+        forecast = np.zeros(len(hotspots))
+        for i in range(_months_between(last_known_month, end_date)):
+            next_month = last_known_month + pd.DateOffset(months=i+1)
+            frame['lag_1_month'] = last3[:, 2]
+            frame['rolling_mean_3_months'] = last3.mean(axis=1)
+            frame['month_of_year'] = next_month.month
+            frame['quarter_of_year'] = next_month.quarter
+            preds = final_model.predict(frame)
+            forecast += preds.reshape(len(hotspots), len(sel)).sum(axis=1)
+            last3[:, :2] = last3[:, 1:]
+            last3[:, 2] = preds
+
+    return _totals_frames(hotspots, actual, forecast) + (training_report(final_model),)
+
+def _totals_frames(hotspots: np.ndarray, actual: np.ndarray | None, forecast: np.ndarray | None):
+    hist_summary = (pd.DataFrame({'ACCIDENT_HOTSPOT': hotspots, 'Total_Actual_Accidents': actual})
+                    if actual is not None else
+                    pd.DataFrame(columns=['ACCIDENT_HOTSPOT','Total_Actual_Accidents']))
+    future_summary = (pd.DataFrame({'ACCIDENT_HOTSPOT': hotspots, 'Total_Forecasted_Accidents': forecast})
+                      if forecast is not None else
+                      pd.DataFrame(columns=['ACCIDENT_HOTSPOT','Total_Forecasted_Accidents']))
+    return hist_summary, future_summary
+
+def hotspot_forecast_data(
     table,
     start_str: str = "",
     end_str: str = "",
     time_from: str = "",
     time_to: str = "",
     legacy_time: str = "Live",
-    barangay_filter: str = ""
-):
-    engine = get_engine()
-    cols = ["DATE_COMMITTED","HOUR_COMMITTED","ACCIDENT_HOTSPOT","LATITUDE","LONGITUDE","BARANGAY"]
-    sql = "SELECT {} FROM `{}`".format(", ".join(f"`{c}`" for c in cols), table)
-    df = pd.read_sql_query(sql, engine, parse_dates=["DATE_COMMITTED"])
-
-    if df.empty:
-        m = folium.Map(location=[14.581, 121.0], zoom_start=11)
-        return m.get_root().render()
+    barangay_filter: str = "",
+    hotspot_engine: str | None = None,
+    live_hour: int | None = None,
+) -> dict:
+    """
+    Per-hotspot actual + forecast totals for the map, as a compact columnar
+    dict: map center/zoom, the time label, and parallel lists (hotspot, lat,
+    lon, actual, forecast, color, radius, top_barangays). Both the JSON
+    endpoint and the Folium renderer are built on this.
+    """
+    if hotspot_engine not in HOTSPOT_ENGINES:
+        try:
+            hotspot_engine = current_app.config.get("HOTSPOT_ENGINE", "window")
+        except RuntimeError:
+            hotspot_engine = "window"
+
+    # Hotspot × month × hour × barangay cells, maintained at ingest
+    try:
+        cube = load_cube(table)
+    except Exception:
+        cube = None
+    if cube is None:
+        # no cube for this table yet (or unreadable): aggregate the raw rows here
+        engine = get_engine()
+        cols = ["DATE_COMMITTED","HOUR_COMMITTED","ACCIDENT_HOTSPOT","LATITUDE","LONGITUDE","BARANGAY"]
+        sql = "SELECT {} FROM `{}`".format(", ".join(f"`{c}`" for c in cols), table)
+        cube = cube_frame(pd.read_sql_query(sql, engine, parse_dates=["DATE_COMMITTED"]))
+
+    if cube.empty:
+        return _hotspot_payload([14.581, 121.0], 11, "")
 
     # --- Clean types ---
-    df["DATE_COMMITTED"] = pd.to_datetime(df["DATE_COMMITTED"], errors="coerce")
-    df = df.dropna(subset=["DATE_COMMITTED"]).copy()
-    df["HOUR_COMMITTED"] = pd.to_numeric(df["HOUR_COMMITTED"], errors="coerce").astype("Int64")
-    df = df.dropna(subset=["HOUR_COMMITTED"]).copy()
-    df["HOUR_COMMITTED"] = df["HOUR_COMMITTED"].astype(int)
-    df["ACCIDENT_HOTSPOT"] = pd.to_numeric(df["ACCIDENT_HOTSPOT"], errors="coerce").fillna(-1).astype(int)
+    cube["HOUR_COMMITTED"] = cube["HOUR_COMMITTED"].astype(int)
+    cube["ACCIDENT_HOTSPOT"] = cube["ACCIDENT_HOTSPOT"].astype(int)
+    cube["BARANGAY"] = cube["BARANGAY"].fillna("").astype(str)
 
     # --- Date window (month-year range) ---
-    last_known_date = df["DATE_COMMITTED"].max()
+    last_known_date = cube["MAX_DATE"].max()
     start_date = pd.to_datetime((start_str + "-01") if start_str else f"{last_known_date.year}-{last_known_date.month:02d}-01", errors="coerce")
     end_date   = (pd.to_datetime(end_str + "-01", errors="coerce") + pd.offsets.MonthEnd(0)) if end_str else last_known_date + pd.offsets.MonthEnd(0)
 
     if barangay_filter:
-        df = df[df["BARANGAY"].astype(str).str.contains(barangay_filter, case=False, na=False)].copy()
+        cube = cube[cube["BARANGAY"].str.contains(barangay_filter, case=False, na=False)].copy()
 
     # --- Time selection (range or legacy) ---
-    def parse_hour(hmm: str) -> int | None:
-        if not hmm: return None
-        try:
-            return int(hmm.split(":")[0])
-        except Exception:
-            return None
-
-    h_from = parse_hour(time_from)
-    h_to   = parse_hour(time_to)
+    hours, display_hour_str, hour_key = _resolve_hours(time_from, time_to, legacy_time, live_hour)
+    cube_filtered = cube if hours is None else cube[cube["HOUR_COMMITTED"].isin(hours)]
 
-    display_hour_str = ""
-    use_range = (h_from is not None) and (h_to is not None)
-
-    if use_range:
-        if h_from <= h_to:
-            hours = list(range(h_from, h_to + 1))
-        else:
-            hours = list(range(h_from, 24)) + list(range(0, h_to + 1))
-        df_filtered = df[df["HOUR_COMMITTED"].isin(hours)].copy()
-        display_hour_str = f"{h_from:02d}:00–{h_to:02d}:00"
-    else:
-        t = (legacy_time or "Live").lower()
-        if t == "live":
-            try:
-                import pytz
-                tz = pytz.timezone("Asia/Manila")
-                current_hour = datetime.now(tz).hour
-            except Exception:
-                current_hour = pd.Timestamp.now().hour
-            df_filtered = df[df["HOUR_COMMITTED"] == int(current_hour)].copy()
-            display_hour_str = f"Live ({current_hour:02d}:00)"
-        elif t == "all":
-            df_filtered = df.copy()
-            display_hour_str = "All Hours"
-        else:
-            try:
-                hour_val = max(0, min(23, int(t)))
-                df_filtered = df[df["HOUR_COMMITTED"] == hour_val].copy()
-                display_hour_str = f"Hour {hour_val:02d}:00"
-            except Exception:
-                df_filtered = df.copy()
-                display_hour_str = "All Hours"
-
-    if df_filtered.empty:
-        center_lat = df["LATITUDE"].astype(float).mean()
-        center_lon = df["LONGITUDE"].astype(float).mean()
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=13)
-        return m.get_root().render()
-
-    # --- Monthly counts per hotspot (restricted to chosen hours) ---
-    grouping_cols = ['ACCIDENT_HOTSPOT', pd.Grouper(key='DATE_COMMITTED', freq='ME')]
-    ts_counts = (df_filtered
-                 .groupby(grouping_cols)
-                 .size()
-                 .to_frame('accident_count')
-                 .reset_index())
-
-    # Build full grid for continuity
-    all_clusters = pd.DataFrame({'ACCIDENT_HOTSPOT': df['ACCIDENT_HOTSPOT'].unique()})
-    month_range  = pd.date_range(df['DATE_COMMITTED'].min(), df['DATE_COMMITTED'].max(), freq='ME')
-    full_grid = pd.MultiIndex.from_product(
-        [all_clusters['ACCIDENT_HOTSPOT'], month_range],
-        names=['ACCIDENT_HOTSPOT','DATE_COMMITTED']
-    ).to_frame(index=False)
-
-    ts_data = (pd.merge(full_grid, ts_counts, on=['ACCIDENT_HOTSPOT','DATE_COMMITTED'], how='left')
-               .fillna({'accident_count': 0})
-               .sort_values(['ACCIDENT_HOTSPOT','DATE_COMMITTED'])
-               .reset_index(drop=True))
-
-    # Simple lag features per hotspot
-    ts_data['lag_1_month'] = ts_data.groupby('ACCIDENT_HOTSPOT')['accident_count'].shift(1)
-    ts_data['rolling_mean_3_months'] = ts_data.groupby('ACCIDENT_HOTSPOT')['accident_count'].shift(1).rolling(window=3).mean()
-    ts_data['month_of_year'] = ts_data['DATE_COMMITTED'].dt.month
-    ts_data['quarter_of_year'] = ts_data['DATE_COMMITTED'].dt.quarter
-    ts_data = ts_data.dropna().reset_index(drop=True)
-
-    if ts_data.empty:
-        center_lat = df["LATITUDE"].astype(float).mean()
-        center_lon = df["LONGITUDE"].astype(float).mean()
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=13)
-        return m.get_root().render()
-
-    # === Train the Poisson XGB on counts (same as Colab structure) ===
-    y_full = ts_data['accident_count']
-    X_full = ts_data.drop(columns=['accident_count','DATE_COMMITTED'])
-
-    final_model = XGBRegressor(
-        objective='count:poisson',
-        n_estimators=1000, learning_rate=0.01,
-        max_depth=4, min_child_weight=1, gamma=0.1,
-        random_state=42
-    )
-    final_model.fit(X_full, y_full, verbose=False)
+    def _center():
+        n = cube["N_COORD"].sum()
+        return (cube["SUM_LAT"].sum() / n, cube["SUM_LON"].sum() / n) if n else (np.nan, np.nan)
 
-    last_known_month = ts_data['DATE_COMMITTED'].max()
+    if cube_filtered.empty:
+        return _hotspot_payload(list(_center()), 13, display_hour_str)
 
-    # Actuals within date window
-    hist_in_range = pd.DataFrame()
-    if start_date <= last_known_month:
-        historical_end = min(end_date, last_known_month)
-        hist_in_range = ts_data[
-            (ts_data['DATE_COMMITTED'] >= start_date) &
-            (ts_data['DATE_COMMITTED'] <= historical_end)
-        ][['ACCIDENT_HOTSPOT','DATE_COMMITTED','accident_count']].copy()
-
-    # Forecast months until end_date
-    future_forecast_df = pd.DataFrame()
-    if end_date > last_known_month:
-        months_to_forecast = (end_date.year - last_known_month.year)*12 + (end_date.month - last_known_month.month)
-        last_rows_idx = ts_data.groupby('ACCIDENT_HOTSPOT')['DATE_COMMITTED'].idxmax()
-        current_features_df = ts_data.loc[last_rows_idx].copy()
-
-        # ensure lag columns exist
-        for need in ['lag_1_month','lag_2_month','lag_3_month']:
-            if need not in current_features_df.columns:
-                current_features_df[need] = 0.0
-
-        feature_names = X_full.columns.tolist()
-        preds_accum = []
-        for i in range(months_to_forecast):
-            preds = final_model.predict(current_features_df[feature_names])
-            next_month = last_known_month + pd.DateOffset(months=i+1)
-            preds_accum.append(pd.DataFrame({
-                'ACCIDENT_HOTSPOT': current_features_df['ACCIDENT_HOTSPOT'].values,
-                'DATE_COMMITTED': next_month,
-                'accident_count': preds
-            }))
-            # roll lags
-            current_features_df['lag_3_month'] = current_features_df['lag_2_month']
-            current_features_df['lag_2_month'] = current_features_df['lag_1_month']
-            current_features_df['lag_1_month'] = preds
-            current_features_df['rolling_mean_3_months'] = current_features_df[['lag_1_month','lag_2_month','lag_3_month']].mean(axis=1)
-            nm = next_month + pd.DateOffset(months=1)
-            current_features_df['month_of_year'] = nm.month
-            current_features_df['quarter_of_year'] = nm.quarter
-
-        future_forecast_df = pd.concat(preds_accum, ignore_index=True) if preds_accum else pd.DataFrame()
-
-    # Summaries (actual + future)
-    if not hist_in_range.empty:
-        hist_summary = (hist_in_range.groupby('ACCIDENT_HOTSPOT')['accident_count'].sum()
-                        .to_frame('Total_Actual_Accidents').reset_index())
+    if hotspot_engine == "hourly":
+        totals = _hourly_engine_totals(table, cube, hours, barangay_filter, start_date, end_date)
     else:
-        hist_summary = pd.DataFrame(columns=['ACCIDENT_HOTSPOT','Total_Actual_Accidents'])
+        totals = _window_engine_totals(table, cube, cube_filtered, hour_key, barangay_filter, start_date, end_date)
 
-    if not future_forecast_df.empty:
-        future_summary = (future_forecast_df.groupby('ACCIDENT_HOTSPOT')['accident_count'].sum()
-                          .to_frame('Total_Forecasted_Accidents').reset_index())
-    else:
-        future_summary = pd.DataFrame(columns=['ACCIDENT_HOTSPOT','Total_Forecasted_Accidents'])
+    if totals is None:
+        return _hotspot_payload(list(_center()), 13, display_hour_str)
+    hist_summary, future_summary, report = totals
 
     # === NEW: Top 3 Barangays per hotspot (matches your Colab) ===
-    barangay_counts = (df.groupby(['ACCIDENT_HOTSPOT','BARANGAY'])
-                         .size()
+    barangay_counts = (cube[cube['BARANGAY'] != '']
+                         .groupby(['ACCIDENT_HOTSPOT','BARANGAY'])['ACCIDENT_COUNT']
+                         .sum()
                          .to_frame('count')
                          .reset_index())
     top_barangays = (barangay_counts.sort_values('count', ascending=False)
@@ -293,13 +647,15 @@ def build_forecast_map_html(
                      .reset_index())
 
     # Centroids for marker placement
-    centroids = (df.groupby('ACCIDENT_HOTSPOT')
-                 .agg(Center_Lat=('LATITUDE','mean'),
-                      Center_Lon=('LONGITUDE','mean'))
-                 .reset_index())
+    sums = cube.groupby('ACCIDENT_HOTSPOT')[['SUM_LAT','SUM_LON','N_COORD']].sum()
+    n_coord = sums['N_COORD'].where(sums['N_COORD'] > 0)
+    centroids = pd.DataFrame({
+        'Center_Lat': sums['SUM_LAT'] / n_coord,
+        'Center_Lon': sums['SUM_LON'] / n_coord,
+    }).reset_index()
 
     # Final map data
-    final_map_data = (pd.DataFrame({'ACCIDENT_HOTSPOT': df['ACCIDENT_HOTSPOT'].unique()})
+    final_map_data = (pd.DataFrame({'ACCIDENT_HOTSPOT': cube['ACCIDENT_HOTSPOT'].unique()})
                       .merge(hist_summary, on='ACCIDENT_HOTSPOT', how='left')
                       .merge(future_summary, on='ACCIDENT_HOTSPOT', how='left')
                       .merge(centroids, on='ACCIDENT_HOTSPOT', how='left')
@@ -314,41 +670,71 @@ def build_forecast_map_html(
     nz = final_map_data.loc[final_map_data['Total_Events'] > 0, 'Total_Events']
     low_th, med_th = (nz.quantile(0.33), nz.quantile(0.66)) if not nz.empty else (0.0, 0.0)
 
-    def color_for(v):
-        if v <= 0: return 'grey'
-        if v <= low_th: return 'green'
-        if v <= med_th: return 'orange'
-        return 'red'
+    # hotspots without coordinates can't be drawn
+    final_map_data = final_map_data.dropna(subset=['Center_Lat','Center_Lon'])
+    events = final_map_data['Total_Events'].to_numpy(dtype=float)
+    colors = np.select([events <= 0, events <= low_th, events <= med_th], ['grey', 'green', 'orange'], default='red')
+    # === NEW: log1p scaling for radius (matches Colab) ===
+    radius = 5 + (np.log1p(events) * 5)
+
+    top3 = final_map_data['Top_Barangays']
+    return _hotspot_payload(list(_center()), 13, display_hour_str, {
+        "hotspot":  final_map_data['ACCIDENT_HOTSPOT'].astype(int).tolist(),
+        "lat":      final_map_data['Center_Lat'].astype(float).round(6).tolist(),
+        "lon":      final_map_data['Center_Lon'].astype(float).round(6).tolist(),
+        "actual":   final_map_data['Total_Actual_Accidents'].astype(float).round(2).tolist(),
+        "forecast": final_map_data['Total_Forecasted_Accidents'].astype(float).round(2).tolist(),
+        "color":    colors.tolist(),
+        "radius":   np.round(radius, 2).tolist(),
+        "top_barangays": [list(v) if isinstance(v, list) else [] for v in top3],
+    }, training=report)
+
+def _hotspot_payload(center, zoom: int, label: str, columns: dict | None = None, training: dict | None = None) -> dict:
+    center = [None if pd.isna(v) else float(v) for v in center]
+    empty = {k: [] for k in ("hotspot", "lat", "lon", "actual", "forecast", "color", "radius", "top_barangays")}
+    payload = {"center": center, "zoom": zoom, "label": label, "hotspots": columns or empty}
+    if training:
+        payload["training"] = training
+    return payload
 
-    # Build map
-    center_lat = df["LATITUDE"].astype(float).mean()
-    center_lon = df["LONGITUDE"].astype(float).mean()
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=13)
-
-    for _, row in final_map_data.iterrows():
-        if pd.isna(row['Center_Lat']) or pd.isna(row['Center_Lon']):
-            continue
-        top3 = row.get('Top_Barangays', None)
-        barangay_str = ', '.join(top3) if isinstance(top3, list) else 'N/A'
+def build_forecast_map_html(
+    table,
+    start_str: str = "",
+    end_str: str = "",
+    time_from: str = "",
+    time_to: str = "",
+    legacy_time: str = "Live",
+    barangay_filter: str = "",
+    hotspot_engine: str | None = None,
+):
+    """Full Folium document for the legacy iframe endpoint."""
+    data = hotspot_forecast_data(table, start_str, end_str, time_from, time_to,
+                                 legacy_time, barangay_filter, hotspot_engine)
+    return render_forecast_map_html(data)
+
+def render_forecast_map_html(data: dict) -> str:
+    """Folium document for a hotspot_forecast_data() result."""
+    m = folium.Map(location=data["center"], zoom_start=data["zoom"])
+    hs, label = data["hotspots"], data["label"]
+    for i in range(len(hs["hotspot"])):
+        top3 = hs["top_barangays"][i]
+        barangay_str = ', '.join(top3) if top3 else 'N/A'
 
         popup_html = (
-            f"<b>Hotspot #{int(row['ACCIDENT_HOTSPOT'])} ({display_hour_str})</b><br>"
+            f"<b>Hotspot #{hs['hotspot'][i]} ({label})</b><br>"
             f"-----------------------------<br>"
             f"<b>Top Barangays:</b> {barangay_str}<br>"
             f"-----------------------------<br>"
         )
-        if row['Total_Actual_Accidents'] > 0:
-            popup_html += f"<b>Actual Accidents (Historical): {row['Total_Actual_Accidents']:.2f}</b><br>"
-        if row['Total_Forecasted_Accidents'] > 0:
-            popup_html += f"<b>Forecasted Accidents (Future): {row['Total_Forecasted_Accidents']:.2f}</b><br>"
-
-        color = color_for(float(row['Total_Events']))
-        # === NEW: log1p scaling for radius (matches Colab) ===
-        radius = 5 + (np.log1p(float(row['Total_Events'])) * 5)
+        if hs['actual'][i] > 0:
+            popup_html += f"<b>Actual Accidents (Historical): {hs['actual'][i]:.2f}</b><br>"
+        if hs['forecast'][i] > 0:
+            popup_html += f"<b>Forecasted Accidents (Future): {hs['forecast'][i]:.2f}</b><br>"
 
+        color = hs['color'][i]
         folium.CircleMarker(
-            location=[float(row['Center_Lat']), float(row['Center_Lon'])],
-            radius=radius,
+            location=[hs['lat'][i], hs['lon'][i]],
+            radius=hs['radius'][i],
             popup=folium.Popup(popup_html, max_width=300),
             color=color,
             fill=True,
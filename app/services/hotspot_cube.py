@@ -0,0 +1,195 @@
+# app/services/hotspot_cube.py
+"""
+Materialized hotspot × month × hour × barangay counts for the forecast map.
+
+One shared table (`app_hotspot_cube`) holds, per source table and cell: the
+accident count, the coordinate sums needed for centroids, and the first/last
+DATE_COMMITTED seen in the cell. Ingest upserts the new batch's cells; the map reads a few
+thousand cube rows instead of the whole fact table. Tables ingested before
+the cube existed get one at their next ingest or from `flask build-hotspot-cubes`.
+"""
+import pandas as pd
+from ..extensions import get_db_connection, get_engine, ensure_app_table
+
+CUBE_TABLE = "app_hotspot_cube"
+CUBE_COLUMNS = ["ACCIDENT_HOTSPOT", "MONTH_END", "HOUR_COMMITTED", "BARANGAY",
+                "ACCIDENT_COUNT", "SUM_LAT", "SUM_LON", "N_COORD", "MIN_DATE", "MAX_DATE"]
+
+_DDL = f"""
+CREATE TABLE IF NOT EXISTS `{CUBE_TABLE}` (
+  `SOURCE_TABLE` VARCHAR(64) NOT NULL,
+  `ACCIDENT_HOTSPOT` INT NOT NULL,
+  `MONTH_END` DATE NOT NULL,
+  `HOUR_COMMITTED` TINYINT NOT NULL,
+  `BARANGAY` VARCHAR(128) NOT NULL DEFAULT '',
+  `ACCIDENT_COUNT` INT NOT NULL,
+  `SUM_LAT` DOUBLE NOT NULL DEFAULT 0,
+  `SUM_LON` DOUBLE NOT NULL DEFAULT 0,
+  `N_COORD` INT NOT NULL DEFAULT 0,
+  `MIN_DATE` DATE NOT NULL,
+  `MAX_DATE` DATE NOT NULL,
+  PRIMARY KEY (`SOURCE_TABLE`, `ACCIDENT_HOTSPOT`, `MONTH_END`, `HOUR_COMMITTED`, `BARANGAY`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+def ensure_cube_table(cur):
+    ensure_app_table(cur, CUBE_TABLE, _DDL)
+
+def cube_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate raw accident rows (DATE_COMMITTED, HOUR_COMMITTED,
+    ACCIDENT_HOTSPOT, LATITUDE, LONGITUDE, BARANGAY) into cube cells, with the
+    same cleaning the map applies to raw rows.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    hotspot = df["ACCIDENT_HOTSPOT"] if "ACCIDENT_HOTSPOT" in df.columns else pd.Series(-1, index=df.index)
+    barangay = df["BARANGAY"] if "BARANGAY" in df.columns else pd.Series("", index=df.index)
+    out = pd.DataFrame({
+        "DATE": pd.to_datetime(df["DATE_COMMITTED"], errors="coerce"),
+        "HOUR_COMMITTED": pd.to_numeric(df["HOUR_COMMITTED"], errors="coerce"),
+        "ACCIDENT_HOTSPOT": pd.to_numeric(hotspot, errors="coerce"),
+        "BARANGAY": barangay,
+        "LAT": pd.to_numeric(df["LATITUDE"], errors="coerce"),
+        "LON": pd.to_numeric(df["LONGITUDE"], errors="coerce"),
+    }, index=df.index)
+    out = out.dropna(subset=["DATE", "HOUR_COMMITTED"])
+    if out.empty:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    out["HOUR_COMMITTED"] = out["HOUR_COMMITTED"].astype(int)
+    out["ACCIDENT_HOTSPOT"] = out["ACCIDENT_HOTSPOT"].fillna(-1).astype(int)
+    out["BARANGAY"] = out["BARANGAY"].where(out["BARANGAY"].notna(), "").astype(str)
+    out["MONTH_END"] = out["DATE"].dt.normalize() + pd.offsets.MonthEnd(0)
+
+    cube = (out.groupby(["ACCIDENT_HOTSPOT", "MONTH_END", "HOUR_COMMITTED", "BARANGAY"], sort=True)
+               .agg(ACCIDENT_COUNT=("DATE", "size"),
+                    SUM_LAT=("LAT", "sum"),
+                    SUM_LON=("LON", "sum"),
+                    N_COORD=("LAT", "count"),
+                    MIN_DATE=("DATE", "min"),
+                    MAX_DATE=("DATE", "max"))
+               .reset_index())
+    return cube[CUBE_COLUMNS]
+
+def upsert_cube(cur, table: str, cube: pd.DataFrame):
+    """Add a batch's cells onto the stored cube (counts and sums accumulate)."""
+    if cube.empty:
+        return
+    cols = ["SOURCE_TABLE"] + CUBE_COLUMNS
+    sql = (
+        f"INSERT INTO `{CUBE_TABLE}` ({', '.join(f'`{c}`' for c in cols)}) "
+        f"VALUES ({', '.join(['%s'] * len(cols))}) "
+        "ON DUPLICATE KEY UPDATE "
+        "`ACCIDENT_COUNT` = `ACCIDENT_COUNT` + VALUES(`ACCIDENT_COUNT`), "
+        "`SUM_LAT` = `SUM_LAT` + VALUES(`SUM_LAT`), "
+        "`SUM_LON` = `SUM_LON` + VALUES(`SUM_LON`), "
+        "`N_COORD` = `N_COORD` + VALUES(`N_COORD`), "
+        "`MIN_DATE` = LEAST(`MIN_DATE`, VALUES(`MIN_DATE`)), "
+        "`MAX_DATE` = GREATEST(`MAX_DATE`, VALUES(`MAX_DATE`))"
+    )
+    rows = [
+        (table, int(r.ACCIDENT_HOTSPOT), r.MONTH_END.date(), int(r.HOUR_COMMITTED), str(r.BARANGAY)[:128],
+         int(r.ACCIDENT_COUNT), float(r.SUM_LAT), float(r.SUM_LON), int(r.N_COORD),
+         r.MIN_DATE.date(), r.MAX_DATE.date())
+        for r in cube.itertuples(index=False)
+    ]
+    cur.executemany(sql, rows)
+
+_CUBE_INSERT = f"""
+    INSERT INTO `{CUBE_TABLE}`
+      (`SOURCE_TABLE`, `ACCIDENT_HOTSPOT`, `MONTH_END`, `HOUR_COMMITTED`, `BARANGAY`,
+       `ACCIDENT_COUNT`, `SUM_LAT`, `SUM_LON`, `N_COORD`, `MIN_DATE`, `MAX_DATE`)
+    SELECT %s,
+           COALESCE(CAST(`ACCIDENT_HOTSPOT` AS SIGNED), -1),
+           LAST_DAY(`DATE_COMMITTED`),
+           CAST(`HOUR_COMMITTED` AS SIGNED),
+           LEFT(COALESCE(`BARANGAY`, ''), 128),
+           COUNT(*),
+           COALESCE(SUM(`LATITUDE`), 0),
+           COALESCE(SUM(`LONGITUDE`), 0),
+           COUNT(`LATITUDE`),
+           MIN(`DATE_COMMITTED`),
+           MAX(`DATE_COMMITTED`)
+    FROM `{{source}}`
+    WHERE `DATE_COMMITTED` IS NOT NULL AND `HOUR_COMMITTED` IS NOT NULL
+    GROUP BY 2, 3, 4, 5
+"""
+
+def rebuild_cube(cur, table: str):
+    """Recompute a table's cube from its fact rows in one INSERT … SELECT."""
+    cur.execute(f"DELETE FROM `{CUBE_TABLE}` WHERE `SOURCE_TABLE` = %s", (table,))
+    cur.execute(_CUBE_INSERT.format(source=table), (table,))
+
+def upsert_cube_from(cur, table: str, source: str):
+    """Add the cells of rows staged in `source` onto `table`'s cube, server-side."""
+    c = f"`{CUBE_TABLE}`"
+    cur.execute(_CUBE_INSERT.format(source=source) + (
+        "ON DUPLICATE KEY UPDATE "
+        f"`ACCIDENT_COUNT` = {c}.`ACCIDENT_COUNT` + VALUES(`ACCIDENT_COUNT`), "
+        f"`SUM_LAT` = {c}.`SUM_LAT` + VALUES(`SUM_LAT`), "
+        f"`SUM_LON` = {c}.`SUM_LON` + VALUES(`SUM_LON`), "
+        f"`N_COORD` = {c}.`N_COORD` + VALUES(`N_COORD`), "
+        f"`MIN_DATE` = LEAST({c}.`MIN_DATE`, VALUES(`MIN_DATE`)), "
+        f"`MAX_DATE` = GREATEST({c}.`MAX_DATE`, VALUES(`MAX_DATE`))"
+    ), (table,))
+
+def _cube_has_rows(cur, table: str) -> bool:
+    cur.execute(f"SELECT 1 FROM `{CUBE_TABLE}` WHERE `SOURCE_TABLE` = %s LIMIT 1", (table,))
+    return cur.fetchone() is not None
+
+def sync_cube_after_insert(cur, table: str, batch: pd.DataFrame, table_existed: bool):
+    """
+    Keep the cube in step with an ingest batch (call inside the ingest
+    transaction, after ensure_cube_table(): DDL would commit implicitly).
+    Tables that predate the cube get a full rebuild the first time they are
+    appended to; afterwards only the batch's cells are upserted.
+    """
+    if table_existed and not _cube_has_rows(cur, table):
+        rebuild_cube(cur, table)
+    else:
+        upsert_cube(cur, table, cube_frame(batch))
+
+def sync_cube_from_table(cur, table: str, source: str, table_existed: bool):
+    """`sync_cube_after_insert()` for a batch already copied from the staging table `source`."""
+    if table_existed and not _cube_has_rows(cur, table):
+        rebuild_cube(cur, table)
+    else:
+        upsert_cube_from(cur, table, source)
+
+def drop_cube(table: str):
+    """Forget a table's cube (after DROP/TRUNCATE); `build_cube()` or the next ingest recreates it."""
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        ensure_cube_table(cur)
+        cur.execute(f"DELETE FROM `{CUBE_TABLE}` WHERE `SOURCE_TABLE` = %s", (table,))
+        conn.commit()
+    finally:
+        cur.close(); conn.close()
+
+def build_cube(table: str) -> int:
+    """Rebuild a table's cube in its own transaction (after a full rewrite, or from the CLI); returns its cells."""
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        ensure_cube_table(cur)
+        rebuild_cube(cur, table)
+        cells = int(cur.rowcount)
+        conn.commit()
+    finally:
+        cur.close(); conn.close()
+    return cells
+
+def load_cube(table: str) -> pd.DataFrame | None:
+    """
+    Cube cells for `table`, or None when it has none (never ingested through
+    the cube, or no row with a date and an hour). Read-only: cubes are built
+    at ingest and by `flask build-hotspot-cubes`, never on the map's request path.
+    """
+    cube = pd.read_sql_query(
+        f"SELECT {', '.join(f'`{c}`' for c in CUBE_COLUMNS)} FROM `{CUBE_TABLE}` WHERE `SOURCE_TABLE` = %(t)s",
+        get_engine(), params={"t": table},
+    )
+    if cube.empty:
+        return None
+    for c in ("MONTH_END", "MIN_DATE", "MAX_DATE"):
+        cube[c] = pd.to_datetime(cube[c], errors="coerce")
+    return cube
@@ -0,0 +1,402 @@
+# app/services/hotspot_index.py
+"""
+Persisted DBSCAN hotspot index, one per processed table.
+
+`app_hotspot_points` holds every distinct accident coordinate of a table
+with its accident count, hotspot id and core flag, keyed by an eps-sized
+grid cell. A new table is clustered once (weighted DBSCAN over its distinct
+points). After that, each ingest into the table only reads the grid cells
+around its points, recounts neighbourhoods there with a haversine BallTree,
+and updates DBSCAN incrementally:
+
+- A point that becomes core joins the clusters of the core points within
+  eps. Clusters it bridges are merged into the lowest id.
+- New non-core points, and noise next to a new core point, become border
+  points of the neighbouring cluster with the lowest id. Otherwise they
+  stay noise (-1).
+
+Existing hotspot ids therefore stay put. The exceptions are merges and
+noise that turns into a border point. Those rows are updated in the fact
+table, and its cube is rebuilt. The cost follows the size of the batch,
+not the table. A table ingested before the index existed is re-clustered
+in full once, on its first append (`rebuild_hotspot_index()` does the
+same on demand).
+
+A plan is only valid against the index it was read from, so writers hold
+the table's hotspot lock (`lock_hotspots()`, a MySQL named lock) from
+before planning until after their commit; concurrent ingests into one
+table run their planning and writing one after the other.
+"""
+import hashlib, math, time
+import numpy as np
+import pandas as pd
+from flask import current_app
+from ..extensions import get_db_connection, ensure_app_table
+from .bulk_writer import bulk_insert
+from .database import bump_data_version
+from .hotspot_cube import ensure_cube_table, rebuild_cube
+from .response_cache import get_response_cache
+from .schema import column_type, column_types, widen_clauses
+
+INDEX_TABLE = "app_hotspot_points"
+
+KMS_PER_RADIAN = 6371.0088
+HOTSPOT_EPS_KM = 0.04        # match Colab exactly
+HOTSPOT_MIN_SAMPLES = 5
+EPS_RAD = HOTSPOT_EPS_KM / KMS_PER_RADIAN
+CELL_DEG = math.degrees(EPS_RAD)      # grid cell = eps of latitude
+
+_DDL = f"""
+CREATE TABLE IF NOT EXISTS `{INDEX_TABLE}` (
+  `SOURCE_TABLE` VARCHAR(64) NOT NULL,
+  `LAT` DOUBLE NOT NULL,
+  `LON` DOUBLE NOT NULL,
+  `CELL_LAT` INT NOT NULL,
+  `CELL_LON` INT NOT NULL,
+  `WEIGHT` INT NOT NULL,
+  `HOTSPOT` INT NOT NULL,
+  `CORE` TINYINT NOT NULL,
+  PRIMARY KEY (`SOURCE_TABLE`, `LAT`, `LON`),
+  KEY `cell` (`SOURCE_TABLE`, `CELL_LAT`, `CELL_LON`),
+  KEY `hotspot` (`SOURCE_TABLE`, `HOTSPOT`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+INDEX_COLUMNS = ["LAT", "LON", "CELL_LAT", "CELL_LON", "WEIGHT", "HOTSPOT", "CORE"]
+
+
+def ensure_index_table(cur):
+    ensure_app_table(cur, INDEX_TABLE, _DDL)
+
+
+def _lock_name(table: str) -> str:
+    name = f"hotspot:{table}"
+    return name if len(name) <= 64 else f"hotspot:{hashlib.sha1(table.encode('utf-8')).hexdigest()}"
+
+
+def lock_hotspots(cur, table: str):
+    """
+    Take `table`'s hotspot lock on this connection, waiting up to
+    HOTSPOT_LOCK_SECONDS. Held across commits until `unlock_hotspots()`.
+    """
+    seconds = int(current_app.config.get("HOTSPOT_LOCK_SECONDS", 600))
+    cur.execute("SELECT GET_LOCK(%s, %s)", (_lock_name(table), seconds))
+    row = cur.fetchone()
+    if not row or row[0] != 1:
+        raise RuntimeError(f"Another upload into '{table}' is still running; try again later.")
+
+
+def unlock_hotspots(cur, table: str):
+    """Release `lock_hotspots()`; call before the connection goes back to the pool."""
+    cur.execute("SELECT RELEASE_LOCK(%s)", (_lock_name(table),))
+    cur.fetchone()
+
+
+# --- clustering ---------------------------------------------------------------
+def hotspot_clusters(coords, sample_weight=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    DBSCAN over (LATITUDE, LONGITUDE) degrees: haversine, eps = 0.04 km,
+    5 samples, as in the Colab notebook. Returns (hotspot id per row, -1 =
+    noise; core-point mask). `sample_weight` lets a row stand for that many
+    accidents at the same spot.
+    """
+    from sklearn.cluster import DBSCAN
+    coords = np.radians(np.asarray(coords, dtype="float64"))
+    dbscan = DBSCAN(eps=EPS_RAD, min_samples=HOTSPOT_MIN_SAMPLES, algorithm="ball_tree", metric="haversine")
+    labels = dbscan.fit_predict(coords, sample_weight=sample_weight)
+    core = np.zeros(len(coords), dtype=bool)
+    core[dbscan.core_sample_indices_] = True
+    return labels, core
+
+
+def hotspot_labels(coords, sample_weight=None) -> np.ndarray:
+    """Hotspot id per (LATITUDE, LONGITUDE) row, -1 = noise (see `hotspot_clusters()`)."""
+    return hotspot_clusters(coords, sample_weight)[0]
+
+
+def weighted_points(df: pd.DataFrame) -> pd.DataFrame:
+    """Distinct (LAT, LON) of the rows with coordinates, N = rows at each."""
+    coords = pd.DataFrame({"LAT": pd.to_numeric(df["LATITUDE"], errors="coerce"),
+                           "LON": pd.to_numeric(df["LONGITUDE"], errors="coerce")}).dropna()
+    return coords.groupby(["LAT", "LON"], sort=True).size().rename("N").reset_index()
+
+
+def row_labels(df: pd.DataFrame, points: pd.DataFrame, labels) -> np.ndarray:
+    """Hotspot id of each row of `df` from the labels of its distinct `points` (-1 without coordinates)."""
+    where = pd.MultiIndex.from_frame(points[["LAT", "LON"]]).get_indexer(pd.MultiIndex.from_arrays(
+        [pd.to_numeric(df["LATITUDE"], errors="coerce"), pd.to_numeric(df["LONGITUDE"], errors="coerce")]))
+    return np.where(where >= 0, np.asarray(labels)[where], -1)
+
+
+def _cells(lat, lon) -> tuple[np.ndarray, np.ndarray]:
+    return (np.floor(np.asarray(lat, dtype="float64") / CELL_DEG).astype("int64"),
+            np.floor(np.asarray(lon, dtype="float64") / CELL_DEG).astype("int64"))
+
+
+def _index_rows(lat, lon, weight, hotspot, core) -> pd.DataFrame:
+    cell_lat, cell_lon = _cells(lat, lon)
+    return pd.DataFrame({"LAT": np.asarray(lat, dtype="float64"), "LON": np.asarray(lon, dtype="float64"),
+                         "CELL_LAT": cell_lat, "CELL_LON": cell_lon,
+                         "WEIGHT": np.asarray(weight, dtype="int64"), "HOTSPOT": np.asarray(hotspot, dtype="int64"),
+                         "CORE": np.asarray(core, dtype="int8")})
+
+
+def hotspot_column_type(plan: dict) -> str:
+    """ACCIDENT_HOTSPOT type that holds every id a plan writes (old rows can move to a new id)."""
+    return column_type("ACCIDENT_HOTSPOT", pd.Series([-1, plan["max_id"]]))
+
+
+# --- reading the index -----------------------------------------------------
+def _has_index(cur, table: str) -> bool:
+    cur.execute(f"SELECT 1 FROM `{INDEX_TABLE}` WHERE `SOURCE_TABLE` = %s LIMIT 1", (table,))
+    return cur.fetchone() is not None
+
+
+def _cell_ranges(points: pd.DataFrame) -> pd.DataFrame:
+    """
+    (CELL_LAT, LON_FROM, LON_TO) runs covering every cell within 2·eps of
+    `points`: the neighbourhoods whose counts the new points can change.
+    """
+    cell_lat, cell_lon = _cells(points["LAT"], points["LON"])
+    top = min(89.0, float(np.abs(points["LAT"]).max()) + 1.0)
+    reach = int(math.ceil(2.0 / math.cos(math.radians(top))))       # eps of longitude is wider off the equator
+    cells = pd.DataFrame({"c": cell_lat, "j": cell_lon}).drop_duplicates()
+    runs = pd.concat([pd.DataFrame({"CELL_LAT": cells["c"] + d, "LON_FROM": cells["j"] - reach,
+                                    "LON_TO": cells["j"] + reach}) for d in range(-2, 3)], ignore_index=True)
+    runs = runs.sort_values(["CELL_LAT", "LON_FROM"]).reset_index(drop=True)
+    reached = runs.groupby("CELL_LAT")["LON_TO"].cummax().groupby(runs["CELL_LAT"]).shift()
+    starts = reached.isna() | (runs["LON_FROM"] > reached + 1)
+    return (runs.groupby(starts.cumsum())
+                .agg(CELL_LAT=("CELL_LAT", "first"), LON_FROM=("LON_FROM", "min"), LON_TO=("LON_TO", "max"))
+                .reset_index(drop=True))
+
+
+def _neighbourhood(cur, table: str, points: pd.DataFrame) -> pd.DataFrame:
+    """Stored index points in the cells around `points`."""
+    ranges = _cell_ranges(points)
+    tmp = "tmp_hotspot_cells"
+    cur.execute(f"CREATE TEMPORARY TABLE `{tmp}` (`CELL_LAT` INT NOT NULL, `LON_FROM` INT NOT NULL, "
+                f"`LON_TO` INT NOT NULL, KEY (`CELL_LAT`)) ENGINE=InnoDB")
+    try:
+        bulk_insert(cur, tmp, ranges)
+        cur.execute(f"SELECT p.`LAT`, p.`LON`, p.`WEIGHT`, p.`HOTSPOT`, p.`CORE` FROM `{INDEX_TABLE}` p "
+                    f"JOIN `{tmp}` r ON p.`CELL_LAT` = r.`CELL_LAT` AND p.`CELL_LON` BETWEEN r.`LON_FROM` AND r.`LON_TO` "
+                    f"WHERE p.`SOURCE_TABLE` = %s", (table,))
+        rows = cur.fetchall()
+    finally:
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{tmp}`")
+    stored = pd.DataFrame(rows, columns=["LAT", "LON", "WEIGHT", "HOTSPOT", "CORE"])
+    return stored.astype({"LAT": "float64", "LON": "float64", "WEIGHT": "int64", "HOTSPOT": "int64", "CORE": bool})
+
+
+def _next_id(cur, table: str) -> int:
+    cur.execute(f"SELECT MAX(`HOTSPOT`) FROM `{INDEX_TABLE}` WHERE `SOURCE_TABLE` = %s", (table,))
+    row = cur.fetchone()
+    return int(row[0]) + 1 if row and row[0] is not None else 0
+
+
+def _table_points(cur, table: str) -> pd.DataFrame:
+    cur.execute(f"SELECT `LATITUDE`, `LONGITUDE`, COUNT(*) FROM `{table}` "
+                f"WHERE `LATITUDE` IS NOT NULL AND `LONGITUDE` IS NOT NULL GROUP BY `LATITUDE`, `LONGITUDE`")
+    pts = pd.DataFrame(cur.fetchall(), columns=["LAT", "LON", "N"])
+    pts["LAT"] = pd.to_numeric(pts["LAT"], errors="coerce")
+    pts["LON"] = pd.to_numeric(pts["LON"], errors="coerce")
+    return pts.dropna().groupby(["LAT", "LON"], sort=True)["N"].sum().reset_index()
+
+
+# --- planning (reads only) -------------------------------------------------
+def _full_plan(points: pd.DataFrame, relabel_table: bool) -> dict:
+    labels, core = hotspot_clusters(points[["LAT", "LON"]], sample_weight=points["N"].to_numpy(dtype="float64"))
+    rows = _index_rows(points["LAT"], points["LON"], points["N"], labels, core)
+    return {"mode": "rebuild" if relabel_table else "new", "points": points, "labels": labels,
+            "index_rows": rows, "replace": True, "merges": {},
+            "relabel": rows[["LAT", "LON", "HOTSPOT"]] if relabel_table else None,
+            "existing_changed": relabel_table, "max_id": int(labels.max(initial=-1)),
+            "stats": {"points": len(points), "hotspots": int(len(set(labels) - {-1}))}}
+
+
+def _pairs(tree, coords, of: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(point, neighbour) index pairs within eps, for the points `of`."""
+    nbrs = tree.query_radius(coords[of], r=EPS_RAD) if len(of) else []
+    sizes = np.fromiter(map(len, nbrs), dtype="int64", count=len(of))
+    return np.repeat(of, sizes), (np.concatenate(nbrs) if len(of) else np.zeros(0, dtype="int64"))
+
+
+def incremental_plan(stored: pd.DataFrame, batch: pd.DataFrame, next_id: int) -> dict:
+    """
+    DBSCAN update for `batch` points (LAT, LON, N) given the `stored` index
+    points around them (LAT, LON, WEIGHT, HOTSPOT, CORE) and the first unused id.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from sklearn.neighbors import BallTree
+    pts = stored.merge(batch, on=["LAT", "LON"], how="outer")
+    in_batch = pts["N"].notna().to_numpy()
+    was_stored = pts["WEIGHT"].notna().to_numpy()
+    weight = (pts["WEIGHT"].fillna(0) + pts["N"].fillna(0)).to_numpy(dtype="float64")
+    label = pts["HOTSPOT"].fillna(-1).to_numpy(dtype="int64")
+    was_core = pts["CORE"].astype("boolean").fillna(False).to_numpy(dtype=bool)
+
+    coords = np.radians(pts[["LAT", "LON"]].to_numpy(dtype="float64"))
+    tree = BallTree(coords, metric="haversine")
+    # points within eps of the batch: the only ones whose neighbourhood count moved
+    touched = np.unique(_pairs(tree, coords, np.flatnonzero(in_batch))[1])
+    at, nbr = _pairs(tree, coords, touched)
+    counts = np.bincount(at, weights=weight[nbr], minlength=len(pts))[touched]
+    core = was_core.copy()
+    core[touched] |= counts >= HOTSPOT_MIN_SAMPLES
+    new_core = touched[core[touched] & ~was_core[touched]]
+
+    # connect each new core point to the core points it reaches: new ones directly, old ones via their
+    # cluster id (graph nodes: points, then one per old id), then take the connected components
+    at, reach = _pairs(tree, coords, new_core)
+    at, nbr = at[core[reach]], reach[core[reach]]
+    old_ids = np.unique(label[was_core])
+    to = np.where(was_core[nbr], len(pts) + np.searchsorted(old_ids, label[nbr]), nbr)
+    size = len(pts) + len(old_ids)
+    _, comp = connected_components(coo_matrix((np.ones(len(at)), (at, to)), shape=(size, size)), directed=False)
+    members = pd.DataFrame({"comp": comp, "old": np.r_[np.full(len(pts), -1), old_ids]})
+    members = members[np.isin(comp, comp[new_core])]
+    reached = members[members["old"] >= 0].groupby("comp")["old"]
+
+    target = reached.min()                               # bridged clusters keep the lowest id
+    fresh = np.setdiff1d(comp[new_core], target.index)   # new clusters take the next free ids
+    target = pd.concat([target, pd.Series(np.arange(next_id, next_id + len(fresh)), index=fresh)])
+    next_id += len(fresh)
+    merges = {int(o): int(target[c]) for c, o in zip(members["comp"], members["old"]) if o >= 0 and o != target[c]}
+
+    final = label.copy()
+    final[new_core] = target.reindex(comp[new_core]).to_numpy()
+    merged_away = np.isin(final, list(merges))        # the rest of a merged cluster, inside the neighbourhood
+    final[merged_away] = [merges[i] for i in final[merged_away]]
+
+    # border points: unlabelled non-core points next to a core point take its (lowest) id
+    candidates = np.unique(np.r_[touched, reach])
+    candidates = candidates[~core[candidates] & (final[candidates] == -1)]
+    at, nbr = _pairs(tree, coords, candidates)
+    hits = pd.Series(final[nbr[core[nbr]]]).groupby(at[core[nbr]]).min()
+    final[hits.index.to_numpy(dtype="int64")] = hits.to_numpy()
+
+    changed = in_batch | (final != label) | (core != was_core)
+    rows = _index_rows(pts["LAT"][changed], pts["LON"][changed], weight[changed], final[changed], core[changed])
+    # existing rows whose id moved other than by a merge (noise that became a border point)
+    moved = was_stored & (final != label) & ~np.isin(label, list(merges))
+    relabel = pd.DataFrame({"LAT": pts["LAT"][moved], "LON": pts["LON"][moved], "HOTSPOT": final[moved]})
+
+    batch_labels = row_labels(batch.rename(columns={"LAT": "LATITUDE", "LON": "LONGITUDE"}), pts, final)
+    return {"mode": "incremental", "points": batch, "labels": batch_labels, "index_rows": rows, "replace": False,
+            "merges": merges, "relabel": relabel, "existing_changed": bool(merges) or bool(moved.any()),
+            "max_id": next_id - 1,
+            "stats": {"points": len(batch), "neighbourhood": int(was_stored.sum()), "new_core": int(len(new_core)),
+                      "merged": len(merges), "relabelled": int(moved.sum())}}
+
+
+def plan_hotspots(cur, table: str, points: pd.DataFrame, table_existed: bool) -> dict:
+    """
+    Hotspot ids for a batch's distinct weighted `points` (LAT, LON, N) going
+    into `table`, without writing anything. Pass the plan's "labels" on to
+    the rows, then call `apply_hotspot_plan()` in the ingest transaction
+    (after its DDL, before the rows are inserted). The caller holds
+    `lock_hotspots()` from before this call until after that commit.
+    """
+    started = time.perf_counter()
+    if points.empty:
+        plan = {"mode": "empty", "points": points, "labels": np.zeros(0, dtype="int64"), "index_rows": None,
+                "replace": False, "merges": {}, "relabel": None, "existing_changed": False, "max_id": -1,
+                "stats": {"points": 0}}
+    elif not table_existed:
+        plan = _full_plan(points, relabel_table=False)
+    elif not _has_index(cur, table):
+        # table predates the index (or it was dropped): cluster the table and the batch together once
+        both = pd.concat([_table_points(cur, table), points], ignore_index=True)
+        both = both.groupby(["LAT", "LON"], sort=True)["N"].sum().reset_index()
+        plan = _full_plan(both, relabel_table=True)
+        plan["points"] = points
+        plan["labels"] = row_labels(points.rename(columns={"LAT": "LATITUDE", "LON": "LONGITUDE"}), both,
+                                    plan["labels"])
+    else:
+        plan = incremental_plan(_neighbourhood(cur, table, points), points, _next_id(cur, table))
+    plan["stats"]["seconds"] = round(time.perf_counter() - started, 3)
+    current_app.logger.info("hotspot index %s (%s): %s", table, plan["mode"], plan["stats"])
+    return plan
+
+
+# --- writing -------------------------------------------------------------------
+def _relabel_table(cur, table: str, relabel: pd.DataFrame):
+    tmp = "tmp_hotspot_relabel"
+    cur.execute(f"CREATE TEMPORARY TABLE `{tmp}` (`LAT` DOUBLE NOT NULL, `LON` DOUBLE NOT NULL, "
+                f"`HOTSPOT` INT NOT NULL, PRIMARY KEY (`LAT`, `LON`)) ENGINE=InnoDB")
+    try:
+        bulk_insert(cur, tmp, relabel[["LAT", "LON", "HOTSPOT"]])
+        cur.execute(f"UPDATE `{table}` t JOIN `{tmp}` h ON t.`LATITUDE` = h.`LAT` AND t.`LONGITUDE` = h.`LON` "
+                    f"SET t.`ACCIDENT_HOTSPOT` = h.`HOTSPOT`")
+    finally:
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{tmp}`")
+
+
+def apply_hotspot_plan(cur, table: str, plan: dict):
+    """Write a plan: index rows, merged ids and relabelled rows of `table`. Does not commit."""
+    if plan["replace"]:
+        cur.execute(f"DELETE FROM `{INDEX_TABLE}` WHERE `SOURCE_TABLE` = %s", (table,))
+    merges = plan["merges"]
+    if merges:
+        case = " ".join(f"WHEN {int(a)} THEN {int(b)}" for a, b in merges.items())
+        ids = ", ".join(str(int(a)) for a in merges)
+        cur.execute(f"UPDATE `{INDEX_TABLE}` SET `HOTSPOT` = CASE `HOTSPOT` {case} END "
+                    f"WHERE `SOURCE_TABLE` = %s AND `HOTSPOT` IN ({ids})", (table,))
+        cur.execute(f"UPDATE `{table}` SET `ACCIDENT_HOTSPOT` = CASE `ACCIDENT_HOTSPOT` {case} END "
+                    f"WHERE `ACCIDENT_HOTSPOT` IN ({ids})")
+    if plan["relabel"] is not None and len(plan["relabel"]):
+        _relabel_table(cur, table, plan["relabel"])
+
+    rows = plan["index_rows"]
+    if rows is None or rows.empty:
+        return
+    if plan["replace"]:
+        bulk_insert(cur, INDEX_TABLE, rows.assign(SOURCE_TABLE=table)[["SOURCE_TABLE"] + INDEX_COLUMNS])
+        return
+    cols = ["SOURCE_TABLE"] + INDEX_COLUMNS
+    sql = (
+        f"INSERT INTO `{INDEX_TABLE}` ({', '.join(f'`{c}`' for c in cols)}) "
+        f"VALUES ({', '.join(['%s'] * len(cols))}) "
+        "ON DUPLICATE KEY UPDATE `WEIGHT` = VALUES(`WEIGHT`), `HOTSPOT` = VALUES(`HOTSPOT`), `CORE` = VALUES(`CORE`)"
+    )
+    cur.executemany(sql, [(table, float(r.LAT), float(r.LON), int(r.CELL_LAT), int(r.CELL_LON), int(r.WEIGHT),
+                           int(r.HOTSPOT), int(r.CORE)) for r in rows.itertuples(index=False)])
+
+
+def rebuild_hotspot_index(table: str) -> dict:
+    """Re-cluster every row of `table` from scratch, rewriting its hotspot ids, index and cube."""
+    conn = get_db_connection(); cur = conn.cursor()
+    locked = False
+    try:
+        ensure_cube_table(cur)
+        ensure_index_table(cur)
+        lock_hotspots(cur, table); locked = True
+        plan = _full_plan(_table_points(cur, table), relabel_table=True)
+        clauses = widen_clauses(column_types(cur, table), {"ACCIDENT_HOTSPOT": hotspot_column_type(plan)})
+        if clauses:   # DDL before the transaction's first write
+            cur.execute(f"ALTER TABLE `{table}` " + ", ".join(clauses))
+        cur.execute(f"UPDATE `{table}` SET `ACCIDENT_HOTSPOT` = -1")   # rows without coordinates
+        apply_hotspot_plan(cur, table, plan)
+        rebuild_cube(cur, table)
+        conn.commit()
+    finally:
+        if locked:
+            try: unlock_hotspots(cur, table)
+            except Exception: pass
+        cur.close(); conn.close()
+    try: bump_data_version(table)
+    except Exception: pass
+    get_response_cache().invalidate(table)
+    return {"table": table, **plan["stats"]}
+
+
+def drop_hotspot_index(table: str):
+    """Forget a table's index (after DROP or a full rewrite); the next append re-clusters the table."""
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        ensure_index_table(cur)
+        cur.execute(f"DELETE FROM `{INDEX_TABLE}` WHERE `SOURCE_TABLE` = %s", (table,))
+        conn.commit()
+    finally:
+        cur.close(); conn.close()
@@ -0,0 +1,231 @@
+# app/services/ingest_jobs.py
+"""
+Background ingest jobs.
+
+`/api/upload_files` spools the two uploads into a per-job directory and
+returns a job id; a pool of INGEST_WORKERS threads runs the merge →
+preprocess → DBSCAN → insert pipeline (`merge_and_save_spooled()`) inside
+an app context and reports its stage, row counts and throughput as it goes.
+
+Job status lives in memory for the process running the job and is written
+through (at most every INGEST_JOB_SAVE_SECONDS, and on every stage change)
+to `app_ingest_jobs`, so any worker process can answer `/api/jobs/<id>`.
+While a job is queued or running, its process re-saves it at least every
+INGEST_JOB_STALE_SECONDS / 4; a queued/running row left untouched for
+INGEST_JOB_STALE_SECONDS belongs to a process that died and is reported as
+failed.
+"""
+import json, shutil, tempfile, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from ..extensions import get_db_connection, ensure_app_table
+from .preprocessing import spool_upload, merge_and_save_spooled
+
+JOBS_TABLE = "app_ingest_jobs"
+
+_DDL = f"""
+CREATE TABLE IF NOT EXISTS `{JOBS_TABLE}` (
+  `JOB_ID` CHAR(32) NOT NULL,
+  `TABLE_NAME` VARCHAR(64) NOT NULL,
+  `STATE` VARCHAR(16) NOT NULL,
+  `STATUS` TEXT NOT NULL,
+  `UPDATED_AT` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`JOB_ID`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+FINISHED = ("done", "failed")
+_AGE = "TIMESTAMPDIFF(SECOND, `UPDATED_AT`, CURRENT_TIMESTAMP)"   # server clock on both sides
+
+
+def _iso(ts: float | None) -> str | None:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+class IngestJobs:
+    def __init__(self, app, workers: int = 2, spool_dir: str | None = None,
+                 save_seconds: float = 1.0, keep_seconds: int = 3600, stale_seconds: int = 120):
+        self.app = app
+        self.workers = max(1, int(workers))
+        self.spool_dir = spool_dir or None
+        self.save_seconds = max(0.0, float(save_seconds))
+        self.keep_seconds = max(60, int(keep_seconds))
+        self.stale_seconds = max(4 * self.save_seconds, 10.0, float(stale_seconds))
+        self._jobs: dict[str, dict] = {}
+        self._saved_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+                    threading.Thread(target=self._heartbeat, name="ingest-heartbeat", daemon=True).start()
+        return self._pool
+
+    def _heartbeat(self):
+        # keeps UPDATED_AT of this process's unfinished jobs fresh through long silent stages
+        with self.app.app_context():
+            while True:
+                time.sleep(self.stale_seconds / 4)
+                with self._lock:
+                    active = [j for j, job in self._jobs.items() if job["state"] not in FINISHED]
+                for job_id in active:
+                    self._save(job_id, force=True)
+
+    def _ensure(self, cur):
+        ensure_app_table(cur, JOBS_TABLE, _DDL)
+
+    # --- submitting ----------------------------------------------------------
+    def submit(self, file1_storage, file2_storage, table_name: str, append: bool = False,
+               stream: bool | None = None) -> str:
+        """Spool both uploads (the request's file streams end with it) and queue the job; returns its id."""
+        job_id = uuid.uuid4().hex
+        workdir = tempfile.mkdtemp(prefix=f"ingest_{job_id[:8]}_", dir=self.spool_dir)
+        try:
+            main = spool_upload(file1_storage, workdir)
+            veh = spool_upload(file2_storage, workdir)
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        job = {"id": job_id, "table": table_name, "append": bool(append), "state": "queued", "stage": "queued",
+               "files": [main[1], veh[1]], "rows_processed": 0, "rows_saved": None, "chunks": None,
+               "rows_per_sec": None, "seconds": None, "error": None, "message": None,
+               "created_at": time.time(), "started_at": None, "finished_at": None}
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._save(job_id, force=True)
+        self._executor().submit(self._run, job_id, main, veh, table_name, append, stream, workdir)
+        return job_id
+
+    def _run(self, job_id: str, main, veh, table_name: str, append: bool, stream, workdir: str):
+        with self.app.app_context():
+            self._update(job_id, state="running", stage="starting", started_at=time.time())
+            try:
+                processed, saved = merge_and_save_spooled(
+                    main, veh, table_name, append, stream=stream, workdir=workdir,
+                    progress=lambda stage, **counts: self._update(job_id, stage=stage, **counts))
+                verb = "Appended to" if append else "Saved to"
+                self._update(job_id, state="done", stage="done", rows_processed=int(processed),
+                             rows_saved=int(saved), message=f"Files merged and {verb} '{table_name}'.",
+                             finished_at=time.time())
+            except Exception as e:
+                current_app.logger.exception("ingest job %s failed", job_id)
+                self._update(job_id, state="failed", error=str(e), finished_at=time.time())
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    # --- status --------------------------------------------------------------
+    def _update(self, job_id: str, **fields):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            moved = fields.get("state", job["state"]) != job["state"] or fields.get("stage", job["stage"]) != job["stage"]
+            job.update(fields)
+            started = job["started_at"]
+            if started:
+                end = job["finished_at"] or now
+                job["seconds"] = round(end - started, 3)
+                rows = job["rows_saved"] if job["rows_saved"] is not None else job["rows_processed"]
+                job["rows_per_sec"] = round(rows / job["seconds"], 1) if job["seconds"] > 0 and rows else None
+        self._save(job_id, force=moved)
+
+    def _save(self, job_id: str, force: bool = False):
+        """Write the job's status through to the jobs table (best effort; never fails the job)."""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._saved_at.get(job_id, 0.0) < self.save_seconds:
+                return
+            if job_id not in self._jobs:
+                return
+            self._saved_at[job_id] = now
+            job = dict(self._jobs[job_id])
+        try:
+            conn = get_db_connection(); cur = conn.cursor()
+            try:
+                self._ensure(cur)
+                cur.execute(
+                    f"INSERT INTO `{JOBS_TABLE}` (`JOB_ID`, `TABLE_NAME`, `STATE`, `STATUS`) VALUES (%s, %s, %s, %s) "
+                    "ON DUPLICATE KEY UPDATE `STATE` = VALUES(`STATE`), `STATUS` = VALUES(`STATUS`), "
+                    "`UPDATED_AT` = CURRENT_TIMESTAMP",   # also when nothing changed (heartbeat)
+                    (job_id, job["table"][:64], job["state"], json.dumps(job)),
+                )
+                conn.commit()
+            finally:
+                cur.close(); conn.close()
+        except Exception as e:
+            current_app.logger.warning("could not save ingest job %s status: %s", job_id, e)
+
+    def _prune(self):
+        # finished jobs stay readable from memory for keep_seconds (then from the table)
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j for j, job in self._jobs.items()
+                       if job["state"] in FINISHED and (job["finished_at"] or 0) < cutoff]:
+            del self._jobs[job_id]
+            self._saved_at.pop(job_id, None)
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        out = dict(job)
+        for key in ("created_at", "started_at", "finished_at"):
+            out[key] = _iso(out[key])
+        return out
+
+    def _stored(self, status: str, age) -> dict:
+        """A job read back from the table; unfinished and not saved for stale_seconds -> failed."""
+        job = json.loads(status)
+        if job["state"] not in FINISHED and age is not None and float(age) > self.stale_seconds:
+            job.update(state="failed", error="Worker lost: the process running this job stopped.")
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        """Status of a job, from this process or, failing that, the jobs table."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._public(job)
+        conn = get_db_connection(); cur = conn.cursor()
+        try:
+            self._ensure(cur)
+            cur.execute(f"SELECT `STATUS`, {_AGE} FROM `{JOBS_TABLE}` WHERE `JOB_ID` = %s", (job_id,))
+            row = cur.fetchone()
+        finally:
+            cur.close(); conn.close()
+        return self._public(self._stored(*row)) if row else None
+
+    def recent(self, limit: int = 20) -> list[dict]:
+        """The latest jobs of every process, newest first."""
+        conn = get_db_connection(); cur = conn.cursor()
+        try:
+            self._ensure(cur)
+            cur.execute(f"SELECT `STATUS`, {_AGE} FROM `{JOBS_TABLE}` ORDER BY `UPDATED_AT` DESC LIMIT %s",
+                        (int(limit),))
+            rows = cur.fetchall()
+        finally:
+            cur.close(); conn.close()
+        jobs = {j["id"]: j for j in (self._stored(*r) for r in rows)}
+        with self._lock:
+            jobs.update((j, dict(job)) for j, job in self._jobs.items() if j in jobs)   # fresher than the table
+        return [self._public(j) for j in sorted(jobs.values(), key=lambda j: j["created_at"], reverse=True)]
+
+
+def get_ingest_jobs() -> IngestJobs:
+    """Per-app ingest job runner, its worker pool started on the first submit."""
+    jobs = current_app.extensions.get("ingest_jobs")
+    if jobs is None:
+        cfg = current_app.config
+        jobs = IngestJobs(
+            current_app._get_current_object(),
+            workers=cfg.get("INGEST_WORKERS", 2),
+            spool_dir=cfg.get("INGEST_SPOOL_DIR") or None,
+            save_seconds=cfg.get("INGEST_JOB_SAVE_SECONDS", 1.0),
+            keep_seconds=cfg.get("INGEST_JOB_KEEP_SECONDS", 3600),
+            stale_seconds=cfg.get("INGEST_JOB_STALE_SECONDS", 120),
+        )
+        current_app.extensions["ingest_jobs"] = jobs
+    return jobs
@@ -0,0 +1,282 @@
+# app/services/ingest_stream.py
+"""
+Streaming ingest for uploads too large to hold in memory.
+
+The vehicle file is read once, in chunks, into an on-disk SQLite index keyed
+by the merge keys and the per-key row number. The main file is then read
+INGEST_CHUNK_ROWS rows at a time: each chunk looks up its vehicle rows, goes
+through the same cleaning and feature steps as a batch upload and is
+bulk-loaded into a temporary staging table on the server. Hotspot ids are
+assigned once over the staged coordinates from the target table's hotspot
+index (`hotspot_index`), then the staged rows move to the target table with
+one INSERT … SELECT (a single transaction, like a batch upload). Peak
+memory follows the chunk size, not the file size.
+
+Each chunk collapses OFFENSE over its own rows; keys that more than one chunk
+staged are collapsed again over the staging table before clustering, so a
+streamed upload keeps the same rows as a batch one. Missing AGE / VICTIM
+COUNT still get the chunk's median rather than the whole upload's.
+"""
+import itertools, os, pickle, sqlite3, uuid
+import numpy as np
+import pandas as pd
+from flask import current_app
+from ..extensions import get_db_connection
+from .bulk_writer import bulk_insert
+from .catalog import get_catalog
+from .database import bump_data_version
+from .filter_columns import FILTER_COLUMNS, ensure_filter_columns
+from .hotspot_cube import ensure_cube_table, sync_cube_from_table, rebuild_cube
+from .hotspot_index import (ensure_index_table, plan_hotspots, apply_hotspot_plan, hotspot_column_type,
+                            lock_hotspots, unlock_hotspots)
+from .preprocessing import (MERGE_KEYS, OFFENSE_KEYS, iter_upload, clean_upload, finish_merged,
+                            apply_additional_preprocessing, recollapse_offenses, report_progress)
+from .response_cache import get_response_cache
+from .schema import column_type, column_types, append_clauses, widen_clauses
+
+_NA_KEY = "\x00"        # a missing key part; equal to itself, like NaN keys in DataFrame.merge
+STAGE_CHUNK = "STAGE_CHUNK"     # staging-only column: the chunk a row came from
+
+
+def merge_key_text(df: pd.DataFrame) -> np.ndarray:
+    """The four merge keys of each row as one string."""
+    date = df["DATE COMMITTED"].dt.strftime("%Y-%m-%d").astype(object).fillna(_NA_KEY)
+    parts = [df[k].astype(object).fillna(_NA_KEY) for k in MERGE_KEYS[1:]]
+    return date.str.cat(parts, sep="\x1f").to_numpy(dtype=object)
+
+
+def row_numbers(keys: np.ndarray, seen: dict) -> np.ndarray:
+    """Per-key row number in file order, continuing from the counts in `seen` (updated)."""
+    keys = pd.Series(keys, dtype=object)
+    within = keys.groupby(keys, sort=False).cumcount().to_numpy()
+    base = keys.map(seen).fillna(0).to_numpy(dtype="int64")
+    for k, n in keys.value_counts(sort=False).items():
+        seen[k] = seen.get(k, 0) + int(n)
+    return base + within
+
+
+class VehicleIndex:
+    """Vehicle rows on disk, looked up by (merge-key text, row number)."""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("CREATE TABLE veh (k TEXT NOT NULL, n INTEGER NOT NULL, layout INTEGER NOT NULL, "
+                        "row BLOB NOT NULL, PRIMARY KEY (k, n)) WITHOUT ROWID")
+        self.db.execute("CREATE TEMP TABLE want (pos INTEGER PRIMARY KEY, k TEXT NOT NULL, n INTEGER NOT NULL)")
+        self.columns: list[str] = []        # every vehicle column seen, first-seen order
+        self.layouts: list[tuple] = []      # column tuple per stored row layout
+        self._seen: dict = {}
+
+    def add(self, chunk: pd.DataFrame):
+        """Index a cleaned vehicle chunk (chunks must arrive in file order)."""
+        keys = merge_key_text(chunk)
+        nums = row_numbers(keys, self._seen)
+        cols = tuple(c for c in chunk.columns if c not in MERGE_KEYS)
+        if cols not in self.layouts:
+            self.layouts.append(cols)
+        layout = self.layouts.index(cols)
+        self.columns += [c for c in cols if c not in self.columns]
+        rows = (pickle.dumps(r, pickle.HIGHEST_PROTOCOL)
+                for r in chunk[list(cols)].itertuples(index=False, name=None))
+        self.db.executemany("INSERT INTO veh VALUES (?, ?, ?, ?)",
+                            zip(keys.tolist(), nums.tolist(), itertools.repeat(layout), rows))
+        self.db.commit()
+
+    def merge(self, main: pd.DataFrame, seen: dict) -> pd.DataFrame:
+        """
+        Left-join a cleaned main chunk to its vehicle rows, like the batch
+        merge on keys + row_num: every vehicle column, clashing names
+        suffixed _V. `seen` carries the main file's per-key counts across chunks.
+        """
+        main = main.reset_index(drop=True)
+        keys = merge_key_text(main)
+        nums = row_numbers(keys, seen)
+        self.db.execute("DELETE FROM want")
+        self.db.executemany("INSERT INTO want VALUES (?, ?, ?)", zip(range(len(main)), keys.tolist(), nums.tolist()))
+        found = self.db.execute("SELECT want.pos, veh.layout, veh.row FROM want "
+                                "JOIN veh ON veh.k = want.k AND veh.n = want.n").fetchall()
+
+        parts = []
+        for layout, cols in enumerate(self.layouts):
+            hits = [(pos, row) for pos, lay, row in found if lay == layout]
+            if hits:
+                parts.append(pd.DataFrame([pickle.loads(row) for _, row in hits], columns=list(cols),
+                                          index=[pos for pos, _ in hits]))
+        veh = pd.concat(parts) if parts else pd.DataFrame()
+        veh = veh.reindex(index=main.index, columns=self.columns)
+        veh.columns = [f"{c}_V" if c in main.columns else c for c in veh.columns]
+        return pd.concat([main, veh], axis=1)
+
+    def close(self):
+        self.db.close()
+
+
+# --- staging table on the server -------------------------------------------
+def _stage(cur, staging: str, frame: pd.DataFrame, staged: dict):
+    """Append a processed chunk to the staging table, creating/widening it as needed; `staged` = its column types."""
+    if not staged:
+        decls = ", ".join(f"`{c}` {column_type(c, frame[c])}" for c in frame.columns)
+        cur.execute(f"CREATE TEMPORARY TABLE `{staging}` ({decls}) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+        staged.update(column_types(cur, staging))
+    else:
+        clauses = append_clauses(staged, frame)
+        if clauses:
+            cur.execute(f"ALTER TABLE `{staging}` " + ", ".join(clauses))
+            staged.clear()
+            staged.update(column_types(cur, staging))
+    bulk_insert(cur, staging, frame.reindex(columns=list(staged)))
+
+
+def _collapse_staged(cur, staging: str, staged: dict) -> int:
+    """
+    Finish the OFFENSE collapse across chunks: rows of keys staged by more
+    than one chunk are read back in chunk order, collapsed again
+    (`recollapse_offenses()`) and replaced. Returns the number of rows removed.
+    """
+    keys = ", ".join(f"`{k}`" for k in OFFENSE_KEYS)
+    cols = list(staged)
+    dups = f"{staging}_dups"
+    cur.execute(f"CREATE TEMPORARY TABLE `{dups}` AS "
+                f"SELECT {keys} FROM `{staging}` GROUP BY {keys} HAVING COUNT(*) > 1")
+    try:
+        cur.execute(f"SELECT {', '.join(f'`{c}`' for c in cols)} FROM `{staging}` "
+                    f"WHERE ({keys}) IN (SELECT {keys} FROM `{dups}`) ORDER BY `{STAGE_CHUNK}`")
+        rows = pd.DataFrame(cur.fetchall(), columns=cols)
+        if rows.empty:
+            return 0
+        collapsed = recollapse_offenses(rows)
+        cur.execute(f"DELETE FROM `{staging}` WHERE ({keys}) IN (SELECT {keys} FROM `{dups}`)")
+        bulk_insert(cur, staging, collapsed.reindex(columns=cols))
+        return len(rows) - len(collapsed)
+    finally:
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{dups}`")
+
+
+def _cluster_staged(cur, staging: str, staged: dict, table_name: str, exists: bool) -> dict:
+    """
+    Hotspot ids for every distinct staged coordinate from the target table's
+    hotspot index (`plan_hotspots()`), written back with one UPDATE. Returns the plan.
+    """
+    cur.execute(f"SELECT `LATITUDE`, `LONGITUDE`, COUNT(*) FROM `{staging}` "
+                f"WHERE `LATITUDE` IS NOT NULL AND `LONGITUDE` IS NOT NULL GROUP BY `LATITUDE`, `LONGITUDE`")
+    points = pd.DataFrame(cur.fetchall(), columns=["LAT", "LON", "N"])
+    points["LAT"] = points["LAT"].astype("float64")
+    points["LON"] = points["LON"].astype("float64")
+    points = points.sort_values(["LAT", "LON"]).reset_index(drop=True)
+    plan = plan_hotspots(cur, table_name, points, table_existed=exists)
+    if points.empty:
+        return plan
+    points["H"] = plan["labels"]
+
+    clauses = widen_clauses(staged, {"ACCIDENT_HOTSPOT": hotspot_column_type(plan)})
+    if clauses:
+        cur.execute(f"ALTER TABLE `{staging}` " + ", ".join(clauses))
+        staged.update(column_types(cur, staging))
+    labels = f"{staging}_hotspots"
+    cur.execute(f"CREATE TEMPORARY TABLE `{labels}` (`LAT` DOUBLE NOT NULL, `LON` DOUBLE NOT NULL, "
+                f"`H` INT NOT NULL, PRIMARY KEY (`LAT`, `LON`)) ENGINE=InnoDB")
+    try:
+        bulk_insert(cur, labels, points[["LAT", "LON", "H"]])
+        cur.execute(f"UPDATE `{staging}` s JOIN `{labels}` h ON s.`LATITUDE` = h.`LAT` AND s.`LONGITUDE` = h.`LON` "
+                    f"SET s.`ACCIDENT_HOTSPOT` = h.`H`")
+    finally:
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{labels}`")
+    return plan
+
+
+def _publish(cur, staging: str, staged: dict, table_name: str, append: bool, exists: bool, plan: dict) -> int:
+    """Create/widen the target table like the batch path, then copy the staged rows in date order."""
+    staged = {c: t for c, t in staged.items() if c != STAGE_CHUNK}
+    if append and exists:
+        clauses = widen_clauses(column_types(cur, table_name), staged)
+        if clauses:
+            cur.execute(f"ALTER TABLE `{table_name}` " + ", ".join(clauses))
+    elif not exists:
+        col_decls = ", ".join(f"`{c}` {t} NULL" for c, t in staged.items())
+        cur.execute(f"CREATE TABLE IF NOT EXISTS `{table_name}` ({col_decls}) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+    ensure_filter_columns(cur, table_name)
+
+    apply_hotspot_plan(cur, table_name, plan)  # merged / relabelled ids of rows already in the table
+    cols = ", ".join(f"`{c}`" for c in column_types(cur, table_name) if c not in FILTER_COLUMNS and c in staged)
+    order = [f"`{c}`" for c in ("DATE_COMMITTED", "TIME_COMMITTED") if c in staged]
+    cur.execute(f"INSERT INTO `{table_name}` ({cols}) SELECT {cols} FROM `{staging}`"
+                + (f" ORDER BY {', '.join(order)}" if order else ""))
+    rows_saved = int(cur.rowcount)
+
+    # keep the map's hotspot × month × hour cube in step (same transaction)
+    if plan["existing_changed"]:
+        rebuild_cube(cur, table_name)
+    else:
+        sync_cube_from_table(cur, table_name, staging, table_existed=exists)
+    return rows_saved
+
+
+def stream_merge_and_save(main: tuple[str, str], veh: tuple[str, str], table_name: str, append: bool,
+                          chunk_rows: int, workdir: str, progress=None) -> tuple[int, int]:
+    """
+    `process_merge_and_save_to_db()` over spooled (path, filename) uploads,
+    `chunk_rows` main rows at a time. Returns rows_processed, rows_saved.
+    """
+    chunk_rows = max(1, int(chunk_rows))
+    index = VehicleIndex(os.path.join(workdir, "vehicles.sqlite"))
+    try:
+        indexed = 0
+        for chunk in iter_upload(*veh, chunk_rows):
+            chunk = clean_upload(chunk, vehicle=True)
+            if len(chunk):
+                index.add(chunk)
+                indexed += len(chunk)
+            report_progress(progress, "indexing", rows_indexed=indexed)
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        staging = f"tmp_ingest_{uuid.uuid4().hex[:12]}"
+        staged, seen, rows_processed, chunks = {}, {}, 0, 0
+        locked = False
+        try:
+            for chunk in iter_upload(*main, chunk_rows):
+                merged = finish_merged(index.merge(clean_upload(chunk), seen))
+                rows_processed += len(merged)
+                merged = apply_additional_preprocessing(merged, hotspots=False)
+                if len(merged):
+                    _stage(cur, staging, merged.assign(**{STAGE_CHUNK: chunks}), staged)
+                    conn.commit()   # staging is private to this connection; keeps undo small
+                chunks += 1
+                report_progress(progress, "preprocessing", rows_processed=rows_processed, chunks=chunks)
+            current_app.logger.info("stream ingest %s: %d chunks, %d rows processed", table_name, chunks, rows_processed)
+            if not staged:
+                return rows_processed, 0
+
+            ensure_cube_table(cur)  # DDL up front; it would implicitly commit mid-insert
+            ensure_index_table(cur)
+            lock_hotspots(cur, table_name); locked = True   # another ingest into the table waits here
+            cur.execute("SHOW TABLES LIKE %s", (table_name,))
+            exists = cur.fetchone() is not None
+            merged_rows = _collapse_staged(cur, staging, staged) if "OFFENSE" in staged else 0
+            if merged_rows:
+                current_app.logger.info("stream ingest %s: %d rows merged across chunks", table_name, merged_rows)
+            report_progress(progress, "clustering", rows_processed=rows_processed, chunks=chunks)
+            plan = _cluster_staged(cur, staging, staged, table_name, exists)
+            report_progress(progress, "writing", rows_processed=rows_processed, chunks=chunks)
+            rows_saved = _publish(cur, staging, staged, table_name, append, exists, plan)
+            conn.commit()
+        finally:
+            if locked:
+                try: unlock_hotspots(cur, table_name)
+                except Exception: pass
+            try: cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging}`")
+            except Exception: pass
+            try: cur.close()
+            except: pass
+            try: conn.close()
+            except: pass
+    finally:
+        index.close()
+
+    get_catalog().invalidate(table_name)  # new table or added columns
+    try: bump_data_version(table_name)
+    except Exception: pass
+    get_response_cache().invalidate(table_name)
+    return rows_processed, rows_saved
@@ -0,0 +1,61 @@
+# app/services/kpis.py
+"""
+Dashboard KPI cards in one conditional-aggregate scan.
+
+AGGREGATES are SELECT-list expressions (built from the table's column
+roles, or None when the columns are missing); KPIS are formulas over the
+resulting row. A new card adds its aggregates and its formula here and
+still costs no extra scan.
+"""
+
+
+def _num(v):
+    return float(v) if v is not None else None
+
+
+# --- aggregates: alias -> roles -> SQL expression (None = not available) ---
+AGGREGATES = {
+    "n": lambda r: "COUNT(*)",
+    "victims": lambda r: r["victim"] and f"SUM(NULLIF(CAST(`{r['victim']}` AS DECIMAL(18,4)),0))",
+    "alcohol_yes": lambda r: (
+        f"SUM(COALESCE(`{r['alcohol_onehot']['Yes']}`,0))" if r["alcohol_onehot"]["Yes"]
+        else r["alcohol_cat"] and f"SUM(CASE WHEN UPPER(TRIM(`{r['alcohol_cat']}`))='YES' THEN 1 ELSE 0 END)"
+    ),
+    "fatal": lambda r: r["fatalities"] and f"SUM(CASE WHEN COALESCE(`{r['fatalities']}`,0) > 0 THEN 1 ELSE 0 END)",
+    "weekend": lambda r: r["weekday"] and f"SUM(CASE WHEN {r['weekday']} >= 5 THEN 1 ELSE 0 END)",
+}
+
+
+def _rate(a: dict, alias: str):
+    """alias count / total accidents, when both are known."""
+    if alias not in a or not a["n"]:
+        return None
+    return int(a[alias] or 0) / float(a["n"])
+
+
+# --- KPIs: output key -> aggregate row -> value ----------------------------
+KPIS = {
+    "total_accidents": lambda a: int(a["n"] or 0),
+    "total_victims": lambda a: (_num(a["victims"]) or 0.0) if "victims" in a else 0,
+    "avg_victims_per_accident": lambda a: (
+        (_num(a["victims"]) or 0.0) / float(a["n"]) if "victims" in a and a["n"] else None
+    ),
+    # Yes / total, Unknown included in the denominator (matches the BI card)
+    "alcohol_involvement_rate": lambda a: _rate(a, "alcohol_yes"),
+    "fatal_accident_rate": lambda a: _rate(a, "fatal"),
+    "weekend_share": lambda a: _rate(a, "weekend"),
+}
+
+
+def kpi_sql(table: str, roles: dict, where_sql: str) -> tuple[str, list[str]]:
+    """The single-pass SELECT and the aliases it returns, in column order."""
+    exprs = {alias: build(roles) for alias, build in AGGREGATES.items()}
+    aliases = [alias for alias, sql in exprs.items() if sql]
+    select = ", ".join(f"{exprs[alias]} AS {alias}" for alias in aliases)
+    return f"SELECT {select} FROM `{table}`{where_sql}", aliases
+
+
+def compute_kpis(aliases: list[str], row) -> dict:
+    """KPI values from the aggregate row; aggregates the table lacks are absent."""
+    aggs = dict(zip(aliases, row))
+    return {key: formula(aggs) for key, formula in KPIS.items()}
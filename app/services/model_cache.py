@@ -0,0 +1,152 @@
+# app/services/model_cache.py
+import hashlib, os, re, shutil, tempfile, threading, time
+from collections import OrderedDict
+from flask import current_app
+from xgboost import XGBRegressor
+
+
+class ModelCache:
+    """
+    LRU cache of fitted XGBoost regressors.
+
+    Models live in memory (up to `max_entries`) and on disk in XGBoost's
+    native UBJSON format (up to `max_files`), so a restarted worker can load
+    a booster instead of refitting it. Keys are tuples such as
+    (table, data_version, hour_window).
+    """
+
+    def __init__(self, directory: str, max_entries: int = 16, max_files: int = 128):
+        self.directory = directory
+        self.max_entries = max(1, int(max_entries))
+        self.max_files = max(self.max_entries, int(max_files))
+        self._mem: "OrderedDict[tuple, XGBRegressor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # --- paths ---------------------------------------------------------------
+    @staticmethod
+    def _prefix(table: str) -> str:
+        # readable name + hash of the exact name, so "foo" never matches "foo-bar"'s files
+        name = re.sub(r"[^A-Za-z0-9_-]+", "_", table)[:40]
+        return f"{name}-{hashlib.sha1(table.encode('utf-8')).hexdigest()[:8]}-"
+
+    def _path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+        prefix = self._prefix(str(key[0])) if key else "model-"
+        return os.path.join(self.directory, f"{prefix}{digest}.ubj")
+
+    def _remember(self, key: tuple, model: XGBRegressor):
+        # caller holds the lock
+        self._mem[key] = model
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _prune_disk(self):
+        try:
+            files = [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                     if f.endswith(".ubj") and not f.startswith(".")]
+            files.sort(key=os.path.getmtime)
+            for path in files[: max(0, len(files) - self.max_files)]:
+                os.remove(path)
+            # saves interrupted by a crashed worker; live ones take seconds
+            for f in os.listdir(self.directory):
+                path = os.path.join(self.directory, f)
+                if f.startswith(".saving-") and time.time() - os.path.getmtime(path) > 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+    # --- public API ----------------------------------------------------------
+    def get(self, key: tuple) -> XGBRegressor | None:
+        with self._lock:
+            model = self._mem.get(key)
+            if model is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return model
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # lazy load from disk
+        model = XGBRegressor()
+        try:
+            model.load_model(path)
+            os.utime(path, None)  # keep disk LRU order honest
+        except Exception:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, model)
+        return model
+
+    def put(self, key: tuple, model: XGBRegressor):
+        path = self._path(key)
+        # written in a private ".saving-*" dir (XGBoost picks the format from the .ubj extension),
+        # so pruning/invalidation in other workers never sees a half-written file
+        tmpdir = None
+        try:
+            tmpdir = tempfile.mkdtemp(prefix=".saving-", dir=self.directory)
+            tmp = os.path.join(tmpdir, os.path.basename(path))
+            model.save_model(tmp)
+            os.replace(tmp, path)
+        except Exception:
+            pass
+        finally:
+            if tmpdir:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+        with self._lock:
+            self._remember(key, model)
+        self._prune_disk()
+
+    def get_or_fit(self, key: tuple, fit_fn) -> XGBRegressor:
+        """Return the cached model for `key`, or call `fit_fn()` and store its result."""
+        model = self.get(key)
+        if model is None:
+            model = fit_fn()
+            self.put(key, model)
+        return model
+
+    def invalidate(self, table: str | None = None):
+        """Drop in-memory and on-disk models (all, or only those for `table`)."""
+        with self._lock:
+            for key in [k for k in self._mem if table is None or k[0] == table]:
+                del self._mem[key]
+        prefix = None if table is None else self._prefix(table)
+        try:
+            for f in os.listdir(self.directory):
+                if f.endswith(".ubj") and not f.startswith(".") and (prefix is None or f.startswith(prefix)):
+                    os.remove(os.path.join(self.directory, f))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_memory": len(self._mem),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+def get_model_cache() -> ModelCache:
+    """Process-wide cache for the current app, created on first use."""
+    cache = current_app.extensions.get("model_cache")
+    if cache is None:
+        cfg = current_app.config
+        cache = ModelCache(
+            cfg.get("MODEL_CACHE_DIR", "model_cache"),
+            max_entries=cfg.get("MODEL_CACHE_SIZE", 16),
+            max_files=cfg.get("MODEL_CACHE_MAX_FILES", 128),
+        )
+        current_app.extensions["model_cache"] = cache
+    return cache
@@ -1,9 +1,23 @@
 from datetime import time, timedelta, datetime
-import io
+import io, itertools, os, shutil, tempfile
 import numpy as np
 import pandas as pd
+from flask import current_app
 from ..extensions import get_db_connection
-from typing import Optional
+from .hotspot_cube import ensure_cube_table, sync_cube_after_insert, rebuild_cube
+from .hotspot_index import (hotspot_labels, ensure_index_table, weighted_points, row_labels,
+                            plan_hotspots, apply_hotspot_plan, hotspot_column_type, lock_hotspots,
+                            unlock_hotspots)
+from .catalog import get_catalog
+from .filter_columns import ensure_filter_columns, FILTER_COLUMNS
+from .schema import column_type, column_types, widen_clauses
+from .bulk_writer import bulk_insert
+from .time_parsing import to_pytime, extract_hour
+from .categories import (normalize_gender, normalize_alcohol, time_clusters, onehot,
+                         cluster_label, cluster_label_from_codes)
+from .database import bump_data_version
+from .response_cache import get_response_cache
+from typing import Callable, Iterator, Optional
 import re
 
 # === lifted from your app.py and kept functionally identical ===
@@ -47,35 +61,82 @@ def make_display_copy(df: pd.DataFrame) -> pd.DataFrame:
             hrs = hrs.fillna((tdelta.dt.seconds // 3600).astype("float"))
         conds = [(hrs>=6)&(hrs<=9),(hrs>=10)&(hrs<=15),(hrs>=16)&(hrs<=19)]
         out["TIME_CLUSTER"] = np.select(conds, ["Morning","Midday","Evening"], default="Midnight").astype("object")
-    g_ohe = [c for c in ["GENDER_Male","GENDER_Unknown"] if c in out.columns]
-    if g_ohe:
-        g = pd.Series(pd.NA, index=out.index, dtype="object")
-        if "GENDER_Male" in out.columns: g.loc[pd.to_numeric(out["GENDER_Male"], errors="coerce").fillna(0).astype(int).eq(1)] = "Male"
-        if "GENDER_Unknown" in out.columns: g.loc[pd.to_numeric(out["GENDER_Unknown"], errors="coerce").fillna(0).astype(int).eq(1)] = "Unknown"
-        out["GENDER_CLUSTER"] = g.fillna("Female")
-    a_ohe = [c for c in ["ALCOHOL_USED_Yes","ALCOHOL_USED_Unknown"] if c in out.columns]
-    if a_ohe:
-        a = pd.Series(pd.NA, index=out.index, dtype="object")
-        if "ALCOHOL_USED_Yes" in out.columns: a.loc[pd.to_numeric(out["ALCOHOL_USED_Yes"], errors="coerce").fillna(0).astype(int).eq(1)] = "Yes"
-        if "ALCOHOL_USED_Unknown" in out.columns: a.loc[pd.to_numeric(out["ALCOHOL_USED_Unknown"], errors="coerce").fillna(0).astype(int).eq(1)] = "Unknown"
-        out["ALCOHOL_USED_CLUSTER"] = a.fillna("No")
+    if any(c in out.columns for c in ["GENDER_Male","GENDER_Unknown"]):
+        out["GENDER_CLUSTER"] = cluster_label(out, "GENDER")
+    if any(c in out.columns for c in ["ALCOHOL_USED_Yes","ALCOHOL_USED_Unknown"]):
+        out["ALCOHOL_USED_CLUSTER"] = cluster_label(out, "ALCOHOL_USED")
     return out
 
-def apply_additional_preprocessing(merged: pd.DataFrame) -> pd.DataFrame:
+OFFENSE_KEYS = ["MONTH_SIN", "MONTH_COS", "DAYOWEEK_SIN", "DAYOWEEK_COS",
+                "HOUR_COMMITTED", "LATITUDE", "LONGITUDE"]
+OFFENSE_BUCKETS = ["Property_and_Person", "Person_Injury_Only", "Property_Damage_Only"]
+
+
+def collapse_offenses(df: pd.DataFrame, target_col: str = "OFFENSE") -> pd.DataFrame:
+    """
+    One row per spatiotemporal key (OFFENSE_KEYS) with OFFENSE collapsed to
+    Property_and_Person / Person_Injury_Only / Property_Damage_Only / Other
+    over the whole group. Other columns take the group's first non-null value.
+
+    Same result as groupby(keys).agg(any/first) + a row-wise label apply, but
+    offense texts are matched once per distinct value, the keys are hashed
+    once (ngroup), the flags are a transform('any') and the first rows come
+    from drop_duplicates; only columns with gaps in those rows pay for a
+    groupby().first().
+    """
+    codes, labels = pd.factorize(df[target_col])          # a handful of distinct offense texts
+    text = pd.Series(labels, dtype=object).astype(str)
+    person = np.append(text.str.contains("HOMICIDE|PHYSICAL INJURY", regex=True, na=False).to_numpy(), False)
+    prop = np.append(text.str.contains("DAMAGE TO PROPERTY", regex=False, na=False).to_numpy(), False)
+    flags = pd.DataFrame({"person": person[codes], "property": prop[codes]})   # code -1 (missing) -> False
+    gid = df.groupby(OFFENSE_KEYS, sort=True).ngroup().to_numpy()   # sorted key order; -1 = NaN key
+    valid = gid >= 0                                                # NaN-key rows are dropped, as groupby does
+    flags = flags[valid].groupby(gid[valid]).transform("any")
+
+    first = np.flatnonzero(valid & ~pd.Series(gid).duplicated().to_numpy())
+    first = first[np.argsort(gid[first], kind="stable")]           # groupby output order
+    other_cols = [c for c in df.columns if c not in OFFENSE_KEYS + [target_col]]
+    out = df.iloc[first][OFFENSE_KEYS + other_cols].reset_index(drop=True)
+
+    gaps = [c for c in other_cols if out[c].isna().any()]
+    if gaps:
+        filled = df.loc[valid, gaps].groupby(gid[valid], sort=True).first()
+        for c in gaps:
+            out[c] = filled[c].reset_index(drop=True)
+
+    person, prop = flags.loc[first, "person"].to_numpy(bool), flags.loc[first, "property"].to_numpy(bool)
+    out[target_col] = np.select([person & prop, person, prop], OFFENSE_BUCKETS, default="Other")
+    return out
+
+
+# a text per bucket that collapse_offenses() maps back to that bucket
+_BUCKET_TEXT = {"Property_and_Person": "PHYSICAL INJURY AND DAMAGE TO PROPERTY",
+                "Person_Injury_Only": "PHYSICAL INJURY", "Property_Damage_Only": "DAMAGE TO PROPERTY"}
+
+
+def recollapse_offenses(df: pd.DataFrame, target_col: str = "OFFENSE") -> pd.DataFrame:
+    """
+    `collapse_offenses()` over rows it already produced (OFFENSE holds the
+    bucket labels), e.g. the per-chunk results of one streamed upload in
+    chunk order. Gives the same rows as collapsing the chunks' input at once.
+    """
+    return collapse_offenses(df.assign(**{target_col: df[target_col].map(_BUCKET_TEXT)}), target_col)
+
+
+def apply_additional_preprocessing(merged: pd.DataFrame, hotspots: bool = True) -> pd.DataFrame:
     """
     Clean + engineer features consistently with your Colab notebook:
       - DATE_COMMITTED sin/cos (month & day-of-week)
       - HOUR_COMMITTED from TIME_COMMITTED (robust for multiple types)
       - OFFENSE collapsed to 4 buckets with de-dup by spatiotemporal keys
-      - DBSCAN hotspots with eps = 0.04 km (haversine)
+      - DBSCAN hotspots with eps = 0.04 km (haversine); hotspots=False leaves
+        ACCIDENT_HOTSPOT at -1 for the caller to fill in
       - TIME_CLUSTER bins (Midnight/Morning/Midday/Evening)
       - One-hot encode GENDER, ALCOHOL_USED, TIME_CLUSTER (NO drop_first)
       - Reconstruct readable cluster labels from dummies
     """
-    import datetime
     import numpy as np
     import pandas as pd
-    from sklearn.cluster import DBSCAN
 
     df = merged.copy()
 
@@ -97,35 +158,7 @@ def apply_additional_preprocessing(merged: pd.DataFrame) -> pd.DataFrame:
         df = df.rename(columns={"TIME COMMITTED": "TIME_COMMITTED"})
 
     if "TIME_COMMITTED" in df.columns and "HOUR_COMMITTED" not in df.columns:
-        def _extract_hour(val):
-            # Missing
-            if pd.isna(val):
-                return np.nan
-            # Already datetime.time
-            if isinstance(val, datetime.time):
-                return val.hour
-            # Pandas/py datetime
-            if isinstance(val, (pd.Timestamp, datetime.datetime)):
-                return val.hour
-            # Numeric hour (e.g., 13 or 13.0)
-            if isinstance(val, (int, float, np.integer, np.floating)):
-                try:
-                    if np.isnan(val):  # type: ignore[arg-type]
-                        return np.nan
-                except Exception:
-                    pass
-                return int(val) if 0 <= int(val) <= 23 else np.nan
-            # String like "13:45:00" / "13:45"
-            if isinstance(val, str):
-                # Try strict HH:MM:SS then fallback
-                ts = pd.to_datetime(val, errors="coerce", format="%H:%M:%S")
-                if pd.isna(ts):
-                    ts = pd.to_datetime(val, errors="coerce")  # let pandas guess
-                return ts.hour if not pd.isna(ts) else np.nan
-            # Fallback
-            return np.nan
-
-        df["HOUR_COMMITTED"] = df["TIME_COMMITTED"].apply(_extract_hour)
+        df["HOUR_COMMITTED"] = extract_hour(df["TIME_COMMITTED"])
 
     if "HOUR_COMMITTED" in df.columns:
         df["HOUR_COMMITTED"] = pd.to_numeric(df["HOUR_COMMITTED"], errors="coerce")
@@ -145,43 +178,8 @@ def apply_additional_preprocessing(merged: pd.DataFrame) -> pd.DataFrame:
         df["VICTIM COUNT"] = df["VICTIM COUNT"].fillna(df["VICTIM COUNT"].median()).astype(int)
 
     # --- Collapse OFFENSE and deduplicate by spatiotemporal keys -------------
-    target_col = "OFFENSE"
-    if target_col in df.columns:
-        homicide_pattern = "HOMICIDE"
-        physical_injury_pattern = "PHYSICAL INJURY"
-        property_damage_pattern = "DAMAGE TO PROPERTY"
-
-        df["IS_PERSON"] = df[target_col].astype(str).str.contains(
-            f"{homicide_pattern}|{physical_injury_pattern}", regex=True, na=False
-        )
-        df["IS_PROPERTY"] = df[target_col].astype(str).str.contains(
-            property_damage_pattern, regex=False, na=False
-        )
-
-        grouping_keys = [
-            "MONTH_SIN", "MONTH_COS", "DAYOWEEK_SIN", "DAYOWEEK_COS",
-            "HOUR_COMMITTED", "LATITUDE", "LONGITUDE"
-        ]
-        agg_funcs = {"IS_PERSON": "any", "IS_PROPERTY": "any"}
-
-        other_cols = [c for c in df.columns
-                      if c not in grouping_keys + [target_col, "IS_PERSON", "IS_PROPERTY"]]
-        for c in other_cols:
-            agg_funcs[c] = "first"
-
-        df = df.groupby(grouping_keys, as_index=False).agg(agg_funcs)
-
-        def _assign_offense(row):
-            if row["IS_PROPERTY"] and row["IS_PERSON"]:
-                return "Property_and_Person"
-            if row["IS_PERSON"]:
-                return "Person_Injury_Only"
-            if row["IS_PROPERTY"]:
-                return "Property_Damage_Only"
-            return "Other"
-
-        df[target_col] = df.apply(_assign_offense, axis=1)
-        df.drop(columns=["IS_PERSON", "IS_PROPERTY"], inplace=True)
+    if "OFFENSE" in df.columns:
+        df = collapse_offenses(df)
 
     # --- Ensure coords, then DBSCAN hotspots (ε = 0.04 km) -------------------
     for req in ("LATITUDE", "LONGITUDE"):
@@ -190,33 +188,22 @@ def apply_additional_preprocessing(merged: pd.DataFrame) -> pd.DataFrame:
 
     df = df.dropna(subset=["LATITUDE", "LONGITUDE"]).copy()
     if not df.empty:
-        kms_per_radian = 6371.0088
-        epsilon = 0.04 / kms_per_radian  # match Colab exactly
-        dbscan = DBSCAN(eps=epsilon, min_samples=5, algorithm="ball_tree", metric="haversine")
-        coords_rad = np.radians(df[["LATITUDE", "LONGITUDE"]])
-        df["ACCIDENT_HOTSPOT"] = dbscan.fit_predict(coords_rad)
+        # ingest labels rows from the table's hotspot index (hotspot_index); -1 until then
+        df["ACCIDENT_HOTSPOT"] = hotspot_labels(df[["LATITUDE", "LONGITUDE"]]) if hotspots else -1
 
     # --- TIME_CLUSTER bins ----------------------------------------------------
-    def _time_cluster(h):
-        try:
-            h = int(h)
-        except Exception:
-            return "Midnight"
-        if 6 <= h <= 9:
-            return "Morning"
-        if 10 <= h <= 15:
-            return "Midday"
-        if 16 <= h <= 19:
-            return "Evening"
-        return "Midnight"
-
     if "HOUR_COMMITTED" in df.columns:
-        df["TIME_CLUSTER"] = df["HOUR_COMMITTED"].apply(_time_cluster).astype("object")
+        df["TIME_CLUSTER"] = time_clusters(df["HOUR_COMMITTED"])
 
     # --- One-hot encode (NO drop_first to match Colab/your visuals) ----------
+    labelled = {}   # normalized categoricals: labels come straight off their codes
     for cat_col in ["GENDER", "ALCOHOL_USED", "TIME_CLUSTER"]:
         if cat_col in df.columns:
-            dummies = pd.get_dummies(df[cat_col], prefix=cat_col, dtype="int64")  # keep all categories
+            if isinstance(df[cat_col].dtype, pd.CategoricalDtype):
+                dummies = onehot(df[cat_col], cat_col)        # every category, even unseen ones
+                labelled[cat_col] = df[cat_col]
+            else:
+                dummies = pd.get_dummies(df[cat_col], prefix=cat_col, dtype="int64")  # keep all categories
             # ensure stable set of expected columns
             expected = {
                 "GENDER": ["GENDER_Female", "GENDER_Male", "GENDER_Unknown"],
@@ -231,280 +218,203 @@ def apply_additional_preprocessing(merged: pd.DataFrame) -> pd.DataFrame:
             df = pd.concat([df.drop(columns=[cat_col]), dummies], axis=1)
 
     # --- Reconstruct readable labels (for display/filters) --------------------
-    if any(c.startswith("GENDER_") for c in df.columns):
-        g = pd.Series(pd.NA, index=df.index, dtype="object")
-        if "GENDER_Male" in df.columns:
-            g.loc[pd.to_numeric(df["GENDER_Male"], errors="coerce").fillna(0).astype(int).eq(1)] = "Male"
-        if "GENDER_Unknown" in df.columns:
-            g.loc[pd.to_numeric(df["GENDER_Unknown"], errors="coerce").fillna(0).astype(int).eq(1)] = "Unknown"
-        df["GENDER_CLUSTER"] = g.fillna("Female")
-
-    if any(c.startswith("ALCOHOL_USED_") for c in df.columns):
-        a = pd.Series(pd.NA, index=df.index, dtype="object")
-        if "ALCOHOL_USED_Yes" in df.columns:
-            a.loc[pd.to_numeric(df["ALCOHOL_USED_Yes"], errors="coerce").fillna(0).astype(int).eq(1)] = "Yes"
-        if "ALCOHOL_USED_Unknown" in df.columns:
-            a.loc[pd.to_numeric(df["ALCOHOL_USED_Unknown"], errors="coerce").fillna(0).astype(int).eq(1)] = "Unknown"
-        df["ALCOHOL_USED_CLUSTER"] = a.fillna("No")
-
+    for prefix, label_col in (("GENDER", "GENDER_CLUSTER"), ("ALCOHOL_USED", "ALCOHOL_USED_CLUSTER")):
+        if prefix in labelled:
+            df[label_col] = cluster_label_from_codes(labelled[prefix], prefix)
+        elif any(c.startswith(prefix + "_") for c in df.columns):
+            df[label_col] = cluster_label(df, prefix)
     return df
 
-def process_merge_and_save_to_db(
-    file1_storage,
-    file2_storage,
-    table_name: str = "accidents_processed",
-    append: bool = False,
-) -> tuple[int, int]:
-    """
-    Reads two uploaded files (main + vehicle), canonicalizes columns, merges on
-    (DATE COMMITTED, STATION, BARANGAY, OFFENSE, row_num), normalizes
-    DATE/TIME, performs light cleaning, runs apply_additional_preprocessing(),
-    and writes to MySQL.
+# ---------------------------
+# Upload reading & cleaning (shared by batch and streaming ingest)
+# ---------------------------
+SUPPORTED_UPLOADS = (".csv", ".xlsx")
+MERGE_KEYS = ["DATE COMMITTED", "STATION", "BARANGAY", "OFFENSE"]
+# NA normalization (keep Unknown as missing now; we'll standardize later)
+NA_VALS = ["Unknown", "unknown", "N/A", "NaN", "", " ", "<NA>", "nan"]
+CANON = {
+    "DATE COMMITTED": "DATE COMMITTED",
+    "TIME COMMITTED": "TIME COMMITTED",
+    "STATION": "STATION",
+    "BARANGAY": "BARANGAY",
+    "OFFENSE": "OFFENSE",
+    "AGE": "AGE",
+    "GENDER": "GENDER",
+    "ALCOHOL_USED": "ALCOHOL_USED",
+    "VEHICLE KIND": "VEHICLE KIND",
+    "LATITUDE": "LATITUDE",
+    "LONGITUDE": "LONGITUDE",
+    "VICTIM COUNT": "VICTIM COUNT",
+    "SUSPECT COUNT": "SUSPECT COUNT",
+}
+
+
+def spool_upload(fstorage, directory: str) -> tuple[str, str]:
+    """Copy an uploaded file into `directory` block by block; returns (path, original filename)."""
+    filename = fstorage.filename or ""
+    if not filename.lower().endswith(SUPPORTED_UPLOADS):
+        raise ValueError("Only .csv or .xlsx are supported")
+    fd, path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(filename)[1].lower())
+    with os.fdopen(fd, "wb") as fh:
+        stream = getattr(fstorage, "stream", None)
+        if stream is not None:
+            shutil.copyfileobj(stream, fh, 1 << 20)
+        else:
+            fh.write(fstorage.read())
+    return path, filename
+
+
+def read_upload(path: str, filename: str) -> pd.DataFrame:
+    """A whole spooled upload (every sheet of an .xlsx, concatenated)."""
+    name = filename.lower()
+    if name.endswith(".xlsx"):
+        sheets = pd.read_excel(path, sheet_name=None)
+        return pd.concat(sheets.values(), ignore_index=True)
+    elif name.endswith(".csv"):
+        return pd.read_csv(path)
+    raise ValueError("Only .csv or .xlsx are supported")
+
+
+def _sheet_header(cells) -> list[str]:
+    # read_excel's naming: blank -> "Unnamed: i", repeats -> "X.1", "X.2"
+    cols, seen = [], {}
+    for i, c in enumerate(cells):
+        name = f"Unnamed: {i}" if c is None else str(c)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        cols.append(name)
+    return cols
+
+
+def iter_upload(path: str, filename: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """A spooled upload as frames of at most `chunk_rows` rows, in file (and sheet) order."""
+    name = filename.lower()
+    if name.endswith(".csv"):
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                rows = ws.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+                cols = _sheet_header(header)
+                width = len(cols)
+                while True:
+                    block = list(itertools.islice(rows, chunk_rows))
+                    if not block:
+                        break
+                    block = [tuple(r[:width]) + (None,) * (width - len(r)) for r in block]
+                    yield pd.DataFrame(block, columns=cols).infer_objects()
+        finally:
+            wb.close()
+    else:
+        raise ValueError("Only .csv or .xlsx are supported")
 
-    If append=True and the table already exists, the function:
-      1) introspects existing columns
-      2) adds any missing columns (ALTER TABLE)
-      3) adds missing columns into the incoming DataFrame (as NULLs)
-      4) inserts rows in the table's exact column order
 
-    Returns:
-        rows_processed, rows_saved
-    """
-    # ---------------------------
-    # Helpers (same)
-    # ---------------------------
-    import io, re
-    from datetime import time, timedelta
-    import pandas as pd
-    import numpy as np
-    from typing import Optional
-    from ..extensions import get_db_connection
-
-    def _read_any(fstorage) -> pd.DataFrame:
-        filename = (fstorage.filename or "").lower()
-        data = fstorage.read()
-        bio = io.BytesIO(data)
-        if filename.endswith(".xlsx"):
-            sheets = pd.read_excel(bio, sheet_name=None)
-            return pd.concat(sheets.values(), ignore_index=True)
-        elif filename.endswith(".csv"):
-            return pd.read_csv(bio)
-        raise ValueError("Only .csv or .xlsx are supported")
+def _norm_key(raw: str) -> str:
+    s = str(raw).replace("\u00A0", " ").strip()
+    s = s.replace("_", " ")
+    s = re.sub(r"\s+", " ", s)
+    return s.upper()
 
-    def _norm_key(raw: str) -> str:
-        s = str(raw).replace("\u00A0", " ").strip()
-        s = s.replace("_", " ")
-        s = re.sub(r"\s+", " ", s)
-        return s.upper()
-
-    def _canonicalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-        CANON = {
-            "DATE COMMITTED": "DATE COMMITTED",
-            "TIME COMMITTED": "TIME COMMITTED",
-            "STATION": "STATION",
-            "BARANGAY": "BARANGAY",
-            "OFFENSE": "OFFENSE",
-            "AGE": "AGE",
-            "GENDER": "GENDER",
-            "ALCOHOL_USED": "ALCOHOL_USED",
-            "VEHICLE KIND": "VEHICLE KIND",
-            "LATITUDE": "LATITUDE",
-            "LONGITUDE": "LONGITUDE",
-            "VICTIM COUNT": "VICTIM COUNT",
-            "SUSPECT COUNT": "SUSPECT COUNT",
-        }
-        canon_lookup = {_norm_key(k): v for k, v in CANON.items()}
-        new_cols = {}
-        for c in df.columns:
-            token = _norm_key(c)
-            new_cols[c] = canon_lookup.get(token, token)
-        out = df.rename(columns=new_cols)
-
-        # drop post-rename dupes case-insensitively
-        seen, to_drop = set(), []
-        for col in list(out.columns):
-            key = col.lower()
-            if key in seen:
-                to_drop.append(col)
-            else:
-                seen.add(key)
-        if to_drop:
-            out = out.drop(columns=to_drop)
-        return out
-
-    def _to_pytime(x) -> Optional[time]:
-        if pd.isna(x):
-            return None
-        if isinstance(x, time):
-            return x
-        if isinstance(x, timedelta):
-            total = int(x.total_seconds())
-            hh = (total // 3600) % 24
-            mm = (total % 3600) // 60
-            ss = total % 60
-            return time(hh, mm, ss)
-        td = pd.to_timedelta(x, errors="coerce")
-        if not pd.isna(td):
-            total = int(td.total_seconds())
-            hh = (total // 3600) % 24
-            mm = (total % 3600) // 60
-            ss = total % 60
-            return time(hh, mm, ss)
-        ts = pd.to_datetime(x, format="%H:%M:%S", errors="coerce")
-        if not pd.isna(ts):
-            return ts.time()
-        ts2 = pd.to_datetime(x, errors="coerce")
-        if not pd.isna(ts2):
-            return ts2.time()
-        return None
-
-    TYPE_MAP = {
-        "DATE_COMMITTED": "DATE",
-        "TIME_COMMITTED": "TIME",
-        "YEAR": "INT",
-        "MONTH": "INT",
-        "DAY": "INT",
-        "WEEKDAY": "VARCHAR(20)",
-        "LATITUDE": "DOUBLE",
-        "LONGITUDE": "DOUBLE",
-        "AGE": "VARCHAR(16)",
-        "VEHICLE KIND": "VARCHAR(128)",
-        "STATION": "VARCHAR(128)",
-        "BARANGAY": "VARCHAR(128)",
-        "OFFENSE": "VARCHAR(255)",
-        "GENDER": "VARCHAR(32)",
-        "ALCOHOL_USED": "VARCHAR(32)",
-        "VICTIM COUNT": "INT",
-        "SUSPECT COUNT": "INT",
-    }
-    def _sql_type(col: str) -> str:
-        return TYPE_MAP.get(col, "TEXT")
 
-    # ---------------------------
-    # Read & basic cleaning
-    # ---------------------------
-    main_df = _read_any(file1_storage)
-    veh_df  = _read_any(file2_storage)
+def _canonicalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    canon_lookup = {_norm_key(k): v for k, v in CANON.items()}
+    new_cols = {}
+    for c in df.columns:
+        token = _norm_key(c)
+        new_cols[c] = canon_lookup.get(token, token)
+    out = df.rename(columns=new_cols)
 
-    # Drop 'Unnamed' columns
-    main_df = main_df.loc[:, ~main_df.columns.astype(str).str.contains(r"^Unnamed", regex=True)]
-    veh_df  =  veh_df.loc[:, ~veh_df.columns.astype(str).str.contains(r"^Unnamed", regex=True)]
+    # drop post-rename dupes case-insensitively
+    seen, to_drop = set(), []
+    for col in list(out.columns):
+        key = col.lower()
+        if key in seen:
+            to_drop.append(col)
+        else:
+            seen.add(key)
+    if to_drop:
+        out = out.drop(columns=to_drop)
+    return out
 
-    main_df = _canonicalize_columns(main_df)
-    veh_df  = _canonicalize_columns(veh_df)
 
-    # NA normalization (keep Unknown as missing now; we'll standardize later)
-    NA_VALS = ["Unknown", "unknown", "N/A", "NaN", "", " ", "<NA>", "nan"]
-    main_df.replace(NA_VALS, pd.NA, inplace=True)  # 
-    veh_df.replace(NA_VALS, pd.NA, inplace=True)
+def clean_upload(df: pd.DataFrame, vehicle: bool = False) -> pd.DataFrame:
+    """
+    Basic cleaning of one upload (or one chunk of it): drop 'Unnamed'
+    columns, canonical column names, NA tokens, trimmed text, typed merge keys.
+    """
+    df = df.loc[:, ~df.columns.astype(str).str.contains(r"^Unnamed", regex=True)]
+    df = _canonicalize_columns(df)
+    df = df.replace(NA_VALS, pd.NA)
 
     # Local specific fix
-    if "BARANGAY" in veh_df.columns:
-        veh_df["BARANGAY"] = veh_df["BARANGAY"].replace("SAPALIBUTA", "SAPALIBUTAD")  # 
+    if vehicle and "BARANGAY" in df.columns:
+        df["BARANGAY"] = df["BARANGAY"].replace("SAPALIBUTA", "SAPALIBUTAD")
 
     # Trim text columns
     for col in ["STATION", "BARANGAY", "OFFENSE", "VEHICLE KIND"]:
-        if col in main_df.columns:
-            main_df[col] = main_df[col].astype(str).str.strip()
-        if col in veh_df.columns:
-            veh_df[col] = veh_df[col].astype(str).str.strip()
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
 
     # Ensure merge keys exist & types normalized
-    for df in (main_df, veh_df):
-        if "DATE COMMITTED" not in df.columns:
-            df["DATE COMMITTED"] = pd.NaT
-        df["DATE COMMITTED"] = pd.to_datetime(df["DATE COMMITTED"], errors="coerce").dt.normalize()
-        for k in ["STATION", "BARANGAY", "OFFENSE"]:
-            if k not in df.columns:
-                df[k] = pd.NA
-            df[k] = df[k].astype("string").str.strip()
-
-    main_df = main_df.dropna(how="all")
-    veh_df  = veh_df.dropna(how="all")
+    if "DATE COMMITTED" not in df.columns:
+        df["DATE COMMITTED"] = pd.NaT
+    df["DATE COMMITTED"] = pd.to_datetime(df["DATE COMMITTED"], errors="coerce").dt.normalize()
+    for k in ["STATION", "BARANGAY", "OFFENSE"]:
+        if k not in df.columns:
+            df[k] = pd.NA
+        df[k] = df[k].astype("string").str.strip()
 
-    # ---------------------------
-    # Merge on keys + row_num
-    # ---------------------------
-    merge_keys = ["DATE COMMITTED", "STATION", "BARANGAY", "OFFENSE"]
-    main_df = main_df.sort_values(by=merge_keys).reset_index(drop=True)
-    veh_df  =  veh_df.sort_values(by=merge_keys).reset_index(drop=True)
-
-    main_df["row_num"] = main_df.groupby(merge_keys).cumcount()
-    veh_df["row_num"]  =  veh_df.groupby(merge_keys).cumcount()
+    return df.dropna(how="all")
 
-    merged = main_df.merge(
-        veh_df,
-        on=merge_keys + ["row_num"],
-        how="left",
-        suffixes=("", "_V"),
-    ).drop(columns=["row_num"], errors="ignore")  # 
 
-    # Normalizations post-merge
+def finish_merged(merged: pd.DataFrame) -> pd.DataFrame:
+    """Post-merge normalization: dates, times, text fixes, AGE, GENDER/ALCOHOL_USED, rows without coordinates dropped."""
     if "BARANGAY" in merged.columns:
-        merged["BARANGAY"] = merged["BARANGAY"].replace("CAPAY", "CAPAYA")  # 
+        merged["BARANGAY"] = merged["BARANGAY"].replace("CAPAY", "CAPAYA")
 
     if "DATE COMMITTED" in merged.columns:
         merged["DATE COMMITTED"] = pd.to_datetime(merged["DATE COMMITTED"], errors="coerce")
         merged["DATE_COMMITTED"] = merged["DATE COMMITTED"].dt.date
-        merged.drop(columns=["DATE COMMITTED"], inplace=True, errors="ignore")  # 
+        merged.drop(columns=["DATE COMMITTED"], inplace=True, errors="ignore")
 
     if "DATE_COMMITTED" in merged.columns:
         dt = pd.to_datetime(merged["DATE_COMMITTED"], errors="coerce")
         merged["YEAR"] = dt.dt.year
         merged["MONTH"] = dt.dt.month
         merged["DAY"] = dt.dt.day
-        merged["WEEKDAY"] = dt.dt.day_name()  # 
+        merged["WEEKDAY"] = dt.dt.day_name()
 
     if "TIME COMMITTED" in merged.columns:
-        merged["TIME_COMMITTED"] = merged["TIME COMMITTED"].apply(_to_pytime)
-        merged.drop(columns=["TIME COMMITTED"], inplace=True, errors="ignore")  # 
+        merged["TIME_COMMITTED"] = to_pytime(merged["TIME COMMITTED"])
+        merged.drop(columns=["TIME COMMITTED"], inplace=True, errors="ignore")
 
     if "VEHICLE KIND" in merged.columns:
         merged["VEHICLE KIND"] = merged["VEHICLE KIND"].fillna("Unknown")
 
     if "AGE" in merged.columns:
         merged["AGE"] = pd.to_numeric(merged["AGE"], errors="coerce")
-        merged["AGE"] = merged["AGE"].apply(lambda x: str(int(x)) if pd.notnull(x) else "Unknown")  # 
+        age = merged["AGE"].to_numpy(dtype="float64", na_value=np.nan)
+        text = np.full(len(age), "Unknown", dtype=object)
+        known = ~np.isnan(age)
+        text[known] = np.trunc(age[known]).astype("int64").astype(str)
+        merged["AGE"] = text
 
-    # ---------------------------
-    # NEW: Strong standardization for GENDER & ALCOHOL_USED
+    # Strong standardization for GENDER & ALCOHOL_USED
     # This prevents literal "<NA>" / "nan" strings from becoming categories
-    # ---------------------------
-    def _norm_str(x):
-        if x is pd.NA or x is None:
-            return None
-        s = str(x).strip()
-        if s in {"", "nan", "NaN", "<NA>", "None"}:
-            return None
-        return s
-
-    def _normalize_gender(x):
-        s = _norm_str(x)
-        if not s:
-            return "Unknown"
-        low = s.lower()
-        if low in {"m", "male"}:
-            return "Male"
-        if low in {"f", "female"}:
-            return "Female"
-        return "Unknown"
-
-    def _normalize_alcohol(x):
-        s = _norm_str(x)
-        if not s:
-            return "Unknown"
-        low = s.lower()
-        if low in {"yes", "y", "1", "true"}:
-            return "Yes"
-        if low in {"no", "n", "0", "false"}:
-            return "No"
-        return "Unknown"
-
     if "GENDER" in merged.columns:
-        merged["GENDER"] = merged["GENDER"].apply(_normalize_gender)
+        merged["GENDER"] = normalize_gender(merged["GENDER"])
 
     if "ALCOHOL_USED" in merged.columns:
-        merged["ALCOHOL_USED"] = merged["ALCOHOL_USED"].apply(_normalize_alcohol)
+        merged["ALCOHOL_USED"] = normalize_alcohol(merged["ALCOHOL_USED"])
 
     # Ensure coordinate columns exist
     for req in ["LATITUDE", "LONGITUDE"]:
@@ -512,14 +422,105 @@ def process_merge_and_save_to_db(
             merged[req] = pd.NA
 
     # Optional: drop rows without coordinates (kept from your code)
-    merged = merged.dropna(subset=["LATITUDE", "LONGITUDE"])
+    return merged.dropna(subset=["LATITUDE", "LONGITUDE"])
+
+
+def report_progress(progress, stage: str, **counts):
+    """Call `progress(stage, **counts)` if a progress callback was given."""
+    if progress is not None:
+        progress(stage, **counts)
+
 
+def process_merge_and_save_to_db(
+    file1_storage,
+    file2_storage,
+    table_name: str = "accidents_processed",
+    append: bool = False,
+    stream: Optional[bool] = None,
+    progress: Optional[Callable] = None,
+) -> tuple[int, int]:
+    """
+    Reads two uploaded files (main + vehicle), canonicalizes columns, merges on
+    (DATE COMMITTED, STATION, BARANGAY, OFFENSE, row_num), normalizes
+    DATE/TIME, performs light cleaning, runs apply_additional_preprocessing(),
+    and writes to MySQL.
+
+    The uploads are spooled to disk first (see `merge_and_save_spooled()`).
+
+    If append=True and the table already exists, the function:
+      1) introspects existing columns
+      2) adds missing columns / widens too-narrow ones (one ALTER TABLE)
+      3) adds missing columns into the incoming DataFrame (as NULLs)
+      4) inserts rows in the table's exact column order
+
+    Returns:
+        rows_processed, rows_saved
+    """
+    with tempfile.TemporaryDirectory(prefix="ingest_") as workdir:
+        main = spool_upload(file1_storage, workdir)
+        veh = spool_upload(file2_storage, workdir)
+        return merge_and_save_spooled(main, veh, table_name, append, stream=stream,
+                                      workdir=workdir, progress=progress)
+
+
+def merge_and_save_spooled(
+    main: tuple[str, str],
+    veh: tuple[str, str],
+    table_name: str,
+    append: bool = False,
+    stream: Optional[bool] = None,
+    workdir: Optional[str] = None,
+    progress: Optional[Callable] = None,
+) -> tuple[int, int]:
+    """
+    `process_merge_and_save_to_db()` over uploads already spooled to disk as
+    (path, filename). With stream=True (default: when they total
+    INGEST_STREAM_MIN_BYTES or more) the main file is processed in chunks of
+    INGEST_CHUNK_ROWS rows by `ingest_stream.stream_merge_and_save()`.
+    `progress(stage, **counts)`, when given, is called as the work moves on.
+    """
+    cfg = current_app.config
+    if stream is None:
+        size = os.path.getsize(main[0]) + os.path.getsize(veh[0])
+        stream = size >= int(cfg.get("INGEST_STREAM_MIN_BYTES", 64 << 20))
+    if stream:
+        from .ingest_stream import stream_merge_and_save
+        return stream_merge_and_save(main, veh, table_name, append,
+                                     chunk_rows=int(cfg.get("INGEST_CHUNK_ROWS", 50000)),
+                                     workdir=workdir or os.path.dirname(main[0]), progress=progress)
+
+    # ---------------------------
+    # Read & basic cleaning
+    # ---------------------------
+    report_progress(progress, "reading")
+    main_df = clean_upload(read_upload(*main))
+    veh_df = clean_upload(read_upload(*veh), vehicle=True)
+
+    # ---------------------------
+    # Merge on keys + row_num
+    # ---------------------------
+    report_progress(progress, "merging")
+    main_df = main_df.sort_values(by=MERGE_KEYS).reset_index(drop=True)
+    veh_df  =  veh_df.sort_values(by=MERGE_KEYS).reset_index(drop=True)
+
+    main_df["row_num"] = main_df.groupby(MERGE_KEYS).cumcount()
+    veh_df["row_num"]  =  veh_df.groupby(MERGE_KEYS).cumcount()
+
+    merged = main_df.merge(
+        veh_df,
+        on=MERGE_KEYS + ["row_num"],
+        how="left",
+        suffixes=("", "_V"),
+    ).drop(columns=["row_num"], errors="ignore")
+
+    merged = finish_merged(merged)
     rows_processed = int(len(merged))
+    report_progress(progress, "preprocessing", rows_processed=rows_processed)
 
     # ---------------------------
     # Extra preprocessing (unchanged)
     # ---------------------------
-    merged = apply_additional_preprocessing(merged)  # one-hot happens here; now safe from <NA> dummies 
+    merged = apply_additional_preprocessing(merged, hotspots=False)  # one-hot happens here; now safe from <NA> dummies 
 
     # Final sort by datetime if available
     if "DATE_COMMITTED" in merged.columns:
@@ -532,22 +533,34 @@ def process_merge_and_save_to_db(
     # ---------------------------
     # Persist to MySQL (same schema-aware create/append)
     # ---------------------------
+    report_progress(progress, "writing", rows_processed=rows_processed)
     conn = get_db_connection()
     cur = conn.cursor()
+    locked = False
     try:
+        ensure_cube_table(cur)  # DDL up front; it would implicitly commit mid-insert
+        ensure_index_table(cur)
+        lock_hotspots(cur, table_name); locked = True   # another ingest into the table waits here
         cur.execute("SHOW TABLES LIKE %s", (table_name,))
         exists = cur.fetchone() is not None
 
-        if append and exists:
-            cur.execute(f"SHOW COLUMNS FROM `{table_name}`")
-            existing_cols = [r[0] for r in cur.fetchall()]
-
-            to_add = [c for c in merged.columns if c not in existing_cols]
-            for c in to_add:
-                cur.execute(f"ALTER TABLE `{table_name}` ADD COLUMN `{c}` {_sql_type(c)} NULL")
+        # hotspot ids from the table's persisted index: only the batch's neighbourhood is re-clustered
+        points = weighted_points(merged)
+        plan = plan_hotspots(cur, table_name, points, table_existed=exists)
+        if "ACCIDENT_HOTSPOT" in merged.columns:
+            merged["ACCIDENT_HOTSPOT"] = row_labels(merged, points, plan["labels"])
 
-            cur.execute(f"SHOW COLUMNS FROM `{table_name}`")
-            final_cols = [r[0] for r in cur.fetchall()]
+        if append and exists:
+            # new columns + widenings in one ALTER (each ALTER rebuilds the table)
+            incoming = {c: column_type(c, merged[c]) for c in merged.columns}
+            if "ACCIDENT_HOTSPOT" in incoming:
+                incoming["ACCIDENT_HOTSPOT"] = hotspot_column_type(plan)
+            clauses = widen_clauses(column_types(cur, table_name), incoming)
+            if clauses:
+                cur.execute(f"ALTER TABLE `{table_name}` " + ", ".join(clauses))
+            ensure_filter_columns(cur, table_name)
+
+            final_cols = [c for c in column_types(cur, table_name) if c not in FILTER_COLUMNS]  # generated
             for c in final_cols:
                 if c not in merged.columns:
                     merged[c] = pd.NA
@@ -555,32 +568,34 @@ def process_merge_and_save_to_db(
 
         else:
             cols = list(merged.columns)
-            col_decls = ", ".join(f"`{c}` {_sql_type(c)}" for c in cols)
+            col_decls = ", ".join(f"`{c}` {column_type(c, merged[c])}" for c in cols)
             cur.execute(
                 f"CREATE TABLE IF NOT EXISTS `{table_name}` ({col_decls}) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;"
             )
-            cur.execute(f"SHOW COLUMNS FROM `{table_name}`")
-            final_cols = [r[0] for r in cur.fetchall()]
+            ensure_filter_columns(cur, table_name)
+            final_cols = [c for c in column_types(cur, table_name) if c not in FILTER_COLUMNS]  # generated
             merged = merged.reindex(columns=final_cols, fill_value=pd.NA)
 
-        cols = list(merged.columns)
-        placeholders = ", ".join(["%s"] * len(cols))
-        insert_sql = f"INSERT INTO `{table_name}` ({', '.join(f'`{c}`' for c in cols)}) VALUES ({placeholders})"
-
-        values = []
-        for _, r in merged.iterrows():
-            row = [None if pd.isna(r[c]) else r[c] for c in cols]
-            values.append(tuple(row))
+        apply_hotspot_plan(cur, table_name, plan)  # merged / relabelled ids of rows already in the table
+        rows_saved = bulk_insert(cur, table_name, merged)["rows"]
 
-        rows_saved = 0
-        if values:
-            cur.executemany(insert_sql, values)
-            rows_saved = int(cur.rowcount)
+        # keep the map's hotspot × month × hour cube in step (same transaction)
+        if plan["existing_changed"]:
+            rebuild_cube(cur, table_name)
+        else:
+            sync_cube_after_insert(cur, table_name, merged, table_existed=exists)
 
         conn.commit()
+        get_catalog().invalidate(table_name)  # new table or added columns
+        try: bump_data_version(table_name)
+        except Exception: pass
+        get_response_cache().invalidate(table_name)
         return rows_processed, rows_saved
     finally:
+        if locked:
+            try: unlock_hotspots(cur, table_name)
+            except Exception: pass
         try: cur.close()
         except: pass
         try: conn.close()
-        except: pass
\ No newline at end of file
+        except: pass
@@ -0,0 +1,190 @@
+# app/services/prewarm.py
+"""
+Background pre-warming of the "Live" hotspot map.
+
+A daemon thread wakes `PREWARM_LEAD_SECONDS` before every Asia/Manila hour
+boundary and computes the default Live forecast (no date/barangay/time
+filters) for the coming hour, for every active forecast table. The map
+endpoints serve that result directly when the table's data version still
+matches; anything else falls through to the normal on-demand path.
+
+Active tables are `PREWARM_TABLES` plus every table a map request asked for
+in the last `PREWARM_ACTIVE_HOURS` hours. Each worker process keeps its own
+store; the boosters themselves are shared through the on-disk model cache.
+"""
+import threading, time
+from datetime import datetime
+from flask import current_app
+from .database import list_tables, table_fingerprint
+
+
+def _hour_at(ts: float) -> int:
+    """Asia/Manila hour of a UNIX timestamp."""
+    try:
+        import pytz
+        return int(datetime.fromtimestamp(ts, pytz.timezone("Asia/Manila")).hour)
+    except Exception:
+        return int(datetime.fromtimestamp(ts).hour)
+
+
+def _iso(ts: float | None) -> str | None:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+class HotspotPrewarmer:
+    def __init__(self, app, lead_seconds: int = 120, tables=(), active_hours: int = 24):
+        self.app = app
+        self.lead_seconds = max(0, min(3000, int(lead_seconds)))
+        self.static_tables = [t for t in tables if t]
+        self.active_seconds = max(1, int(active_hours)) * 3600
+        self._seen: dict[str, float] = {}                 # table -> last map request
+        self._store: dict[tuple[str, int], dict] = {}     # (table, hour) -> entry
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.next_run_at: float | None = None
+        self.last_run: dict | None = None
+        self.hits = self.misses = 0
+
+    # --- lifecycle -----------------------------------------------------------
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="hotspot-prewarm", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        with self.app.app_context():
+            # cover the hour we start in, then run ahead of every boundary
+            self.warm_current()
+            while not self._stop.is_set():
+                now = time.time()
+                boundary = (now // 3600 + 1) * 3600
+                fire_at = boundary - self.lead_seconds
+                self.next_run_at = fire_at
+                if now < fire_at:
+                    self._stop.wait(fire_at - now)
+                    continue
+                self.warm_all(_hour_at(boundary))
+                self._stop.wait(max(1.0, boundary - time.time() + 1))
+
+    # --- warming -------------------------------------------------------------
+    def note_table(self, table: str):
+        """Mark a table as active (called by the map endpoints)."""
+        with self._lock:
+            self._seen[table] = time.time()
+
+    def active_tables(self) -> list[str]:
+        cutoff = time.time() - self.active_seconds
+        with self._lock:
+            for t in [t for t, ts in self._seen.items() if ts < cutoff]:
+                del self._seen[t]
+            wanted = list(dict.fromkeys(self.static_tables + list(self._seen)))
+        try:
+            existing = set(list_tables())
+        except Exception:
+            return []
+        return [t for t in wanted if t in existing]
+
+    def warm(self, table: str, hour: int) -> dict:
+        """Compute and store the Live forecast of `table` for `hour`."""
+        from .forecasting import hotspot_forecast_data
+        started = time.perf_counter()
+        version = table_fingerprint(table)["version"]
+        data = hotspot_forecast_data(table=table, start_str="", end_str="", time_from="", time_to="",
+                                     legacy_time="Live", barangay_filter="", live_hour=hour)
+        seconds = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self._store[(table, hour)] = {"data": data, "version": version, "seconds": seconds, "at": time.time()}
+            # only the current and the upcoming hour are ever served
+            for key in [k for k in self._store if k[0] == table and k[1] not in (hour, (hour - 1) % 24)]:
+                del self._store[key]
+        return {"seconds": seconds, "hotspots": len(data["hotspots"]["hotspot"])}
+
+    def warm_all(self, hour: int) -> dict:
+        started = time.time()
+        results = {}
+        for table in self.active_tables():
+            try:
+                results[table] = {"ok": True, **self.warm(table, hour)}
+            except Exception as e:
+                results[table] = {"ok": False, "error": str(e)}
+        self.last_run = {"hour": hour, "started_at": _iso(started),
+                         "seconds": round(time.time() - started, 3), "tables": results}
+        return self.last_run
+
+    def warm_current(self) -> dict:
+        return self.warm_all(_hour_at(time.time()))
+
+    # --- serving -------------------------------------------------------------
+    def get(self, table: str, hour: int) -> dict | None:
+        """Pre-warmed data for (table, hour) if the table has not changed since."""
+        with self._lock:
+            entry = self._store.get((table, hour))
+        if entry is not None:
+            try:
+                fresh = table_fingerprint(table)["version"] == entry["version"]
+            except Exception:
+                fresh = False
+            if fresh:
+                with self._lock:
+                    self.hits += 1
+                return entry["data"]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def forget(self, table: str | None = None):
+        with self._lock:
+            for key in [k for k in self._store if table is None or k[0] == table]:
+                del self._store[key]
+
+    def status(self) -> dict:
+        with self._lock:
+            entries = [
+                {"table": t, "hour": h, "version": e["version"], "seconds": e["seconds"], "warmed_at": _iso(e["at"])}
+                for (t, h), e in sorted(self._store.items())
+            ]
+            hits, misses = self.hits, self.misses
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "lead_seconds": self.lead_seconds,
+            "active_tables": self.active_tables(),
+            "next_run_at": _iso(self.next_run_at),
+            "last_run": self.last_run,
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+        }
+
+
+def get_prewarmer() -> HotspotPrewarmer:
+    """Per-app pre-warmer, created (not started) on first use."""
+    warmer = current_app.extensions.get("hotspot_prewarm")
+    if warmer is None:
+        cfg = current_app.config
+        tables = [t.strip() for t in str(cfg.get("PREWARM_TABLES", "accidents")).split(",")]
+        warmer = HotspotPrewarmer(
+            current_app._get_current_object(),
+            lead_seconds=cfg.get("PREWARM_LEAD_SECONDS", 120),
+            tables=tables,
+            active_hours=cfg.get("PREWARM_ACTIVE_HOURS", 24),
+        )
+        current_app.extensions["hotspot_prewarm"] = warmer
+    return warmer
+
+
+def is_default_live_request(args) -> bool:
+    """True when map query args ask for the unfiltered Live view."""
+    if any((args.get(k) or "").strip() for k in ("start", "end", "barangay", "time_from", "time_to")):
+        return False
+    if (args.get("time") or "live").strip().lower() != "live":
+        return False
+    engine = (args.get("engine") or "").strip().lower()
+    return not engine or engine == str(current_app.config.get("HOTSPOT_ENGINE", "window")).lower()
@@ -0,0 +1,96 @@
+# app/services/response_cache.py
+"""
+Cache of rendered analytics responses (charts, KPIs, barangay list).
+
+Entries are keyed by (table, data version, endpoint, normalized args) and
+hold the JSON bytes plus a strong ETag over them. The cache is an LRU
+bounded by entry count and total body bytes; a TTL covers writes made
+outside the app. Writers bump the data version and call `invalidate(table)`.
+"""
+import hashlib, threading, time
+from collections import OrderedDict
+from flask import Response, current_app, request
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 << 20, ttl_seconds: float = 60.0):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = float(ttl_seconds)
+        self._mem: "OrderedDict[tuple, tuple[bytes, str, float]]" = OrderedDict()   # key -> (body, etag, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _drop(self, key: tuple):
+        # caller holds the lock
+        body, _, _ = self._mem.pop(key)
+        self._bytes -= len(body)
+
+    def get(self, key: tuple) -> tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and time.monotonic() - entry[2] < self.ttl:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, body: bytes) -> str:
+        """Store `body` under `key`; returns its ETag."""
+        etag = etag_for(body)
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            if key in self._mem:
+                self._drop(key)
+            self._mem[key] = (body, etag, time.monotonic())
+            self._bytes += len(body)
+            while len(self._mem) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._mem)))
+        return etag
+
+    def invalidate(self, table: str | None = None):
+        """Drop cached responses (all, or only those for `table`)."""
+        with self._lock:
+            for key in [k for k in self._mem if table is None or k[0] == table]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._mem), "bytes": self._bytes, "max_entries": self.max_entries,
+                    "max_bytes": self.max_bytes, "ttl_seconds": self.ttl,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def get_response_cache() -> ResponseCache:
+    """Per-app response cache, created on first use."""
+    cache = current_app.extensions.get("response_cache")
+    if cache is None:
+        cfg = current_app.config
+        cache = ResponseCache(
+            max_entries=cfg.get("RESPONSE_CACHE_SIZE", 512),
+            max_bytes=cfg.get("RESPONSE_CACHE_MAX_BYTES", 32 << 20),
+            ttl_seconds=cfg.get("RESPONSE_CACHE_TTL_SECONDS", 60),
+        )
+        current_app.extensions["response_cache"] = cache
+    return cache
+
+
+def etag_for(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()[:24]
+
+
+def json_body(payload) -> bytes:
+    return current_app.json.dumps(payload).encode("utf-8") + b"\n"
+
+
+def conditional_json(body: bytes, etag: str, status: int = 200) -> Response:
+    """JSON response with a strong ETag; unchanged data -> 304 with empty body."""
+    resp = Response(body, status=status, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
@@ -0,0 +1,289 @@
+# app/services/schema.py
+"""
+Column types for processed accident tables.
+
+Known columns get a fixed compact type (TINYINT one-hot flags, SMALLINT
+hour/hotspot, FLOAT trig features, ENUM labels); anything else is typed from
+its data. Integer and VARCHAR columns widen when a batch does not fit, so an
+append is never refused on width. `migrate_table()` converts an existing
+table (TEXT everywhere) in place with one ALTER and reports the size change.
+"""
+import math
+import pandas as pd
+from ..extensions import get_db_connection
+from .catalog import get_catalog
+from .database import bump_data_version
+from .filter_columns import FILTER_COLUMNS, ensure_filter_columns
+from .response_cache import get_response_cache
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+OFFENSE_LABELS = ("Property_and_Person", "Person_Injury_Only", "Property_Damage_Only", "Other")
+
+
+def _enum(values) -> str:
+    return "ENUM(" + ",".join(f"'{v}'" for v in values) + ")"
+
+
+TYPE_MAP = {
+    "DATE_COMMITTED": "DATE",
+    "TIME_COMMITTED": "TIME",
+    "YEAR": "SMALLINT",
+    "MONTH": "TINYINT",
+    "DAY": "TINYINT",
+    "WEEKDAY": _enum(WEEKDAYS),
+    "LATITUDE": "DOUBLE",
+    "LONGITUDE": "DOUBLE",
+    "AGE": "SMALLINT",
+    "VEHICLE KIND": "VARCHAR(128)",
+    "STATION": "VARCHAR(128)",
+    "BARANGAY": "VARCHAR(128)",
+    "OFFENSE": _enum(OFFENSE_LABELS),
+    "GENDER": "VARCHAR(32)",
+    "ALCOHOL_USED": "VARCHAR(32)",
+    "VICTIM COUNT": "SMALLINT",
+    "SUSPECT COUNT": "SMALLINT",
+    "HOUR_COMMITTED": "SMALLINT",
+    "ACCIDENT_HOTSPOT": "SMALLINT",
+    "MONTH_SIN": "FLOAT",
+    "MONTH_COS": "FLOAT",
+    "DAYOWEEK_SIN": "FLOAT",
+    "DAYOWEEK_COS": "FLOAT",
+    "GENDER_CLUSTER": _enum(("Male", "Female", "Unknown")),
+    "ALCOHOL_USED_CLUSTER": _enum(("Yes", "No", "Unknown")),
+}
+# one-hot flags (exact names above win, e.g. GENDER_CLUSTER)
+PREFIX_TYPES = (("GENDER_", "TINYINT"), ("ALCOHOL_USED_", "TINYINT"), ("TIME_CLUSTER_", "TINYINT"))
+
+INT_TYPES = {  # name -> (min, max)
+    "TINYINT": (-2**7, 2**7 - 1),
+    "SMALLINT": (-2**15, 2**15 - 1),
+    "INT": (-2**31, 2**31 - 1),
+    "BIGINT": (-2**63, 2**63 - 1),
+}
+
+
+def _int_for(lo, hi, at_least: str = "TINYINT") -> str:
+    names = list(INT_TYPES)
+    for name in names[names.index(at_least):]:
+        if INT_TYPES[name][0] <= lo and hi <= INT_TYPES[name][1]:
+            return name
+    return "BIGINT"
+
+
+def _varchar_for(max_len: int, at_least: int = 32) -> str:
+    n = max(at_least, 1 << max(0, math.ceil(math.log2(max(1, max_len)))))
+    return f"VARCHAR({n})" if n <= 512 else "TEXT"    # 512 x utf8mb4 still fits an index key
+
+
+def _base(sql_type: str) -> str:
+    return sql_type.split("(", 1)[0].upper()
+
+
+def _varchar_len(sql_type: str) -> int:
+    return int(sql_type.split("(", 1)[1].rstrip(")")) if _base(sql_type) == "VARCHAR" else 0
+
+
+def _enum_values(sql_type: str) -> list[str]:
+    return [v.strip("'") for v in sql_type[5:-1].split(",")] if _base(sql_type) == "ENUM" else []
+
+
+def _longest(values: pd.Series) -> int:
+    return int(values.astype(str).str.len().max()) if len(values) else 0
+
+
+def declared_type(col: str) -> str | None:
+    if col in TYPE_MAP:
+        return TYPE_MAP[col]
+    return next((t for prefix, t in PREFIX_TYPES if col.startswith(prefix)), None)
+
+
+def column_type(col: str, values: pd.Series) -> str:
+    """SQL type for `col`: its declared type (widened if the data needs it), else inferred."""
+    declared = declared_type(col)
+    nonnull = values.dropna()
+    if declared and _base(declared) in INT_TYPES:
+        nums = pd.to_numeric(nonnull, errors="coerce").dropna()
+        return _int_for(int(nums.min()), int(nums.max()), declared) if len(nums) else declared
+    if declared and _base(declared) == "VARCHAR":
+        return _varchar_for(_longest(nonnull), _varchar_len(declared))
+    if declared and _base(declared) == "ENUM" and not nonnull.astype(str).isin(_enum_values(declared)).all():
+        return _varchar_for(_longest(nonnull))       # unexpected label: keep it rather than fail strict mode
+    if declared:
+        return declared
+
+    if pd.api.types.is_bool_dtype(values):
+        return "TINYINT"
+    if pd.api.types.is_integer_dtype(values):
+        return _int_for(int(nonnull.min()), int(nonnull.max())) if len(nonnull) else "INT"
+    if pd.api.types.is_float_dtype(values):
+        return "DOUBLE"
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return "DATETIME"
+    return _varchar_for(_longest(nonnull))
+
+
+def column_types(cur, table: str) -> dict[str, str]:
+    """name -> SQL type of `table`'s columns, in table order (SHOW COLUMNS)."""
+    cur.execute(f"SHOW COLUMNS FROM `{table}`")
+    return {r[0]: (r[1].decode() if isinstance(r[1], bytes) else str(r[1])) for r in cur.fetchall()}
+
+
+def widen_clauses(existing: dict[str, str], incoming: dict[str, str]) -> list[str]:
+    """
+    ALTER clauses that let a table with columns `existing` take rows typed
+    `incoming` (both name -> SQL type): ADD for new columns, MODIFY to widen
+    integer and VARCHAR columns (or turn an ENUM into a VARCHAR when the
+    incoming type is not one of its labels). Never narrows.
+    """
+    clauses = []
+    for col, want in incoming.items():
+        have = existing.get(col)
+        if have is None:
+            clauses.append(f"ADD COLUMN `{col}` {want} NULL")
+            continue
+        hb, wb = _base(have), _base(want)
+        if hb in INT_TYPES and wb in INT_TYPES and list(INT_TYPES).index(wb) > list(INT_TYPES).index(hb):
+            clauses.append(f"MODIFY COLUMN `{col}` {want} NULL")
+        elif hb == "VARCHAR" and (wb == "TEXT" or _varchar_len(want) > _varchar_len(have)):
+            clauses.append(f"MODIFY COLUMN `{col}` {want} NULL")
+        elif hb == "VARCHAR" and wb == "ENUM" and max(map(len, _enum_values(want))) > _varchar_len(have):
+            clauses.append(f"MODIFY COLUMN `{col}` {_varchar_for(max(map(len, _enum_values(want))))} NULL")
+        elif hb == "ENUM" and wb in ("VARCHAR", "TEXT"):
+            width = max(_varchar_len(want), max(map(len, _enum_values(have))))
+            clauses.append(f"MODIFY COLUMN `{col}` {want if wb == 'TEXT' else _varchar_for(width)} NULL")
+        elif hb == "ENUM" and wb == "ENUM" and not set(_enum_values(want)) <= set(_enum_values(have)):
+            width = max(map(len, _enum_values(have) + _enum_values(want)))
+            clauses.append(f"MODIFY COLUMN `{col}` {_varchar_for(width)} NULL")
+    return clauses
+
+
+def append_clauses(existing: dict[str, str], df: pd.DataFrame) -> list[str]:
+    """`widen_clauses()` for the rows of `df` (types from `column_type()`)."""
+    return widen_clauses(existing, {col: column_type(col, df[col]) for col in df.columns})
+
+
+# --- in-place migration of existing tables -----------------------------------
+_INT_RE = "'^-?[0-9]+(\\\\.0+)?$'"
+_NUM_RE = "'^-?[0-9]*\\\\.?[0-9]+([eE][-+]?[0-9]+)?$'"
+
+
+def table_bytes(cur, table: str) -> int:
+    cur.execute(f"ANALYZE TABLE `{table}`")
+    cur.fetchall()
+    cur.execute("SELECT COALESCE(DATA_LENGTH,0) + COALESCE(INDEX_LENGTH,0) FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+def _probe(cur, table: str, cols: list[str]) -> dict[str, dict]:
+    """One scan: per column, values that are not integers / not numbers, min, max, longest."""
+    if not cols:
+        return {}
+    parts = []
+    for c in cols:
+        q = f"`{c}`"
+        parts += [f"SUM({q} IS NOT NULL AND {q} NOT REGEXP {_INT_RE})",
+                  f"SUM({q} IS NOT NULL AND {q} NOT REGEXP {_NUM_RE})",
+                  f"MIN(IF({q} REGEXP {_INT_RE}, CAST({q} AS DECIMAL(20,0)), NULL))",
+                  f"MAX(IF({q} REGEXP {_INT_RE}, CAST({q} AS DECIMAL(20,0)), NULL))",
+                  f"MAX(CHAR_LENGTH({q}))"]
+    cur.execute(f"SELECT {', '.join(parts)} FROM `{table}`")
+    row = cur.fetchone()
+    out = {}
+    for i, c in enumerate(cols):
+        bad_int, bad_num, lo, hi, longest = row[5 * i: 5 * i + 5]
+        out[c] = {"bad_int": int(bad_int or 0), "bad_num": int(bad_num or 0),
+                  "min": int(lo) if lo is not None else None, "max": int(hi) if hi is not None else None,
+                  "longest": int(longest or 0)}
+    return out
+
+
+def _enum_fits(cur, table: str, col: str, enum_type: str) -> bool:
+    values = _enum_values(enum_type)
+    cur.execute(f"SELECT COUNT(*) FROM `{table}` WHERE `{col}` IS NOT NULL AND `{col}` NOT IN "
+                f"({', '.join(['%s'] * len(values))})", tuple(values))
+    return int(cur.fetchone()[0]) == 0
+
+
+def _target(cur, table: str, col: str, have: str, probe: dict | None) -> tuple[str | None, str | None]:
+    """(new type or None, reason when a declared type could not be applied)."""
+    declared = declared_type(col)
+    hb = _base(have)
+    if declared and hb not in ("TEXT", "MEDIUMTEXT", "LONGTEXT", "VARCHAR"):
+        return None, None                          # already typed; leave it
+    if declared:
+        db = _base(declared)
+        if db in INT_TYPES:
+            if probe["bad_int"]:
+                return None, f"{probe['bad_int']} non-integer values"
+            if probe["min"] is None:
+                return declared, None
+            return _int_for(probe["min"], probe["max"], declared), None
+        if db in ("FLOAT", "DOUBLE"):
+            return (declared, None) if not probe["bad_num"] else (None, f"{probe['bad_num']} non-numeric values")
+        if db == "ENUM":
+            return (declared, None) if _enum_fits(cur, table, col, declared) else (None, "values outside the label set")
+        if db == "VARCHAR":
+            want = _varchar_for(probe["longest"], _varchar_len(declared))
+            return (want, None) if want != have.upper() else (None, None)
+        return None, None
+    if hb not in ("TEXT", "MEDIUMTEXT", "LONGTEXT") or probe is None:
+        return None, None
+    if probe["min"] is not None and not probe["bad_int"]:
+        return _int_for(probe["min"], probe["max"]), None
+    if probe["longest"] and not probe["bad_num"]:
+        return "DOUBLE", None
+    want = _varchar_for(probe["longest"])
+    return (want, None) if want != "TEXT" else (None, None)
+
+
+def migrate_table(cur, table: str, dry_run: bool = False) -> dict:
+    """Convert `table` to the compact schema in one ALTER; returns what changed and the size delta."""
+    cur.execute(f"SHOW COLUMNS FROM `{table}`")
+    columns = [(r[0], str(r[1].decode() if isinstance(r[1], bytes) else r[1]), str(r[5] or ""))
+               for r in cur.fetchall()]
+    plain = [(c, t) for c, t, extra in columns if "GENERATED" not in extra.upper() and c not in FILTER_COLUMNS]
+    textual = [c for c, t in plain if _base(t) in ("TEXT", "MEDIUMTEXT", "LONGTEXT", "VARCHAR")]
+    probes = _probe(cur, table, textual)
+
+    changes, skipped = {}, {}
+    for col, have in plain:
+        want, reason = _target(cur, table, col, have, probes.get(col))
+        if reason:
+            skipped[col] = reason
+        elif want and want.upper() != have.upper():
+            changes[col] = (have, want)
+
+    report = {"table": table, "changes": {c: f"{a} -> {b}" for c, (a, b) in changes.items()},
+              "skipped": skipped, "bytes_before": table_bytes(cur, table)}
+    if dry_run or not changes:
+        report["bytes_after"] = report["bytes_before"]
+    else:
+        cur.execute(f"ALTER TABLE `{table}` " +
+                    ", ".join(f"MODIFY COLUMN `{c}` {b} NULL" for c, (_, b) in changes.items()))
+        report["filter_columns_added"] = ensure_filter_columns(cur, table)
+        report["bytes_after"] = table_bytes(cur, table)
+    before, after = report["bytes_before"], report["bytes_after"]
+    report["reduction_pct"] = round(100.0 * (before - after) / before, 1) if before else 0.0
+    return report
+
+
+def migrate_tables(tables=None, dry_run: bool = False) -> list[dict]:
+    """`migrate_table()` over `tables` (default: every non-`app_` table), then refresh caches."""
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        if not tables:
+            cur.execute("SHOW TABLES")
+            tables = sorted(r[0] for r in cur.fetchall() if not str(r[0]).startswith("app_"))
+        reports = [migrate_table(cur, t, dry_run=dry_run) for t in tables]
+        conn.commit()
+    finally:
+        cur.close(); conn.close()
+    for r in reports:
+        if r["changes"] and not dry_run:
+            get_catalog().invalidate(r["table"])
+            try: bump_data_version(r["table"])
+            except Exception: pass
+            get_response_cache().invalidate(r["table"])
+    return reports
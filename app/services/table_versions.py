@@ -0,0 +1,107 @@
+# app/services/table_versions.py
+"""
+Per-table data versions, persisted in `app_table_versions`.
+
+Each row holds a version that only ever goes up, plus the row count, latest
+DATE_COMMITTED and a content hash taken when the version moved. Writers
+(ingest, save, delete) call `bump()`; readers get the current version with
+one primary-key lookup, so every cache layer can key on it cheaply.
+"""
+import hashlib
+from ..extensions import get_db_connection, ensure_app_table
+from .catalog import get_catalog
+
+VERSIONS_TABLE = "app_table_versions"
+
+_DDL = f"""
+CREATE TABLE IF NOT EXISTS `{VERSIONS_TABLE}` (
+  `TABLE_NAME` VARCHAR(64) NOT NULL,
+  `VERSION` BIGINT UNSIGNED NOT NULL,
+  `ROW_COUNT` BIGINT NOT NULL DEFAULT 0,
+  `MAX_DATE` DATETIME NULL,
+  `CONTENT_HASH` CHAR(16) NULL,
+  `UPDATED_AT` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`TABLE_NAME`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def _ensure(cur):
+    ensure_app_table(cur, VERSIONS_TABLE, _DDL)
+
+
+def _measure(cur, table: str) -> tuple[int, str | None, str | None]:
+    """(rows, max DATE_COMMITTED, content hash) of `table`; zeros once it is gone."""
+    try:
+        cur.execute(f"SELECT COUNT(*), MAX(`DATE_COMMITTED`) FROM `{table}`")
+        rows, max_date = cur.fetchone()
+        cur.execute(f"CHECKSUM TABLE `{table}`")
+        row = cur.fetchone()
+        checksum = row[1] if row else None
+    except Exception:
+        return 0, None, None
+    max_date = str(max_date) if max_date is not None else None
+    raw = f"{table}|{int(rows or 0)}|{max_date}|{checksum}"
+    return int(rows or 0), max_date, hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _as_dict(row) -> dict:
+    version, rows, max_date, content_hash = row
+    return {
+        "version": f"{int(version)}.{content_hash or '0'}",
+        "seq": int(version),
+        "rows": int(rows or 0),
+        "max_date": str(max_date) if max_date is not None else None,
+        "content_hash": content_hash,
+    }
+
+
+def bump(table: str) -> dict:
+    """Re-measure `table` and move its version forward (call after every write)."""
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        _ensure(cur)
+        rows, max_date, content_hash = _measure(cur, table)
+        cur.execute(
+            f"INSERT INTO `{VERSIONS_TABLE}` (`TABLE_NAME`, `VERSION`, `ROW_COUNT`, `MAX_DATE`, `CONTENT_HASH`) "
+            f"VALUES (%s, 1, %s, %s, %s) "
+            f"ON DUPLICATE KEY UPDATE `VERSION` = `VERSION` + 1, `ROW_COUNT` = VALUES(`ROW_COUNT`), "
+            f"`MAX_DATE` = VALUES(`MAX_DATE`), `CONTENT_HASH` = VALUES(`CONTENT_HASH`)",
+            (table, rows, max_date, content_hash),
+        )
+        conn.commit()
+        cur.execute(f"SELECT `VERSION`, `ROW_COUNT`, `MAX_DATE`, `CONTENT_HASH` FROM `{VERSIONS_TABLE}` "
+                    f"WHERE `TABLE_NAME` = %s", (table,))
+        return _as_dict(cur.fetchone())
+    finally:
+        cur.close(); conn.close()
+
+
+def read(table: str) -> dict:
+    """
+    Current version of `table`. A table written before versioning existed is
+    registered now; a name that is not a table gets version "0.0", unstored.
+    """
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        _ensure(cur)
+        cur.execute(f"SELECT `VERSION`, `ROW_COUNT`, `MAX_DATE`, `CONTENT_HASH` FROM `{VERSIONS_TABLE}` "
+                    f"WHERE `TABLE_NAME` = %s", (table,))
+        row = cur.fetchone()
+    finally:
+        cur.close(); conn.close()
+    if row:
+        return _as_dict(row)
+    return bump(table) if get_catalog().has_table(table) else _as_dict((0, 0, None, None))
+
+
+def read_all() -> list[dict]:
+    conn = get_db_connection(); cur = conn.cursor()
+    try:
+        _ensure(cur)
+        cur.execute(f"SELECT `TABLE_NAME`, `VERSION`, `ROW_COUNT`, `MAX_DATE`, `CONTENT_HASH` "
+                    f"FROM `{VERSIONS_TABLE}` ORDER BY `TABLE_NAME`")
+        rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    return [{"table": r[0], **_as_dict(r[1:])} for r in rows]
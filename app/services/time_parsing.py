@@ -0,0 +1,202 @@
+# app/services/time_parsing.py
+"""
+Column-wise time normalization for ingest.
+
+`to_pytime()` and `extract_hour()` give exactly what the old per-row
+`_to_pytime` / `_extract_hour` gave (kept below as `pytime_scalar` /
+`hour_scalar`), but classify the column's value kinds once and handle each
+kind in bulk: time and datetime objects by attribute, timedeltas and numbers
+with array arithmetic, and strings once per distinct value, canonical
+"H:MM[:SS]" ones with one regex pass. Whatever is left (odd strings, dates,
+bools) goes through the scalar rules once per distinct value.
+"""
+import datetime
+from datetime import time, timedelta
+import numpy as np
+import pandas as pd
+
+MISSING, TIME, DATETIME, TIMEDELTA, NUMBER, BOOL, STRING, OTHER = range(8)
+
+# H:MM:SS parses as a timedelta (hours wrap past 24); H:MM only via the date guesser (hours <= 23)
+_HMS = r"^(\d{1,2}):([0-5]\d)(?::([0-5]\d))?$"
+
+
+# --- the per-value rules (reference semantics) --------------------------------
+def pytime_scalar(x):
+    if pd.isna(x):
+        return None
+    if isinstance(x, time):
+        return x
+    if isinstance(x, timedelta):
+        total = int(x.total_seconds())
+        return time((total // 3600) % 24, (total % 3600) // 60, total % 60)
+    td = pd.to_timedelta(x, errors="coerce")
+    if not pd.isna(td):
+        total = int(td.total_seconds())
+        return time((total // 3600) % 24, (total % 3600) // 60, total % 60)
+    ts = pd.to_datetime(x, format="%H:%M:%S", errors="coerce")
+    if not pd.isna(ts):
+        return ts.time()
+    ts2 = pd.to_datetime(x, errors="coerce")
+    if not pd.isna(ts2):
+        return ts2.time()
+    return None
+
+
+def hour_scalar(val):
+    if pd.isna(val):
+        return np.nan
+    if isinstance(val, datetime.time):
+        return val.hour
+    if isinstance(val, (pd.Timestamp, datetime.datetime)):
+        return val.hour
+    if isinstance(val, (int, float, np.integer, np.floating)):
+        try:
+            if np.isnan(val):  # type: ignore[arg-type]
+                return np.nan
+        except Exception:
+            pass
+        return int(val) if 0 <= int(val) <= 23 else np.nan
+    if isinstance(val, str):
+        ts = pd.to_datetime(val, errors="coerce", format="%H:%M:%S")
+        if pd.isna(ts):
+            ts = pd.to_datetime(val, errors="coerce")
+        return ts.hour if not pd.isna(ts) else np.nan
+    return np.nan
+
+
+# --- classification -----------------------------------------------------------
+_KIND_BY_TYPE: dict[type, int] = {}
+
+
+def _kind_of_type(t: type) -> int:
+    kind = _KIND_BY_TYPE.get(t)
+    if kind is None:
+        if issubclass(t, time):
+            kind = TIME
+        elif issubclass(t, datetime.datetime):      # before date: datetime is a date
+            kind = DATETIME
+        elif issubclass(t, timedelta):
+            kind = TIMEDELTA
+        elif issubclass(t, (bool, np.bool_)):
+            kind = BOOL
+        elif issubclass(t, (int, float, np.integer, np.floating)):
+            kind = NUMBER
+        elif issubclass(t, str):
+            kind = STRING
+        else:
+            kind = OTHER
+        _KIND_BY_TYPE[t] = kind
+    return kind
+
+
+def classify(values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+    """Kind code per element of an object array."""
+    kinds = np.fromiter((_kind_of_type(type(v)) for v in values), dtype=np.int8, count=len(values))
+    kinds[missing] = MISSING
+    return kinds
+
+
+def _per_distinct(values: np.ndarray, rule) -> list:
+    memo = {}
+    out = []
+    for v in values:
+        key = (type(v), v)              # 1, 1.0 and True must not share an entry
+        try:
+            if key not in memo:
+                memo[key] = rule(v)
+            out.append(memo[key])
+        except TypeError:               # unhashable
+            out.append(rule(v))
+    return out
+
+
+def _hms(strings: np.ndarray) -> pd.DataFrame:
+    """h, m, s (NaN when absent) for strings matching H:MM[:SS]; rows that do not match are all NaN."""
+    parts = pd.Series(strings, dtype=object).str.extract(_HMS)
+    return parts.apply(pd.to_numeric)
+
+
+def _clock(total: np.ndarray) -> np.ndarray:
+    """Whole seconds -> time objects, with the old modular arithmetic (negatives wrap)."""
+    total = np.asarray(total).astype(np.int64) % 86400
+    seconds, codes = np.unique(total, return_inverse=True)   # at most 86400 distinct clocks
+    clocks = np.empty(len(seconds), dtype=object)
+    clocks[:] = [time(int(t) // 3600, int(t) % 3600 // 60, int(t) % 60) for t in seconds]
+    return clocks[codes]
+
+
+# --- public -------------------------------------------------------------------
+def to_pytime(s: pd.Series) -> pd.Series:
+    """`s.apply(pytime_scalar)`, column-wise: datetime.time objects or None."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        out = s.dt.time.astype(object)
+        return out.where(s.notna(), None)
+    values = s.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    kinds = classify(values, missing)
+    out = np.full(len(values), None, dtype=object)
+
+    idx = np.flatnonzero(kinds == TIME)
+    out[idx] = values[idx]
+
+    idx = np.flatnonzero(kinds == DATETIME)
+    out[idx] = [v.time() for v in values[idx]]
+
+    idx = np.flatnonzero(kinds == TIMEDELTA)
+    if len(idx):
+        out[idx] = _clock(np.array([int(v.total_seconds()) for v in values[idx]], dtype=np.int64))
+
+    idx = np.flatnonzero(kinds == NUMBER)
+    if len(idx):
+        # a bare number is a nanosecond count to pd.to_timedelta
+        td = pd.to_timedelta(pd.Series(values[idx], dtype="float64"), unit="ns", errors="coerce")
+        ok = td.notna().to_numpy()
+        out[idx[ok]] = _clock(np.trunc(td[ok].dt.total_seconds().to_numpy()))
+
+    idx = np.flatnonzero(kinds == STRING)
+    if len(idx):
+        codes, uniques = pd.factorize(values[idx])        # clock strings repeat a lot
+        parsed = np.full(len(uniques), None, dtype=object)
+        hms = _hms(uniques)
+        h, m, sec = (hms[i].to_numpy() for i in range(3))
+        full = ~np.isnan(sec)                              # H:MM:SS
+        short = np.isnan(sec) & ~np.isnan(h) & (h <= 23)   # H:MM
+        fast = full | short
+        parsed[fast] = _clock(h[fast] * 3600 + m[fast] * 60 + np.nan_to_num(sec[fast]))
+        parsed[~fast] = [pytime_scalar(v) for v in uniques[~fast]]
+        out[idx] = parsed[codes]
+
+    idx = np.flatnonzero((kinds == BOOL) | (kinds == OTHER))
+    if len(idx):
+        out[idx] = _per_distinct(values[idx], pytime_scalar)
+    return pd.Series(out, index=s.index, dtype=object, name=s.name)
+
+
+def extract_hour(s: pd.Series) -> pd.Series:
+    """`s.apply(hour_scalar)`, column-wise: float hours 0–23 or NaN."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.hour.astype("float64")
+    values = s.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    kinds = classify(values, missing)
+    out = np.full(len(values), np.nan)
+
+    idx = np.flatnonzero((kinds == TIME) | (kinds == DATETIME))
+    out[idx] = [v.hour for v in values[idx]]
+
+    idx = np.flatnonzero((kinds == NUMBER) | (kinds == BOOL))
+    if len(idx):
+        hours = np.trunc(values[idx].astype("float64"))
+        hours[(hours < 0) | (hours > 23)] = np.nan
+        out[idx] = hours
+
+    idx = np.flatnonzero(kinds == STRING)
+    if len(idx):
+        codes, uniques = pd.factorize(values[idx])
+        h = _hms(uniques)[0].to_numpy(dtype="float64", copy=True)
+        fast = ~np.isnan(h) & (h <= 23)    # both shapes parse to their hour when it is a clock hour
+        h[~fast] = [hour_scalar(v) for v in uniques[~fast]]
+        out[idx] = h[codes]
+    # timedeltas, dates and other objects have no hour
+    return pd.Series(out, index=s.index, name=s.name)
@@ -1249,15 +1249,21 @@ async function submitUpload() {
     await new Promise((r) => setTimeout(r, 1000));
 
     const res = await fetch("/api/upload_files", { method: "POST", body: fd });
-    const out = await res.json();
+    let out = await res.json();
 
     if (!res.ok || !out.success) {
       throw new Error(out.message || "Upload failed.");
     }
 
-    // show preprocessing stage
-    setStep("preprocess");
-    await new Promise((r) => setTimeout(r, 1000));
+    if (out.job_id) {
+      // processed in the background: follow the job until it finishes
+      const job = await pollIngestJob(out.job_id, showJobProgress);
+      out = { ...out, message: job.message };
+    } else {
+      // show preprocessing stage
+      setStep("preprocess");
+      await new Promise((r) => setTimeout(r, 1000));
+    }
 
     // show complete stage
     setStep("complete");
@@ -1278,6 +1284,68 @@ async function submitUpload() {
   }
 }
 
+// --- Background ingest jobs (/api/jobs/<id>)
+const JOB_POLL_MS = 1000;
+const JOB_STAGE_STEPS = {
+  queued: "merge",
+  starting: "merge",
+  reading: "merge",
+  indexing: "merge",
+  merging: "merge",
+  preprocessing: "preprocess",
+  clustering: "preprocess",
+  writing: "preprocess",
+  done: "complete",
+};
+const JOB_STAGE_LABELS = {
+  queued: "Waiting for a free worker…",
+  starting: "Starting…",
+  reading: "Reading files…",
+  indexing: "Indexing vehicle records…",
+  merging: "Merging files…",
+  preprocessing: "Preprocessing…",
+  clustering: "Finding hotspots…",
+  writing: "Saving to the database…",
+  done: "Done.",
+};
+
+async function pollIngestJob(jobId, onUpdate) {
+  // resolves with the finished job, rejects when it fails
+  let misses = 0;
+  for (;;) {
+    let out = null;
+    try {
+      const res = await fetch(`/api/jobs/${encodeURIComponent(jobId)}`, {
+        cache: "no-store",
+      });
+      out = await res.json();
+      if (!res.ok || !out.success) {
+        throw new Error(out.message || `Job status failed (HTTP ${res.status}).`);
+      }
+    } catch (err) {
+      if (++misses >= 5) throw err; // a few network blips / server errors are fine
+      out = null;
+    }
+    if (out) {
+      misses = 0;
+      const job = out.job;
+      onUpdate?.(job);
+      if (job.state === "done") return job;
+      if (job.state === "failed") throw new Error(job.error || "Processing failed.");
+    }
+    await new Promise((r) => setTimeout(r, JOB_POLL_MS));
+  }
+}
+
+function showJobProgress(job) {
+  if (JOB_STAGE_STEPS[job.stage]) setStep(JOB_STAGE_STEPS[job.stage]);
+  const parts = [JOB_STAGE_LABELS[job.stage] || job.stage];
+  if (job.rows_processed) parts.push(`${Number(job.rows_processed).toLocaleString()} rows`);
+  if (job.rows_per_sec) parts.push(`${Math.round(job.rows_per_sec).toLocaleString()} rows/s`);
+  const note = document.getElementById("pbNote");
+  if (note) note.textContent = parts.join(" · ");
+}
+
 function getFileHeaders(file) {
   return new Promise((resolve, reject) => {
     const reader = new FileReader();
@@ -99,7 +99,13 @@ function applyFilters() {
   const baseUrl = document.getElementById("map-endpoint").dataset.url;
 
   const iframe = document.querySelector(".map-frame");
-  iframe.src = `${baseUrl}?${params.toString()}`;
+  // Keep the loaded base map and swap only its markers when we can
+  const frameWin = iframe.contentWindow;
+  if (frameWin && typeof frameWin.loadHotspots === "function") {
+    frameWin.loadHotspots(params.toString());
+  } else {
+    iframe.src = `${baseUrl}?${params.toString()}`;
+  }
 
   closeFilterModal && closeFilterModal();
 }
@@ -306,10 +312,14 @@ function clearFilters() {
     timeEl.textContent = timeFmt.format(now).toLowerCase();
   }
 
-  // 3) Reset the map iframe to the base URL (no params)
+  // 3) Reset the map markers to the default (no params)
   const baseUrl = document.getElementById("map-endpoint")?.dataset?.url;
   const iframe = document.querySelector(".map-frame");
-  if (baseUrl && iframe) iframe.src = baseUrl;
+  if (baseUrl && iframe) {
+    const frameWin = iframe.contentWindow;
+    if (frameWin && typeof frameWin.loadHotspots === "function") frameWin.loadHotspots("");
+    else iframe.src = baseUrl;
+  }
 
   // 4) Close the modal
   typeof closeFilterModal === "function" && closeFilterModal();
@@ -135,13 +135,7 @@ function applyFilters() {
   );
 
   // Reload the charts/cards
-  loadHourlyChart(currentFilters);
-  loadDayOfWeekChart(currentFilters);
-  loadTopBarangaysChart(currentFilters);
-  loadAlcoholByHourChart(currentFilters);
-  loadVictimsByAgeChart(currentFilters);
-  loadGenderChart(currentFilters);
-  if (typeof loadKpiCards === "function") loadKpiCards(currentFilters);
+  loadDashboard(currentFilters);
 
   closeFilterModal();
 }
@@ -432,6 +426,63 @@ document.addEventListener("keydown", function (event) {
   }
 });
 
+// Query string for the current filters (shared by every chart endpoint)
+function filterParams(filters) {
+  const params = new URLSearchParams();
+  if (filters.location) params.set("location", filters.location);
+  if (filters.gender) params.set("gender", filters.gender);
+  if (filters.dayOfWeek?.length)
+    params.set("day_of_week", filters.dayOfWeek.join(","));
+  if (filters.alcohol?.length)
+    params.set("alcohol", filters.alcohol.join(","));
+  if (Number.isFinite(filters.hourFrom))
+    params.set("hour_from", String(filters.hourFrom));
+  if (Number.isFinite(filters.hourTo))
+    params.set("hour_to", String(filters.hourTo));
+  if (Number.isFinite(filters.ageFrom))
+    params.set("age_from", String(filters.ageFrom));
+  if (Number.isFinite(filters.ageTo))
+    params.set("age_to", String(filters.ageTo));
+  return params;
+}
+
+async function fetchChart(name, filters) {
+  const res = await fetch(`/api/${name}?${filterParams(filters).toString()}`);
+  return res.json();
+}
+
+// Bundle key -> loader; each loader renders the payload it is handed
+const CHART_LOADERS = {
+  accidents_by_hour: loadHourlyChart,
+  accidents_by_day: loadDayOfWeekChart,
+  top_barangays: loadTopBarangaysChart,
+  alcohol_by_hour: loadAlcoholByHourChart,
+  victims_by_age: loadVictimsByAgeChart,
+  gender_proportion: loadGenderChart,
+  kpis: loadKpiCards,
+};
+
+// One request for every chart and KPI card; falls back to per-chart fetches
+let dashboardRequest = 0;
+async function loadDashboard(filters = currentFilters) {
+  const requestId = ++dashboardRequest;
+  let bundle = null;
+  try {
+    const res = await fetch(
+      `/api/dashboard_bundle?${filterParams(filters).toString()}`
+    );
+    const j = await res.json();
+    if (j.success && j.data) bundle = j.data;
+  } catch (e) {
+    console.error(e);
+  }
+  if (requestId !== dashboardRequest) return; // a newer filter change won
+  for (const [name, loader] of Object.entries(CHART_LOADERS)) {
+    if (bundle && bundle[name]) loader(filters, bundle[name]);
+    else loader(filters);
+  }
+}
+
 function showNoData(elId, msg) {
   const host = document.getElementById(elId);
   host.innerHTML = `
@@ -445,27 +496,9 @@ function showNoData(elId, msg) {
     </div>`;
 }
 
-async function loadHourlyChart(filters = currentFilters) {
+async function loadHourlyChart(filters = currentFilters, payload = null) {
   try {
-    // Build querystring
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/accidents_by_hour?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("accidents_by_hour", filters));
     if (!j.success || !j.data) {
       showNoData("hourlyBar", j.message || "No data available.");
       return;
@@ -501,7 +534,7 @@ async function loadHourlyChart(filters = currentFilters) {
     const ymax = Math.max(...counts);
     const layout = {
       margin: { l: 60, r: 10, t: 10, b: 40 },
-      xaxis: { title: "Hour of Day (0–23)" },
+      xaxis: { title: "Hour of Day (0–23)", type: "category" }, // keeps 22, 23, 00, 01 in window order
       yaxis: {
         title: { text: "Count of Accidents", standoff: 40 },
         gridcolor: "rgba(0,0,0,0.1)",
@@ -530,34 +563,13 @@ document.addEventListener("DOMContentLoaded", () => {
   // Set initial cards (optional)
   updateGraphCards({ location: "", gender: "", ageFrom: "", ageTo: "" });
 
-  // First paint
-  loadHourlyChart();
+  // First paint: every chart from one request
+  loadDashboard();
 });
 
-// Load on page ready
-document.addEventListener("DOMContentLoaded", loadHourlyChart);
-
-async function loadDayOfWeekChart(filters = currentFilters) {
+async function loadDayOfWeekChart(filters = currentFilters, payload = null) {
   try {
-    // Build querystring from current filters (same pattern as loadHourlyChart)
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/accidents_by_day?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("accidents_by_day", filters));
     if (!j.success || !j.data) {
       showNoData("dayOfWeekCombo", j.message || "No data available.");
       return;
@@ -635,28 +647,9 @@ async function loadDayOfWeekChart(filters = currentFilters) {
   }
 }
 
-document.addEventListener("DOMContentLoaded", loadDayOfWeekChart);
-
-async function loadTopBarangaysChart(filters = currentFilters) {
+async function loadTopBarangaysChart(filters = currentFilters, payload = null) {
   try {
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/top_barangays?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("top_barangays", filters));
     if (
       !j.success ||
       !j.data ||
@@ -706,33 +699,10 @@ async function loadTopBarangaysChart(filters = currentFilters) {
   }
 }
 
-// add to your existing on-load hooks
-document.addEventListener("DOMContentLoaded", () => {
-  // ...your other loaders
-  loadTopBarangaysChart();
-});
-
 // replace the old function
-async function loadAlcoholByHourChart(filters = currentFilters) {
+async function loadAlcoholByHourChart(filters = currentFilters, payload = null) {
   try {
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/alcohol_by_hour?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("alcohol_by_hour", filters));
     if (!j.success || !j.data) {
       showNoData("alcoholByHour", j.message || "No data available.");
       return;
@@ -796,32 +766,9 @@ async function loadAlcoholByHourChart(filters = currentFilters) {
   }
 }
 
-// Add to your on-load hooks
-document.addEventListener("DOMContentLoaded", () => {
-  // ...existing initializers and chart loaders...
-  loadAlcoholByHourChart();
-});
-
-async function loadVictimsByAgeChart(filters = currentFilters) {
+async function loadVictimsByAgeChart(filters = currentFilters, payload = null) {
   try {
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/victims_by_age?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("victims_by_age", filters));
 
     if (!j.success || !j.data || !j.data.labels?.length) {
       showNoData("victimsByAge", j.message || "No data available.");
@@ -863,32 +810,9 @@ async function loadVictimsByAgeChart(filters = currentFilters) {
   }
 }
 
-// hook it up with others
-document.addEventListener("DOMContentLoaded", () => {
-  // ...your other initializers...
-  loadVictimsByAgeChart();
-});
-
-async function loadGenderChart(filters = currentFilters) {
+async function loadGenderChart(filters = currentFilters, payload = null) {
   try {
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/gender_proportion?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("gender_proportion", filters));
     if (!j.success || !j.data || !j.data.labels?.length) {
       showNoData("genderPie", j.message || "No data available.");
       return;
@@ -925,31 +849,9 @@ async function loadGenderChart(filters = currentFilters) {
   }
 }
 
-document.addEventListener("DOMContentLoaded", () => {
-  // ...existing initializers and chart loaders...
-  loadGenderChart();
-});
-
-async function loadKpiCards(filters = currentFilters) {
+async function loadKpiCards(filters = currentFilters, payload = null) {
   try {
-    const params = new URLSearchParams();
-    if (filters.location) params.set("location", filters.location);
-    if (filters.gender) params.set("gender", filters.gender);
-    if (filters.dayOfWeek?.length)
-      params.set("day_of_week", filters.dayOfWeek.join(","));
-    if (filters.alcohol?.length)
-      params.set("alcohol", filters.alcohol.join(","));
-    if (Number.isFinite(filters.hourFrom))
-      params.set("hour_from", String(filters.hourFrom));
-    if (Number.isFinite(filters.hourTo))
-      params.set("hour_to", String(filters.hourTo));
-    if (Number.isFinite(filters.ageFrom))
-      params.set("age_from", String(filters.ageFrom));
-    if (Number.isFinite(filters.ageTo))
-      params.set("age_to", String(filters.ageTo));
-
-    const res = await fetch(`/api/kpis?${params.toString()}`);
-    const j = await res.json();
+    const j = payload || (await fetchChart("kpis", filters));
 
     // Fallback to em dashes if no data
     const accEl = document.getElementById("kpiAccidents");
@@ -1001,11 +903,6 @@ async function loadKpiCards(filters = currentFilters) {
   }
 }
 
-document.addEventListener("DOMContentLoaded", () => {
-  // ... your initializers ...
-  loadKpiCards(); // initial load (no constraints)
-});
-
 // Clear all filters and reset UI
 function clearFilters() {
   // Reset text inputs/selects
@@ -1048,13 +945,7 @@ function clearFilters() {
   updateGraphCards({ location: "", gender: "", ageFrom: "", ageTo: "" });
 
   // Reload charts with cleared filters
-  loadHourlyChart(currentFilters);
-  loadDayOfWeekChart(currentFilters);
-  loadTopBarangaysChart(currentFilters);
-  loadAlcoholByHourChart(currentFilters);
-  loadVictimsByAgeChart(currentFilters);
-  loadGenderChart(currentFilters);
-  if (typeof loadKpiCards === "function") loadKpiCards(currentFilters);
+  loadDashboard(currentFilters);
 
   // Close modal
   closeFilterModal();
@@ -0,0 +1,134 @@
+"""
+Hotspot map feature building + rollout: the old long-frame pipeline (full
+grid merge, groupby shift/rolling, idxmax) vs the dense hotspot × month
+NumPy engine. Both produce the same training matrix and forecasts.
+
+    python benchmarks/bench_hotspot_features.py [--hotspots 2000] [--years 8] [--horizon 12]
+"""
+import argparse, os, sys, time
+import numpy as np, pandas as pd
+from xgboost import XGBRegressor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.forecasting import WINDOW_FEATURES, _dense_counts, _lag_features
+
+
+def synthetic_cube(hotspots: int, years: int, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    months = pd.date_range("2016-01-31", periods=years * 12, freq="ME")
+    hs = np.repeat(np.arange(-1, hotspots - 1), len(months))
+    me = np.tile(months.to_numpy(), hotspots)
+    cube = pd.DataFrame({"ACCIDENT_HOTSPOT": hs, "MONTH_END": me,
+                         "ACCIDENT_COUNT": rng.poisson(2.0, len(hs))})
+    cube = cube[cube["ACCIDENT_COUNT"] > 0].reset_index(drop=True)
+    cube["MIN_DATE"] = cube["MONTH_END"] - pd.offsets.MonthBegin(1)
+    cube["MAX_DATE"] = cube["MONTH_END"]
+    return cube
+
+
+def legacy_features(cube: pd.DataFrame):
+    """The pre-matrix long-frame construction, kept verbatim for comparison."""
+    ts_counts = (cube.groupby(["ACCIDENT_HOTSPOT", "MONTH_END"])["ACCIDENT_COUNT"].sum()
+                 .to_frame("accident_count").reset_index()
+                 .rename(columns={"MONTH_END": "DATE_COMMITTED"}))
+    all_clusters = pd.DataFrame({"ACCIDENT_HOTSPOT": cube["ACCIDENT_HOTSPOT"].unique()})
+    month_range = pd.date_range(cube["MIN_DATE"].min(), cube["MAX_DATE"].max(), freq="ME")
+    full_grid = pd.MultiIndex.from_product(
+        [all_clusters["ACCIDENT_HOTSPOT"], month_range], names=["ACCIDENT_HOTSPOT", "DATE_COMMITTED"]
+    ).to_frame(index=False)
+    ts_data = (pd.merge(full_grid, ts_counts, on=["ACCIDENT_HOTSPOT", "DATE_COMMITTED"], how="left")
+               .fillna({"accident_count": 0})
+               .sort_values(["ACCIDENT_HOTSPOT", "DATE_COMMITTED"]).reset_index(drop=True))
+    ts_data["lag_1_month"] = ts_data.groupby("ACCIDENT_HOTSPOT")["accident_count"].shift(1)
+    ts_data["rolling_mean_3_months"] = ts_data.groupby("ACCIDENT_HOTSPOT")["accident_count"].shift(1).rolling(window=3).mean()
+    ts_data["month_of_year"] = ts_data["DATE_COMMITTED"].dt.month
+    ts_data["quarter_of_year"] = ts_data["DATE_COMMITTED"].dt.quarter
+    ts_data = ts_data.dropna().reset_index(drop=True)
+    return ts_data
+
+
+def legacy_rollout(model, ts_data: pd.DataFrame, horizon: int) -> np.ndarray:
+    last_known_month = ts_data["DATE_COMMITTED"].max()
+    cur = ts_data.loc[ts_data.groupby("ACCIDENT_HOTSPOT")["DATE_COMMITTED"].idxmax()].copy()
+    for need in ["lag_1_month", "lag_2_month", "lag_3_month"]:
+        if need not in cur.columns:
+            cur[need] = 0.0
+    out = []
+    for i in range(horizon):
+        preds = model.predict(cur[WINDOW_FEATURES])
+        out.append(preds)
+        cur["lag_3_month"] = cur["lag_2_month"]
+        cur["lag_2_month"] = cur["lag_1_month"]
+        cur["lag_1_month"] = preds
+        cur["rolling_mean_3_months"] = cur[["lag_1_month", "lag_2_month", "lag_3_month"]].mean(axis=1)
+        nm = last_known_month + pd.DateOffset(months=i + 2)
+        cur["month_of_year"] = nm.month
+        cur["quarter_of_year"] = nm.quarter
+    return np.sum(out, axis=0)
+
+
+def dense_features(cube: pd.DataFrame):
+    hotspots = np.unique(cube["ACCIDENT_HOTSPOT"].to_numpy())
+    months = pd.date_range(cube["MIN_DATE"].min(), cube["MAX_DATE"].max(), freq="ME")
+    rows = np.searchsorted(hotspots, cube["ACCIDENT_HOTSPOT"].to_numpy())
+    C = _dense_counts(rows, cube["MONTH_END"], cube["ACCIDENT_COUNT"], len(hotspots), months)
+    feats = _lag_features(C, months)
+    X = pd.DataFrame({"ACCIDENT_HOTSPOT": np.repeat(hotspots, len(months) - 3),
+                      **{k: feats[k] for k in WINDOW_FEATURES[1:]}})
+    return hotspots, months, C, X, feats["y"]
+
+
+def dense_rollout(model, hotspots, months, C, horizon: int) -> np.ndarray:
+    last_known_month = months[-1]
+    X = np.empty((len(hotspots), len(WINDOW_FEATURES)))
+    X[:, 0] = hotspots; X[:, 1] = C[:, -2]; X[:, 2] = C[:, -4:-1].mean(axis=1)
+    X[:, 3] = last_known_month.month; X[:, 4] = last_known_month.quarter
+    frame = pd.DataFrame(X, columns=WINDOW_FEATURES, copy=False)
+    lag2 = np.zeros(len(hotspots)); lag3 = np.zeros(len(hotspots))
+    total = np.zeros(len(hotspots))
+    for i in range(horizon):
+        preds = model.predict(frame)
+        total += preds
+        lag3, lag2 = lag2, frame["lag_1_month"].to_numpy(copy=True)
+        frame["lag_1_month"] = preds
+        frame["rolling_mean_3_months"] = (preds + lag2 + lag3) / 3
+        nm = last_known_month + pd.DateOffset(months=i + 2)
+        frame["month_of_year"] = nm.month
+        frame["quarter_of_year"] = nm.quarter
+    return total
+
+
+def best_of(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter(); out = fn(); best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hotspots", type=int, default=2000)
+    ap.add_argument("--years", type=int, default=8)
+    ap.add_argument("--horizon", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    cube = synthetic_cube(args.hotspots, args.years)
+    print(f"{args.hotspots} hotspots x {args.years * 12} months, {len(cube):,} cube cells")
+
+    t_old, ts_data = best_of(lambda: legacy_features(cube), args.repeat)
+    t_new, (hotspots, months, C, X, y) = best_of(lambda: dense_features(cube), args.repeat)
+    assert np.allclose(ts_data[WINDOW_FEATURES].to_numpy(float), X.to_numpy(float))
+    assert np.array_equal(ts_data["accident_count"].to_numpy(), y)
+    print(f"features  long-frame {t_old*1000:8.1f} ms   dense {t_new*1000:8.1f} ms   ({t_old/t_new:.1f}x)")
+
+    model = XGBRegressor(objective="count:poisson", n_estimators=50, max_depth=4, random_state=42)
+    model.fit(X, y)
+    t_old, a = best_of(lambda: legacy_rollout(model, ts_data, args.horizon), args.repeat)
+    t_new, b = best_of(lambda: dense_rollout(model, hotspots, months, C, args.horizon), args.repeat)
+    assert np.allclose(a, b)
+    print(f"rollout   long-frame {t_old*1000:8.1f} ms   dense {t_new*1000:8.1f} ms   ({t_old/t_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Hotspot ids for an append: re-clustering the whole table (what reprocessing
+costs) against the incremental update of `hotspot_index` over the batch's
+neighbourhood. The neighbourhood lookup that MySQL answers from the
+(SOURCE_TABLE, CELL_LAT, CELL_LON) key is done in pandas here. Also checks
+that both give the same core points and the same core-point partition.
+
+    python benchmarks/bench_hotspot_index.py [--rows 500000] [--batch 5000]
+"""
+import argparse, os, sys, time
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.hotspot_index import (hotspot_clusters, weighted_points, incremental_plan,
+                                        _cells, _cell_ranges)
+
+
+def synthetic_rows(rows: int, rng) -> pd.DataFrame:
+    centers = np.c_[15.0 + rng.random(400) * 0.3, 120.5 + rng.random(400) * 0.3]
+    pick = rng.integers(0, len(centers), rows)
+    spread = np.where(rng.random(rows) < 0.7, 0.0002, 0.05)          # clustered + scattered accidents
+    return pd.DataFrame({"LATITUDE": np.round(centers[pick, 0] + rng.normal(0, 1, rows) * spread, 5),
+                         "LONGITUDE": np.round(centers[pick, 1] + rng.normal(0, 1, rows) * spread, 5)})
+
+
+def neighbourhood(index: pd.DataFrame, batch: pd.DataFrame) -> pd.DataFrame:
+    ranges = _cell_ranges(batch)
+    hit = index.merge(ranges, on="CELL_LAT")
+    hit = hit[(hit["CELL_LON"] >= hit["LON_FROM"]) & (hit["CELL_LON"] <= hit["LON_TO"])]
+    return hit[["LAT", "LON", "WEIGHT", "HOTSPOT", "CORE"]].astype({"CORE": bool}).reset_index(drop=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--batch", type=int, default=5_000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(5)
+    table, batch = synthetic_rows(args.rows, rng), synthetic_rows(args.batch, rng)
+
+    # the persisted index as the earlier uploads left it
+    old = weighted_points(table)
+    labels, core = hotspot_clusters(old[["LAT", "LON"]], old["N"].to_numpy(dtype="float64"))
+    cell_lat, cell_lon = _cells(old["LAT"], old["LON"])
+    index = pd.DataFrame({"LAT": old["LAT"], "LON": old["LON"], "CELL_LAT": cell_lat, "CELL_LON": cell_lon,
+                          "WEIGHT": old["N"], "HOTSPOT": labels, "CORE": core})
+    new = weighted_points(batch)
+    print(f"table rows={args.rows:,} ({len(old):,} points)  batch rows={args.batch:,} ({len(new):,} points)")
+
+    t0 = time.perf_counter()
+    both = weighted_points(pd.concat([table, batch]))
+    full_labels, full_core = hotspot_clusters(both[["LAT", "LON"]], both["N"].to_numpy(dtype="float64"))
+    full = time.perf_counter() - t0
+    print(f"  full re-cluster    {full:7.2f}s")
+
+    t0 = time.perf_counter()
+    stored = neighbourhood(index, new)
+    lookup = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    plan = incremental_plan(stored, new, int(labels.max()) + 1)
+    update = time.perf_counter() - t0
+    print(f"  incremental        {lookup + update:7.2f}s  (neighbourhood {len(stored):,} points "
+          f"{lookup:.2f}s, update {update:.2f}s; {plan['stats']['merged']} merges)")
+
+    # the index after the append, against the full run
+    rows = plan["index_rows"].set_index(["LAT", "LON"])
+    after = index.set_index(["LAT", "LON"])[["HOTSPOT", "CORE"]].astype({"CORE": bool})
+    after["HOTSPOT"] = after["HOTSPOT"].replace(plan["merges"])
+    after = rows[["HOTSPOT", "CORE"]].astype({"CORE": bool}).combine_first(after)
+    after = after.reindex(pd.MultiIndex.from_frame(both[["LAT", "LON"]]))
+    same_core = (after["CORE"].to_numpy(dtype=bool) == full_core).all()
+    pairs = set(zip(full_labels[full_core], after["HOTSPOT"].to_numpy()[full_core]))
+    same_partition = len(pairs) == len(set(full_labels[full_core])) == len({h for _, h in pairs})
+    print(f"  same core points: {same_core}  same core partition: {same_partition}")
+
+
+if __name__ == "__main__":
+    main()
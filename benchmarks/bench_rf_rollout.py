@@ -0,0 +1,119 @@
+"""
+Per-request latency of the RF monthly forecast: old pandas rollout vs the
+NumPy lag-buffer rollout vs the direct multi-horizon mode.
+
+    python benchmarks/bench_rf_rollout.py [--years 8] [--repeat 5]
+"""
+import argparse, os, sys, time
+import numpy as np, pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.forecasting import RF_FEATURES, _rf_recursive_rollout, _rf_direct_fit_predict
+
+
+def synthetic_monthly(years: int, seed: int = 7) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2015-01-31", periods=years * 12, freq="ME")
+    season = 40 + 12 * np.sin(2 * np.pi * idx.month / 12.0)
+    trend = np.linspace(0, 25, len(idx))
+    return pd.Series(rng.poisson(season + trend), index=idx, name="accident_count")
+
+
+def build_features(counts: pd.Series) -> pd.DataFrame:
+    ts = counts.to_frame("accident_count")
+    ts["lag_1_month"] = ts["accident_count"].shift(1)
+    ts["lag_2_month"] = ts["accident_count"].shift(2)
+    ts["lag_3_month"] = ts["accident_count"].shift(3)
+    ts["lag_12_month"] = ts["accident_count"].shift(12)
+    ts["rolling_mean_3_months"] = ts["accident_count"].shift(1).rolling(3).mean()
+    ts["month_of_year"] = ts.index.month
+    ts["quarter_of_year"] = ts.index.quarter
+    return ts.dropna()
+
+
+def legacy_request(ts: pd.DataFrame, future_idx) -> list[float]:
+    """The pre-vectorization fit + rollout, kept verbatim for comparison."""
+    y_full = ts["accident_count"].astype(float)
+    X_full = ts.drop(columns=["accident_count"]).astype(float)
+    rf = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2)
+    rf.fit(X_full, y_full)
+    return legacy_rollout(rf, ts, future_idx)
+
+
+def legacy_rollout(rf, ts: pd.DataFrame, future_idx) -> list[float]:
+    feature_cols = ts.drop(columns=["accident_count"]).columns.tolist()
+    future_preds = []
+    history_series = ts["accident_count"].copy()
+    current_features = ts.iloc[[-1]][feature_cols].copy()
+    for i, fdate in enumerate(future_idx):
+        pred = float(np.round(rf.predict(current_features[feature_cols])[0]))
+        future_preds.append(pred)
+        history_plus_future = pd.concat([history_series, pd.Series(future_preds, index=future_idx[: i + 1])])
+        next_row = current_features.copy(); next_row.index = [fdate]
+        next_row.loc[fdate, "lag_3_month"] = current_features["lag_2_month"].values[0]
+        next_row.loc[fdate, "lag_2_month"] = current_features["lag_1_month"].values[0]
+        next_row.loc[fdate, "lag_1_month"] = pred
+        lag12_val = history_plus_future.shift(12).get(fdate, np.nan)
+        if pd.isna(lag12_val):
+            lag12_val = current_features.get("lag_12_month", pd.Series([0.0])).values[0]
+        next_row.loc[fdate, "lag_12_month"] = float(lag12_val)
+        rmean = np.mean([next_row.loc[fdate, "lag_1_month"],
+                         next_row.loc[fdate, "lag_2_month"],
+                         next_row.loc[fdate, "lag_3_month"]])
+        next_row.loc[fdate, "rolling_mean_3_months"] = float(rmean)
+        next_row.loc[fdate, "month_of_year"] = fdate.month
+        next_row.loc[fdate, "quarter_of_year"] = fdate.quarter
+        current_features = next_row[feature_cols].copy()
+    return future_preds
+
+
+def vectorized_request(ts: pd.DataFrame, future_idx) -> list[float]:
+    y_full = ts["accident_count"].to_numpy(dtype=float)
+    X_full = np.ascontiguousarray(ts[RF_FEATURES].to_numpy(dtype=float))
+    rf = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2)
+    rf.fit(X_full, y_full)
+    return list(_rf_recursive_rollout(rf, y_full, X_full[-1], future_idx))
+
+
+def timed(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter(); out = fn(); best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    counts = synthetic_monthly(args.years)
+    ts = build_features(counts)
+    future_idx = pd.date_range(ts.index.max() + pd.DateOffset(months=1), periods=12, freq="ME")
+
+    t_old, old = timed(lambda: legacy_request(ts, future_idx), args.repeat)
+    t_new, new = timed(lambda: vectorized_request(ts, future_idx), args.repeat)
+    # rollout only, on already-fitted forests
+    rf_df = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2)
+    rf_df.fit(ts.drop(columns=["accident_count"]).astype(float), ts["accident_count"].astype(float))
+    y_np = ts["accident_count"].to_numpy(dtype=float)
+    X_np = np.ascontiguousarray(ts[RF_FEATURES].to_numpy(dtype=float))
+    rf_np = RandomForestRegressor(n_estimators=100, random_state=42, min_samples_leaf=2).fit(X_np, y_np)
+    r_old, _ = timed(lambda: legacy_rollout(rf_df, ts, future_idx), args.repeat)
+    r_new, _ = timed(lambda: _rf_recursive_rollout(rf_np, y_np, X_np[-1], future_idx), args.repeat)
+
+    t_dir, direct = timed(lambda: _rf_direct_fit_predict(counts.to_numpy(float), counts.index, 12), args.repeat)
+
+    print(f"series: {len(counts)} months ({args.years} years), best of {args.repeat}")
+    print(f"  legacy pandas rollout   : {t_old * 1000:8.1f} ms / request")
+    print(f"  numpy lag-buffer rollout: {t_new * 1000:8.1f} ms / request  ({t_old / t_new:.2f}x)")
+    print(f"  direct multi-horizon    : {t_dir * 1000:8.1f} ms / request  ({t_old / t_dir:.2f}x)")
+    print(f"  rollout only, legacy    : {r_old * 1000:8.1f} ms")
+    print(f"  rollout only, numpy     : {r_new * 1000:8.1f} ms  ({r_old / r_new:.2f}x)")
+    print(f"  recursive outputs identical: {np.allclose(old, new)}")
+
+
+if __name__ == "__main__":
+    main()
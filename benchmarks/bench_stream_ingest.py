@@ -0,0 +1,94 @@
+"""
+Peak Python memory of the ingest frame work, whole-file vs streamed: the
+batch read → clean → merge → preprocess of the two uploads, against the
+vehicle index + per-chunk merge/preprocess of `ingest_stream` (database
+writes left out on both sides; the staging table's cross-chunk OFFENSE
+collapse is counted from the chunks' keys). Sizes the synthetic CSVs by
+--rows and checks both paths keep the same number of rows.
+
+    python benchmarks/bench_stream_ingest.py [--rows 200000] [--chunk-rows 50000]
+"""
+import argparse, os, sys, tempfile, time, tracemalloc
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.preprocessing import (MERGE_KEYS, OFFENSE_KEYS, read_upload, iter_upload, clean_upload,
+                                        finish_merged, apply_additional_preprocessing)
+from app.services.ingest_stream import VehicleIndex
+
+
+def synthetic_uploads(rows: int, directory: str, seed: int = 3) -> tuple[str, str]:
+    rng = np.random.default_rng(seed)
+    dates = (pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")).strftime("%Y-%m-%d")
+    secs = rng.integers(0, 86400, rows)
+    keys = {"DATE COMMITTED": dates, "STATION": rng.choice(["ANGELES CPS", "MABALACAT CPS"], rows),
+            "BARANGAY": rng.choice(["BALIBAGO", "CAPAYA", "PAMPANG", "CUTCUT"], rows),
+            "OFFENSE": rng.choice(["RECKLESS IMPRUDENCE RESULTING IN HOMICIDE",
+                                   "RECKLESS IMPRUDENCE RESULTING IN DAMAGE TO PROPERTY"], rows)}
+    main = pd.DataFrame({**keys, "TIME COMMITTED": [f"{s // 3600:02d}:{s % 3600 // 60:02d}:00" for s in secs],
+                         "LATITUDE": 15.1 + rng.integers(0, 300, rows) * 1e-4,
+                         "LONGITUDE": 120.5 + rng.integers(0, 300, rows) * 1e-4,
+                         "VICTIM COUNT": rng.integers(0, 4, rows)})
+    veh = pd.DataFrame({**keys, "VEHICLE KIND": rng.choice(["CAR", "MOTORCYCLE", "TRICYCLE"], rows),
+                        "AGE": rng.integers(16, 80, rows), "GENDER": rng.choice(["M", "F"], rows),
+                        "ALCOHOL_USED": rng.choice(["Yes", "No"], rows)})
+    paths = os.path.join(directory, "main.csv"), os.path.join(directory, "veh.csv")
+    main.to_csv(paths[0], index=False)
+    veh.sample(frac=1.0, random_state=seed).to_csv(paths[1], index=False)
+    return paths
+
+
+def batch(main: str, veh: str, chunk_rows: int, workdir: str) -> int:
+    m = clean_upload(read_upload(main, "main.csv")).sort_values(by=MERGE_KEYS).reset_index(drop=True)
+    v = clean_upload(read_upload(veh, "veh.csv"), vehicle=True).sort_values(by=MERGE_KEYS).reset_index(drop=True)
+    m["row_num"] = m.groupby(MERGE_KEYS).cumcount()
+    v["row_num"] = v.groupby(MERGE_KEYS).cumcount()
+    merged = finish_merged(m.merge(v, on=MERGE_KEYS + ["row_num"], how="left", suffixes=("", "_V")).drop(columns="row_num"))
+    return len(apply_additional_preprocessing(merged, hotspots=False))
+
+
+def streamed(main: str, veh: str, chunk_rows: int, workdir: str) -> int:
+    index = VehicleIndex(os.path.join(workdir, f"veh_{time.monotonic_ns()}.sqlite"))
+    try:
+        for chunk in iter_upload(veh, "veh.csv", chunk_rows):
+            index.add(clean_upload(chunk, vehicle=True))
+        seen, keys = {}, []
+        for chunk in iter_upload(main, "main.csv", chunk_rows):
+            out = apply_additional_preprocessing(finish_merged(index.merge(clean_upload(chunk), seen)), hotspots=False)
+            keys.append(out[OFFENSE_KEYS])
+        return len(pd.concat(keys).drop_duplicates())   # what _collapse_staged() leaves
+    finally:
+        index.close()
+
+
+def measured(fn, *args):
+    t0 = time.perf_counter()
+    rows = fn(*args)
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()                 # second run for the peak: tracing slows allocation-heavy code
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--chunk-rows", type=int, default=50_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        main_csv, veh_csv = synthetic_uploads(args.rows, workdir)
+        size = (os.path.getsize(main_csv) + os.path.getsize(veh_csv)) / 2**20
+        print(f"rows={args.rows:,} uploads={size:.1f} MiB chunk_rows={args.chunk_rows:,}")
+        counts = []
+        for name, fn in (("whole-file", batch), ("streamed", streamed)):
+            rows, seconds, peak = measured(fn, main_csv, veh_csv, args.chunk_rows, workdir)
+            counts.append(rows)
+            print(f"  {name:<10} rows out {rows:>9,}  {seconds:6.1f}s  peak {peak / 2**20:8.1f} MiB")
+        assert counts[0] == counts[1], f"whole-file kept {counts[0]:,} rows, streamed {counts[1]:,}"
+
+
+if __name__ == "__main__":
+    main()